@@ -1,51 +1,269 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-import pandas as pd
 import numpy as np
-import joblib
+import gc
+import json
+import os
+import threading
+import time
+
+from backend.bundle import ServingBundle, bundle_sources, load_bundle, stale_sources
+from backend.memory import array_report, process_memory
+from backend.metrics import MetricsRegistry
+from backend.micro_batcher import MicroBatcher
+from backend.prediction_table import artifact_hash, load_prediction_table, table_path
+from backend.registry import REGISTRY_DIR, RegistryWatcher, current_version, version_dir
+from backend.response_cache import ResponseCache
+from backend.spatial_index import SpatialIndex
+from backend.tiles import TILE_DIR, TileStore
 
 app = Flask(__name__)
 CORS(app)
 
+# Per-stage latency histograms for /metrics (SOIL_METRICS=0 turns timing off).
+# SOIL_METRICS_DIR lets gunicorn workers publish snapshots that /metrics merges.
+metrics = MetricsRegistry(
+    enabled=os.environ.get('SOIL_METRICS', '1') != '0',
+    shared_dir=os.environ.get('SOIL_METRICS_DIR') or None,
+)
+
 # Load data and models
 DATA_PATH = "outputs/merged_features.csv"
-MODEL_PATH = "backend/models/LightGBM.pkl"
-SCALER_PATH = "backend/models/scaler.pkl"
-FEATURE_NAMES_PATH = "backend/models/feature_names.npy"
+# SOIL_MODEL_DIR=backend/models/pruned serves the importance-pruned variant.
+# Setting it pins serving to that directory, whatever the registry says.
+MODEL_DIR = os.environ.get('SOIL_MODEL_DIR', "backend/models")
+MODEL_DIR_PINNED = 'SOIL_MODEL_DIR' in os.environ
 
-data = pd.read_csv(DATA_PATH)
-model = joblib.load(MODEL_PATH)
-scaler = joblib.load(SCALER_PATH)
-feature_names = np.load(FEATURE_NAMES_PATH, allow_pickle=True)
+# Versioned artifact sets published by training/train_models.py. Unless
+# SOIL_MODEL_DIR is set, CURRENT wins over MODEL_DIR when it exists, and a
+# change to it is hot-swapped in.
+REGISTRY_PATH = os.environ.get('SOIL_REGISTRY_DIR', REGISTRY_DIR)
+SERVING_VERSION = None if MODEL_DIR_PINNED else current_version(REGISTRY_PATH)
+
+# Optional micro-batching of single-row live inference (SOIL_MICROBATCH=1): rows that
+# arrive within the window share one transform + predict call. Only concurrent
+# requests can share one, so it needs threaded workers (GUNICORN_THREADS>1);
+# gunicorn.conf.py and backend/asgi.py turn it off where requests can't overlap.
+MICROBATCH = os.environ.get('SOIL_MICROBATCH', '0') == '1'
+
+class ServingState:
+    """One model version and everything derived from it.
+
+    Requests take the active state once and use it throughout, so swapping
+    in a new version never mixes two versions within one response.
+    """
+
+    def __init__(self, bundle, model_version, model_dir):
+        self.bundle = bundle
+        self.model_dir = model_dir
+        self.artifact_version = bundle.version
+        self.model_version = model_version
+        self.loaded_at = time.time()
+
+        # Built once; read-only so concurrent requests never race on shared state
+        self.index = SpatialIndex(bundle.coords[:, 0], bundle.coords[:, 1])
+
+        # Precomputed per-row predictions stored with this version's artifacts,
+        # used only while they match them
+        self.table = load_prediction_table(table_path(model_dir), self.artifact_version)
+
+        # Pre-rendered degradation tiles (training/build_tiles.py), under the same rule
+        self.tiles = TileStore.open(os.environ.get('SOIL_TILE_DIR', TILE_DIR))
+        if self.tiles is not None and self.tiles.model_hash != self.artifact_version:
+            print("Degradation tiles are stale, /tiles is disabled until they are rebuilt.")
+            self.tiles = None
+
+        self.batcher = None
+        if MICROBATCH:
+            self.batcher = MicroBatcher(
+                lambda features: bundle.predict(bundle.transform(features)),
+                window_ms=float(os.environ.get('SOIL_MICROBATCH_WINDOW_MS', 2)),
+                max_batch=int(os.environ.get('SOIL_MICROBATCH_MAX', 64)),
+            )
+
+def load_state(version=None):
+    """Serving state for a registry version, or for MODEL_DIR when version is None"""
+    if version is not None:
+        model_dir = version_dir(version, REGISTRY_PATH)
+        bundle_dir = os.path.join(model_dir, "bundle")
+    else:
+        model_dir = MODEL_DIR
+        bundle_dir = os.environ.get('SOIL_BUNDLE_DIR', os.path.join(MODEL_DIR, "bundle"))
+
+    paths = bundle_sources(model_dir, DATA_PATH)
+    # Prefer the memory-mapped serving bundle (training/build_bundle.py) while it
+    # matches the dataset and artifacts; otherwise fall back to parsing the CSV
+    # and pickles. SOIL_BUNDLE_LAZY=0 loads the model eagerly.
+    use_bundle = os.path.exists(os.path.join(bundle_dir, "manifest.json"))
+    if use_bundle:
+        stale = stale_sources(bundle_dir, *paths)
+        if stale:
+            print(f"⚠️ Serving bundle in {bundle_dir} is stale ({', '.join(stale)} changed), "
+                  f"falling back to the CSV until training/build_bundle.py rebuilds it.")
+            use_bundle = False
+    if use_bundle:
+        bundle = load_bundle(bundle_dir, lazy=os.environ.get('SOIL_BUNDLE_LAZY', '1') != '0')
+    else:
+        bundle = ServingBundle.from_csv(*paths, version=artifact_hash(*paths))
+    return ServingState(bundle, version or bundle.version[:12], model_dir)
+
+def validate_state(candidate):
+    """Score known rows through the full request path before taking traffic"""
+    bundle = candidate.bundle
+    if bundle.features.shape[1] != len(bundle.feature_names):
+        raise ValueError(f"{bundle.features.shape[1]} feature columns for {len(bundle.feature_names)} names")
+    # Also loads a lazy model and sizes the tree evaluator's buffers
+    degradations = bundle.predict(bundle.transform(bundle.features[:64]))
+    if not np.all(np.isfinite(degradations)):
+        raise ValueError("model returned non-finite predictions")
+    lat, lng = candidate.index.coords[0]
+    get_soil_analysis(float(lat), float(lng), candidate)
+
+active = load_state(SERVING_VERSION)
+_swap_lock = threading.Lock()
+
+# Response cache keyed on the matched dataset row; SOIL_CACHE_SIZE=0 disables it.
+# Point SOIL_CACHE_DB at a local file to share entries across gunicorn workers.
+cache = ResponseCache(
+    max_entries=int(os.environ.get('SOIL_CACHE_SIZE', 10000)),
+    ttl_seconds=float(os.environ.get('SOIL_CACHE_TTL', 3600)),
+    version=active.artifact_version,
+    db_path=os.environ.get('SOIL_CACHE_DB') or None,
+)
+
+def activate_version(version):
+    """Load, validate and warm a registry version, then swap it in"""
+    global active
+    candidate = load_state(version)
+    validate_state(candidate)
+    with _swap_lock:
+        # Retag the cache first: from here on, requests on either model only
+        # see entries for the version they are computing with
+        cache.invalidate(candidate.artifact_version)
+        previous, active = active, candidate
+    metrics.set_gauge('soil_model_info', 0, version=previous.model_version)
+    if previous.batcher is not None:
+        previous.batcher.close()
+    print(f"✅ Now serving model version {candidate.model_version} (was {previous.model_version})")
+
+# Polls the registry every SOIL_REGISTRY_POLL seconds (0, or a pinned
+# SOIL_MODEL_DIR, disables hot-swapping)
+watcher = RegistryWatcher(
+    activate_version,
+    registry_dir=REGISTRY_PATH,
+    poll_seconds=0 if MODEL_DIR_PINNED else float(os.environ.get('SOIL_REGISTRY_POLL', 10)),
+    active_version=SERVING_VERSION,
+)
+
+# Batches larger than this (or requested as NDJSON) are streamed chunk by chunk
+BATCH_MAX_POINTS = 100000
+BATCH_STREAM_THRESHOLD = 1000
+
+# /samples page size
+SAMPLES_DEFAULT_LIMIT = 500
+SAMPLES_MAX_LIMIT = 5000
+
+def score_rows(rows, state):
+    """Returns (degradation, erosion, classification) for each dataset row"""
+    if state.table is not None:
+        # Served from the precomputed table
+        with metrics.stage('table_lookup'):
+            return [state.table.lookup(row) for row in rows]
+
+    bundle = state.bundle
+    if state.batcher is not None and len(rows) == 1:
+        # Coalesced with other in-flight requests
+        with metrics.stage('batched_predict'):
+            degradations = [state.batcher.predict(bundle.features[rows[0]])]
+    else:
+        # Predict degradation for all rows in a single scaler/model call
+        with metrics.stage('transform'):
+            features_scaled = bundle.transform(bundle.features[rows])
+        with metrics.stage('predict'):
+            degradations = bundle.predict(features_scaled)
 
-def get_soil_analysis(latitude, longitude):
-    # Find nearest coordinates
-    data['Distance'] = np.sqrt((data['Latitude']-latitude)**2 + (data['Longitude']-longitude)**2)
-    closest = data.loc[data['Distance'].idxmin()]
-    
-    # Get actual values from dataset
-    temp = closest['Temperature (°C)']
-    moisture = closest['Moisture (%)']
-    
-    # Predict degradation
-    features = closest[feature_names].values.reshape(1, -1)
-    features_scaled = scaler.transform(features)
-    degradation = float(model.predict(features_scaled)[0])
-    
     # Calculate erosion based on degradation
-    erosion = calculate_erosion_level(degradation)
-    
+    with metrics.stage('classify'):
+        return [(float(d), calculate_erosion_level(d), classify_degradation(float(d))) for d in degradations]
+
+def build_result(row, latitude, longitude, scored, state):
+    degradation, erosion, classification = scored
     return {
-        'temperature': round(temp, 1),
-        'moisture': round(moisture, 1),
+        'temperature': round(float(state.bundle.temperatures[row]), 1),
+        'moisture': round(float(state.bundle.moistures[row]), 1),
         'erosion': erosion,
-        'degradation': classify_degradation(degradation),
+        'degradation': classification,
         'coordinates': {
             'searched': [latitude, longitude],
-            'matched': [float(closest['Latitude']), float(closest['Longitude'])]
-        }
+            'matched': [float(state.index.coords[row, 0]), float(state.index.coords[row, 1])]
+        },
+        'model_version': state.model_version,
+    }
+
+def get_soil_analysis(latitude, longitude, state=None):
+    state = state or active
+    # Find nearest coordinates
+    with metrics.stage('nearest'):
+        row, _ = state.index.nearest(latitude, longitude)
+    return analyse_row(row, latitude, longitude, state)
+
+def analyse_row(row, latitude, longitude, state):
+    scored = score_rows([row], state)[0]
+    with metrics.stage('build_result'):
+        return build_result(row, latitude, longitude, scored, state)
+
+def get_soil_analyses(latitudes, longitudes, state=None):
+    """Batch get_soil_analysis: one index query and one model call, results in input order"""
+    state = state or active
+    with metrics.stage('nearest'):
+        rows, _ = state.index.nearest_many(latitudes, longitudes)
+    scored = score_rows(rows, state)
+    with metrics.stage('build_result'):
+        return [build_result(row, lat, lng, s, state) for row, lat, lng, s in zip(rows, latitudes, longitudes, scored)]
+
+def build_sample(row, scored, state):
+    degradation, erosion, classification = scored
+    return {
+        'lat': float(state.index.coords[row, 0]),
+        'lng': float(state.index.coords[row, 1]),
+        'temperature': round(float(state.bundle.temperatures[row]), 1),
+        'moisture': round(float(state.bundle.moistures[row]), 1),
+        'erosion': erosion,
+        'degradation': classification,
     }
 
+def parse_samples_query(args):
+    """Returns query(after, limit) -> (rows, positions, distances or None) for /samples"""
+    if 'bbox' in args:
+        # south,west,north,east; west > east crosses the antimeridian
+        lat_min, lng_min, lat_max, lng_max = (float(v) for v in args['bbox'].split(','))
+        if lat_min > lat_max:
+            raise ValueError("bbox must be south,west,north,east")
+        def query(state, after, limit):
+            rows, positions = state.index.within_bbox(lat_min, lat_max, lng_min, lng_max, after, limit)
+            return rows, positions, None
+        return query
+    lat, lng, radius_km = float(args['lat']), float(args['lng']), float(args['radius_km'])
+    if radius_km <= 0:
+        raise ValueError("radius_km must be positive")
+    def query(state, after, limit):
+        return state.index.within_radius(lat, lng, radius_km, after, limit)
+    return query
+
+def samples_page(state, query, after, limit):
+    """One page of samples in index order, plus the position to resume after (None at the end)"""
+    with metrics.stage('range_query'):
+        rows, positions, distances = query(state, after, limit + 1)
+    more = len(rows) > limit
+    rows, positions = rows[:limit], positions[:limit]
+    scored = score_rows(rows, state) if len(rows) else []
+    with metrics.stage('build_result'):
+        samples = [build_sample(row, s, state) for row, s in zip(rows, scored)]
+        if distances is not None:
+            for sample, km in zip(samples, distances):
+                sample['distance_km'] = round(float(km), 3)
+    return samples, (int(positions[-1]) if more else None)
+
 def calculate_erosion_level(degradation):
     """Returns erosion level based on degradation"""
     if degradation < 1.5: return "Low"
@@ -58,15 +276,211 @@ def classify_degradation(value):
     elif value < 2.5: return {'level': 2, 'label': 'Moderate', 'value': round(value, 2)}
     else: return {'level': 3, 'label': 'High', 'value': round(value, 2)}
 
+def parse_point(point):
+    """(lat, lng) floats from a {'lat', 'lng'} object; out-of-range coordinates are an error"""
+    lat, lng = float(point['lat']), float(point['lng'])
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        raise ValueError(f"coordinates out of range: {lat}, {lng}")
+    return lat, lng
+
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
-        req_data = request.get_json()
-        lat, lng = float(req_data['lat']), float(req_data['lng'])
-        result = get_soil_analysis(lat, lng)
-        return jsonify(result)
+        lat, lng = parse_point(request.get_json())
+        state = active
+        with metrics.stage('nearest'):
+            row, _ = state.index.nearest(lat, lng)
+        with metrics.stage('cache'):
+            result = cache.get(row, version=state.artifact_version)
+        if result is None:
+            result = analyse_row(row, lat, lng, state)
+            cache.put(row, result, version=state.artifact_version)
+        else:
+            # Cached for this exact sample; only the searched point differs
+            result = dict(result, coordinates={'searched': [lat, lng], 'matched': result['coordinates']['matched']})
+        with metrics.stage('serialize'):
+            return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    try:
+        points = request.get_json()['points']
+        if len(points) > BATCH_MAX_POINTS:
+            raise ValueError(f"batch exceeds {BATCH_MAX_POINTS} points")
+        coords = [parse_point(p) for p in points]
+        lats = [lat for lat, _ in coords]
+        lngs = [lng for _, lng in coords]
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+    # The whole batch is answered by one model version, even across a swap
+    state = active
+    if len(points) <= BATCH_STREAM_THRESHOLD and 'application/x-ndjson' not in request.headers.get('Accept', ''):
+        results = get_soil_analyses(lats, lngs, state)
+        with metrics.stage('serialize'):
+            return jsonify({'results': results})
+
+    def generate():
+        # One result per line, in input order
+        for start in range(0, len(lats), BATCH_STREAM_THRESHOLD):
+            stop = start + BATCH_STREAM_THRESHOLD
+            for result in get_soil_analyses(lats[start:stop], lngs[start:stop], state):
+                yield json.dumps(result) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/samples', methods=['GET'])
+def samples():
+    """Sampled sites in ?bbox=south,west,north,east or within ?lat=&lng=&radius_km=.
+
+    Paginated with ?limit= and the returned next_cursor; with
+    Accept: application/x-ndjson every match is streamed instead.
+    """
+    state = active
+    try:
+        query = parse_samples_query(request.args)
+        limit = min(int(request.args.get('limit', SAMPLES_DEFAULT_LIMIT)), SAMPLES_MAX_LIMIT)
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        after = -1
+        cursor = request.args.get('cursor')
+        if cursor:
+            # Positions are only meaningful for the index they came from
+            version, _, position = cursor.partition('.')
+            if version != state.artifact_version[:12]:
+                raise ValueError("cursor is from another dataset version, restart the query")
+            after = int(position)
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f"bad /samples query: {e}"}), 400
+
+    if 'application/x-ndjson' in request.headers.get('Accept', ''):
+        def generate():
+            position = after
+            while position is not None:
+                page, position = samples_page(state, query, position, SAMPLES_MAX_LIMIT)
+                for sample in page:
+                    yield json.dumps(sample) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    page, last = samples_page(state, query, after, limit)
+    with metrics.stage('serialize'):
+        return jsonify({
+            'samples': page,
+            'count': len(page),
+            'next_cursor': f"{state.artifact_version[:12]}.{last}" if last is not None else None,
+            'model_version': state.model_version,
+        })
+
+@app.route('/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def tile(z, x, y):
+    tiles = active.tiles
+    if tiles is None:
+        return jsonify({'error': 'tiles have not been built'}), 404
+    with metrics.stage('tile'):
+        found = tiles.png(z, x, y)
+    if found is None:
+        # Outside the sampled area: nothing to draw
+        return Response(status=204, headers={'Cache-Control': 'public, max-age=3600'})
+    data, etag = found
+    response = Response(data, mimetype='image/png')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    # 304 when the client's If-None-Match already has this tile
+    return response.make_conditional(request)
+
+def collect_component_metrics(registry):
+    stats = cache.stats()
+    registry.set_counter('soil_cache_hits_total', stats['hits'])
+    registry.set_counter('soil_cache_shared_hits_total', stats['shared_hits'])
+    registry.set_counter('soil_cache_misses_total', stats['misses'])
+    registry.set_counter('soil_cache_evictions_total', stats['evictions'])
+    registry.set_gauge('soil_cache_entries', stats['entries'])
+    state = active
+    registry.set_gauge('soil_model_info', 1, version=state.model_version)
+    registry.set_counter('soil_model_swaps_total', watcher.swaps)
+    # Per worker, so instances can be sized from the sum of PSS
+    memory = process_memory()
+    for kind in ('rss', 'pss', 'shared', 'private'):
+        if kind in memory:
+            registry.set_gauge('soil_worker_memory_bytes', memory[kind], kind=kind, pid=os.getpid())
+    if state.batcher is not None:
+        stats = state.batcher.stats()
+        registry.set_gauge('soil_batcher_queue_depth', stats['queue_depth'])
+        registry.set_counter('soil_batcher_batches_total', stats['batches'])
+        registry.set_counter('soil_batcher_rows_total', stats['rows'])
+        registry.set_counter('soil_batcher_wait_seconds_total', stats['total_wait_seconds'])
+        for size, count in stats['batch_size_counts'].items():
+            registry.set_counter('soil_batcher_batches_by_size_total', count, size=size)
+
+metrics.add_collector(collect_component_metrics)
+
+@app.before_request
+def start_request_timing():
+    g.request_start = time.perf_counter()
+    if watcher.poll_seconds > 0:
+        watcher.ensure_started()
+    metrics.ensure_flushing()
+    # Opt-in stage breakdown, returned as a Server-Timing header
+    if request.headers.get('X-Soil-Profile') == '1':
+        metrics.start_profile()
+
+@app.after_request
+def finish_request_timing(response):
+    profile = metrics.finish_profile()
+    response.headers['X-Model-Version'] = active.model_version
+    if profile is not None:
+        response.headers['Server-Timing'] = ", ".join(
+            f"{name};dur={seconds * 1000:.3f}" for name, seconds in profile
+        )
+    if metrics.enabled and request.endpoint != 'metrics_endpoint':
+        endpoint = request.endpoint or 'unknown'
+        metrics.observe('soil_request_seconds', time.perf_counter() - g.request_start, endpoint=endpoint)
+        metrics.inc('soil_requests_total', endpoint=endpoint, status=response.status_code)
+        metrics.maybe_flush()
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(cache.stats())
+
+@app.route('/batcher/stats', methods=['GET'])
+def batcher_stats():
+    batcher = active.batcher
+    if batcher is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(batcher.stats(), enabled=True))
+
+@app.route('/memory', methods=['GET'])
+def memory_report():
+    """This worker's memory; PSS counts shared pages once across all workers"""
+    bundle = active.bundle
+    return jsonify({
+        'pid': os.getpid(),
+        'memory': process_memory(),
+        'arrays': array_report(
+            features=bundle.features, coords=bundle.coords,
+            temperatures=bundle.temperatures, moistures=bundle.moistures,
+        ),
+        'model_loaded': bundle.model_loaded,
+        'gc_frozen_objects': gc.get_freeze_count(),
+    })
+
+@app.route('/model', methods=['GET'])
+def model_info():
+    state = active
+    return jsonify(dict(
+        watcher.status(),
+        model_version=state.model_version,
+        artifact_version=state.artifact_version,
+        loaded_at=state.loaded_at,
+        features=len(state.bundle.feature_names),
+    ))
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,15 @@
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+
+# ASGI entry point, e.g. `uvicorn backend.asgi:app` (needs asgiref).
+# WsgiToAsgi runs the WSGI app thread-sensitively, i.e. every request on one
+# thread, so requests never overlap and micro-batching would only add its
+# window to each of them. It is turned off here; use threaded gunicorn for it.
+if os.environ.get("SOIL_MICROBATCH") == "1":
+    print("⚠️ SOIL_MICROBATCH=1 has no effect under WsgiToAsgi; micro-batching disabled.")
+    os.environ["SOIL_MICROBATCH"] = "0"
+
+from backend.app import app as wsgi_app  # noqa: E402
+
+app = WsgiToAsgi(wsgi_app)
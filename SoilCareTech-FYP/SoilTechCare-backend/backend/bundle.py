@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from backend.feature_store import load_frame
+from backend.prediction_table import artifact_hash
+from backend.tree_ensemble import exported_path, load_exported
+
+BUNDLE_DIR = "backend/models/bundle"
+BUNDLE_FORMAT_VERSION = 1
+
+# Inputs a bundle is built from, in build_bundle's argument order
+SOURCES = ('data', 'model', 'scaler', 'feature_names')
+
+TEMPERATURE_COLUMN = 'Temperature (°C)'
+MOISTURE_COLUMN = 'Moisture (%)'
+
+
+class ServingBundle:
+    """Everything /predict needs: feature matrix, coordinates, scaler and model.
+
+    Arrays loaded from a bundle directory are read-only memory maps, and the
+    model is unpickled on first use when lazy, so a cold start only touches
+    what the first request actually needs.
+    """
+
+    def __init__(self, features, coords, temperatures, moistures, scaler_mean, scaler_scale,
+                 feature_names, version, model=None, model_path=None, trees=None):
+        self.features = features
+        self.coords = coords
+        self.temperatures = temperatures
+        self.moistures = moistures
+        self.scaler_mean = scaler_mean
+        self.scaler_scale = scaler_scale
+        self.feature_names = feature_names
+        self.version = version
+        self.model_path = model_path
+        # Packed evaluator from training/train_models.py, used instead of the model when present
+        self.trees = trees
+        self._model = model
+        self._model_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.coords)
+
+    @property
+    def model_loaded(self):
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = joblib.load(self.model_path)
+        return self._model
+
+    def transform(self, features):
+        """StandardScaler.transform from the stored mean/scale"""
+        return (features - self.scaler_mean) / self.scaler_scale
+
+    def predict(self, features_scaled):
+        if self.trees is not None:
+            return self.trees.predict(features_scaled)
+        return self.model.predict(features_scaled)
+
+    @classmethod
+    def from_csv(cls, data_path, model_path, scaler_path, feature_names_path, version):
+        """Legacy layout: parse the CSV and unpickle everything eagerly"""
+        feature_names = list(np.load(feature_names_path, allow_pickle=True))
+        data = _read_serving_columns(data_path, feature_names)
+        scaler = joblib.load(scaler_path)
+        return cls(
+            features=data[feature_names].to_numpy(dtype=np.float64),
+            coords=data[['Latitude', 'Longitude']].to_numpy(dtype=np.float64),
+            temperatures=data[TEMPERATURE_COLUMN].to_numpy(dtype=np.float64),
+            moistures=data[MOISTURE_COLUMN].to_numpy(dtype=np.float64),
+            scaler_mean=_scaler_mean(scaler),
+            scaler_scale=_scaler_scale(scaler),
+            feature_names=feature_names,
+            version=version,
+            model=joblib.load(model_path),
+            trees=load_exported(model_path),
+        )
+
+
+def _read_serving_columns(data_path, feature_names):
+    """Read only the model's features plus the columns a response needs"""
+    extra = [c for c in ('Latitude', 'Longitude', TEMPERATURE_COLUMN, MOISTURE_COLUMN) if c not in feature_names]
+    return load_frame(data_path, columns=list(feature_names) + extra)
+
+
+def _scaler_mean(scaler):
+    mean = getattr(scaler, 'mean_', None)
+    return np.zeros(scaler.n_features_in_) if mean is None else np.asarray(mean, dtype=np.float64)
+
+
+def _scaler_scale(scaler):
+    scale = getattr(scaler, 'scale_', None)
+    return np.ones(scaler.n_features_in_) if scale is None else np.asarray(scale, dtype=np.float64)
+
+
+def build_bundle(data_path, model_path, scaler_path, feature_names_path, version, out_dir=BUNDLE_DIR):
+    """Write the versioned binary serving bundle (float32 columnar features)"""
+    feature_names = [str(name) for name in np.load(feature_names_path, allow_pickle=True)]
+    data = _read_serving_columns(data_path, feature_names)
+    scaler = joblib.load(scaler_path)
+
+    # Build next to the old bundle and swap directories, so readers never see a partial one
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, "features.npy"), np.ascontiguousarray(data[feature_names].to_numpy(dtype=np.float32)))
+    np.save(os.path.join(tmp_dir, "coords.npy"), data[['Latitude', 'Longitude']].to_numpy(dtype=np.float64))
+    np.save(os.path.join(tmp_dir, "temperatures.npy"), data[TEMPERATURE_COLUMN].to_numpy(dtype=np.float64))
+    np.save(os.path.join(tmp_dir, "moistures.npy"), data[MOISTURE_COLUMN].to_numpy(dtype=np.float64))
+    np.save(os.path.join(tmp_dir, "scaler_mean.npy"), _scaler_mean(scaler))
+    np.save(os.path.join(tmp_dir, "scaler_scale.npy"), _scaler_scale(scaler))
+    shutil.copyfile(model_path, os.path.join(tmp_dir, "model.pkl"))
+    if load_exported(model_path) is not None:
+        shutil.copyfile(exported_path(model_path), exported_path(os.path.join(tmp_dir, "model.pkl")))
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'artifact_version': version,
+        'rows': len(data),
+        'n_features': len(feature_names),
+        'feature_names': feature_names,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        # [size, mtime_ns, sha256] per input, checked by stale_sources()
+        'sources': {
+            name: _source_stamp(path)
+            for name, path in zip(SOURCES, (data_path, model_path, scaler_path, feature_names_path))
+        },
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    old_dir = out_dir + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+def bundle_sources(model_dir, data_path):
+    """build_bundle's inputs for the serving artifacts in model_dir"""
+    return (
+        data_path,
+        os.path.join(model_dir, "LightGBM.pkl"),
+        os.path.join(model_dir, "scaler.pkl"),
+        os.path.join(model_dir, "feature_names.npy"),
+    )
+
+
+def build_model_bundle(model_dir, data_path):
+    """Build model_dir/bundle, versioned with the content hash the CSV fallback uses"""
+    paths = bundle_sources(model_dir, data_path)
+    return build_bundle(*paths, artifact_hash(*paths), os.path.join(model_dir, "bundle"))
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns, _file_sha256(path)]
+
+
+def stale_sources(bundle_dir, data_path, model_path, scaler_path, feature_names_path):
+    """Inputs that changed since the bundle was built; empty when it is current.
+
+    Size and mtime decide for unchanged files; a file whose mtime moved but
+    size did not is re-hashed, so a copy or touch doesn't count. Inputs that
+    are missing here can't be checked and are skipped. A bundle built before
+    sources were recorded is reported as stale on every input.
+    """
+    with open(os.path.join(bundle_dir, "manifest.json")) as f:
+        recorded = json.load(f).get('sources')
+    stale = []
+    for name, path in zip(SOURCES, (data_path, model_path, scaler_path, feature_names_path)):
+        if not os.path.exists(path):
+            continue
+        if recorded is None:
+            stale.append(name)
+            continue
+        size, mtime_ns, sha256 = recorded[name]
+        stat = os.stat(path)
+        if stat.st_size != size:
+            stale.append(name)
+        elif stat.st_mtime_ns != mtime_ns and _file_sha256(path) != sha256:
+            stale.append(name)
+    return stale
+
+
+def load_bundle(bundle_dir=BUNDLE_DIR, lazy=True):
+    """Memory-map a bundle; with lazy=False the model is unpickled immediately"""
+    with open(os.path.join(bundle_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest['format_version'] != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format {manifest['format_version']} in {bundle_dir}")
+
+    def array(name):
+        return np.load(os.path.join(bundle_dir, name), mmap_mode='r')
+
+    bundle = ServingBundle(
+        features=array("features.npy"),
+        coords=array("coords.npy"),
+        temperatures=array("temperatures.npy"),
+        moistures=array("moistures.npy"),
+        scaler_mean=np.load(os.path.join(bundle_dir, "scaler_mean.npy")),
+        scaler_scale=np.load(os.path.join(bundle_dir, "scaler_scale.npy")),
+        feature_names=manifest['feature_names'],
+        version=manifest['artifact_version'],
+        model_path=os.path.join(bundle_dir, "model.pkl"),
+        trees=load_exported(os.path.join(bundle_dir, "model.pkl")),
+    )
+    if not lazy:
+        bundle.model
+    return bundle
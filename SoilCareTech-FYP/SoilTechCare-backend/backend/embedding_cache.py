@@ -0,0 +1,146 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+
+def content_hash(path):
+    """sha256 of the file bytes: renamed or re-saved identical tiles still hit"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent SQLite cache of image embeddings, keyed on content hash.
+
+    Entries are tagged with `namespace` (model weights + preprocessing), so a
+    new model or input pipeline never reuses old vectors. Each entry keeps
+    what it cost to compute, which is what a later hit saves. evict() trims
+    the least recently used entries down to max_bytes.
+    """
+
+    def __init__(self, db_path, namespace, max_bytes=2 * 1024 ** 3):
+        self.db_path = db_path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.seconds_saved = 0.0
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(db_path, isolation_level=None)
+        # Must be set before the first table exists for deletes to shrink the file
+        self.db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT, namespace TEXT, dim INTEGER, value BLOB, bytes INTEGER, "
+            "seconds REAL, created REAL, accessed REAL, PRIMARY KEY (key, namespace))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS totals (name TEXT PRIMARY KEY, value REAL)")
+
+    def lookup(self, keys):
+        """Which keys are cached; counts hits, misses and the compute time the hits save"""
+        found = set()
+        now = time.time()
+        for start in range(0, len(keys), 500):
+            chunk = list(keys[start:start + 500])
+            marks = ",".join("?" * len(chunk))
+            rows = self.db.execute(
+                f"SELECT key, seconds FROM embeddings WHERE namespace = ? AND key IN ({marks})",
+                [self.namespace] + chunk,
+            ).fetchall()
+            self.db.execute(
+                f"UPDATE embeddings SET accessed = ? WHERE namespace = ? AND key IN ({marks})",
+                [now, self.namespace] + chunk,
+            )
+            for key, seconds in rows:
+                if key not in found:
+                    found.add(key)
+                    self.seconds_saved += seconds or 0.0
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def get_many(self, keys):
+        """{key: float32 vector} for the cached keys, without touching the stats"""
+        vectors = {}
+        for start in range(0, len(keys), 500):
+            chunk = list(keys[start:start + 500])
+            rows = self.db.execute(
+                f"SELECT key, value FROM embeddings WHERE namespace = ? AND key IN ({','.join('?' * len(chunk))})",
+                [self.namespace] + chunk,
+            ).fetchall()
+            for key, value in rows:
+                vectors[key] = np.frombuffer(value, dtype="<f4")
+        return vectors
+
+    def put_many(self, keys, vectors, seconds_each):
+        now = time.time()
+        rows = []
+        for key, vector in zip(keys, vectors):
+            blob = np.ascontiguousarray(vector, dtype="<f4").tobytes()
+            rows.append((key, self.namespace, len(vector), blob, len(blob), seconds_each, now, now))
+        self.db.execute("BEGIN")
+        self.db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.db.execute("COMMIT")
+
+    def size_bytes(self):
+        return int(self.db.execute("SELECT COALESCE(SUM(bytes), 0) FROM embeddings").fetchone()[0])
+
+    def evict(self):
+        """Drop least recently used entries (any namespace) until under max_bytes"""
+        excess = self.size_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+        victims = []
+        for rowid, size in self.db.execute("SELECT rowid, bytes FROM embeddings ORDER BY accessed"):
+            victims.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.db.execute("BEGIN")
+        self.db.executemany("DELETE FROM embeddings WHERE rowid = ?", victims)
+        self.db.execute("COMMIT")
+        self.db.execute("PRAGMA incremental_vacuum")
+        self.evictions += len(victims)
+        return len(victims)
+
+    def _add_totals(self):
+        for name, value in (('hits', self.hits), ('misses', self.misses),
+                            ('evictions', self.evictions), ('seconds_saved', self.seconds_saved)):
+            self.db.execute(
+                "INSERT INTO totals VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, value),
+            )
+
+    def close(self):
+        """Fold this run's counters into the lifetime totals"""
+        self._add_totals()
+        self.db.close()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM embeddings").fetchone()
+        totals = dict(self.db.execute("SELECT name, value FROM totals").fetchall())
+        current = {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                   'seconds_saved': self.seconds_saved}
+        return {
+            'namespace': self.namespace,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'seconds_saved': round(self.seconds_saved, 3),
+            'evictions': self.evictions,
+            'entries': int(entries),
+            'bytes': int(size),
+            'max_bytes': self.max_bytes,
+            # Earlier runs plus this one
+            'lifetime': {name: round(totals.get(name, 0) + value, 3) for name, value in current.items()},
+        }
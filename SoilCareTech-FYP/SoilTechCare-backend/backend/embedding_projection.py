@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+
+METHODS = ("pca", "random")
+
+# Saved next to the models it was fitted for
+PROJECTION_NAME = "embedding_projection.npz"
+
+
+class EmbeddingProjection:
+    """Linear map from the 1,280 EfficientNet outputs down to `dim` columns.
+
+    "pca" keeps the top principal components of the training embeddings;
+    "random" is a seeded Gaussian projection (no fitting, distances kept in
+    expectation). Only the width shrinks: the feature store and the serving
+    bundle keep every column as float32, so the values stay float32 too.
+    Saved with save() so images embedded later are projected exactly like the
+    ones the models were trained on.
+    """
+
+    def __init__(self, method="pca", dim=64, seed=42):
+        if method not in METHODS:
+            raise ValueError(f"Unknown projection {method!r}; expected one of {METHODS}")
+        self.method = method
+        self.dim = dim
+        self.seed = seed
+        self.mean = None
+        self.components = None
+        self.explained_variance = None
+
+    @property
+    def fitted(self):
+        return self.components is not None
+
+    def fit(self, embeddings):
+        X = np.asarray(embeddings, dtype=np.float64)
+        if self.dim > X.shape[1]:
+            raise ValueError(f"Cannot project {X.shape[1]} columns up to {self.dim}")
+        self.mean = X.mean(axis=0)
+        centered = X - self.mean
+        if self.method == "pca":
+            # Rows of vt are the components; fewer samples than dims caps the useful rank
+            _, s, vt = np.linalg.svd(centered, full_matrices=False)
+            components = np.zeros((self.dim, X.shape[1]))
+            rank = min(self.dim, vt.shape[0])
+            components[:rank] = vt[:rank]
+            variance = s ** 2
+            self.explained_variance = float(variance[:rank].sum() / variance.sum()) if variance.sum() else 1.0
+        else:
+            rng = np.random.RandomState(self.seed)
+            components = rng.standard_normal((self.dim, X.shape[1])) / np.sqrt(self.dim)
+        self.components = components.astype(np.float32)
+        self.mean = self.mean.astype(np.float32)
+        return self
+
+    def transform(self, embeddings):
+        """float32 features as the models see them"""
+        if not self.fitted:
+            raise RuntimeError("EmbeddingProjection used before fit() or load()")
+        X = np.asarray(embeddings, dtype=np.float32)
+        return ((X - self.mean) @ self.components.T).astype(np.float32)
+
+    def fit_transform(self, embeddings):
+        return self.fit(embeddings).transform(embeddings)
+
+    def describe(self):
+        return {
+            'method': self.method, 'dim': self.dim, 'seed': self.seed,
+            'input_dim': int(self.components.shape[1]) if self.fitted else None,
+            'explained_variance': self.explained_variance,
+        }
+
+    def save(self, path):
+        np.savez(path, mean=self.mean, components=self.components,
+                 config=np.array(json.dumps(self.describe())))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            config = json.loads(str(data['config']))
+            projection = cls(config['method'], config['dim'], config['seed'])
+            projection.mean = data['mean']
+            projection.components = data['components']
+        projection.explained_variance = config['explained_variance']
+        return projection
@@ -0,0 +1,251 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+STORE_FORMAT_VERSION = 1
+STORE_SUFFIX = ".fstore"
+MANIFEST = "manifest.json"
+
+# Full precision where float32 would move a sample: ~1 m at these latitudes
+EXACT_COLUMNS = ("Latitude", "Longitude")
+
+
+def store_path(csv_path):
+    """outputs/merged_features.csv -> outputs/merged_features.fstore"""
+    return os.path.splitext(csv_path)[0] + STORE_SUFFIX
+
+
+def _column_dtype(name, series, exact_columns):
+    if series.dtype.kind in "iub":
+        return "int64"
+    if series.dtype.kind != "f":
+        raise TypeError(f"Column {name!r} is {series.dtype}; the feature store holds numbers only")
+    return "float64" if name in exact_columns else "float32"
+
+
+def _csv_stamp(csv_path):
+    if csv_path is None or not os.path.exists(csv_path):
+        return None
+    stat = os.stat(csv_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _write_manifest(path, manifest):
+    tmp = os.path.join(path, MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest['format_version'] != STORE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported feature store format {manifest['format_version']} in {path}")
+    return manifest
+
+
+def write_table(frame, path, exact_columns=EXACT_COLUMNS):
+    """Write a numeric DataFrame as one raw little-endian file per column.
+
+    Features are float32, `exact_columns` float64 and integer columns int64.
+    Built next to the old store and swapped in, so readers never see half a table.
+    """
+    tmp_dir = path + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    columns = []
+    for i, name in enumerate(frame.columns):
+        dtype = _column_dtype(name, frame[name], exact_columns)
+        file = f"c{i:05d}.{dtype}"
+        np.ascontiguousarray(frame[name].to_numpy(), dtype=np.dtype(dtype).newbyteorder("<")).tofile(
+            os.path.join(tmp_dir, file))
+        columns.append({'name': str(name), 'dtype': dtype, 'file': file})
+    _write_manifest(tmp_dir, {
+        'format_version': STORE_FORMAT_VERSION,
+        'rows': int(len(frame)),
+        'columns': columns,
+        'csv': None,
+    })
+
+    old_dir = path + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_dir)
+    os.rename(tmp_dir, path)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def append_rows(frame, path):
+    """Append rows in place; costs the new rows only, not a rewrite of the table.
+
+    Each column file is cut back to the manifest's row count first, so an
+    append that died halfway leaves nothing behind. The manifest is replaced
+    last, and readers only look at the rows it lists.
+    """
+    manifest = read_manifest(path)
+    rows = manifest['rows']
+    # Names are stored as strings; frames built from arrays have integer labels
+    frame = frame.rename(columns=str)
+    missing = [c['name'] for c in manifest['columns'] if c['name'] not in frame.columns]
+    if missing:
+        raise ValueError(f"New rows lack {len(missing)} stored columns, e.g. {missing[:5]}")
+    for column in manifest['columns']:
+        dtype = np.dtype(column['dtype']).newbyteorder("<")
+        with open(os.path.join(path, column['file']), "r+b") as f:
+            f.truncate(rows * dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(frame[column['name']].to_numpy(), dtype=dtype).tobytes())
+    manifest['rows'] = rows + int(len(frame))
+    _write_manifest(path, manifest)
+    return manifest
+
+
+def read_columns(path, columns=None, mmap=True):
+    """{name: 1-D array} for `columns` (all by default), memory-mapped unless mmap=False.
+
+    Only the requested column files are opened, so a projection reads just
+    those bytes.
+    """
+    manifest = read_manifest(path)
+    by_name = {c['name']: c for c in manifest['columns']}
+    names = [c['name'] for c in manifest['columns']] if columns is None else [str(c) for c in columns]
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise KeyError(f"{len(unknown)} columns not in {path}, e.g. {unknown[:5]}")
+
+    arrays = {}
+    for name in names:
+        column = by_name[name]
+        dtype = np.dtype(column['dtype']).newbyteorder("<")
+        file = os.path.join(path, column['file'])
+        if manifest['rows'] == 0:
+            arrays[name] = np.empty(0, dtype=dtype)
+        elif mmap:
+            arrays[name] = np.memmap(file, dtype=dtype, mode="r", shape=(manifest['rows'],))
+        else:
+            arrays[name] = np.fromfile(file, dtype=dtype, count=manifest['rows'])
+    return arrays
+
+
+def read_matrix(path, columns, dtype=np.float32):
+    """Stack the projected columns into one C-ordered (rows, len(columns)) matrix"""
+    arrays = read_columns(path, columns)
+    rows = len(next(iter(arrays.values()))) if arrays else 0
+    matrix = np.empty((rows, len(arrays)), dtype=dtype)
+    for i, array in enumerate(arrays.values()):
+        matrix[:, i] = array
+    return matrix
+
+
+def read_table(path, columns=None):
+    """The stored table (or a projection) as a DataFrame"""
+    import pandas as pd
+
+    return pd.DataFrame(read_columns(path, columns, mmap=False), copy=False)
+
+
+def table_columns(path):
+    return [c['name'] for c in read_manifest(path)['columns']]
+
+
+def export_csv(path, csv_path, chunk_rows=50000):
+    """Write the store out as CSV, chunk by chunk, for tools that need the old files"""
+    import pandas as pd
+
+    arrays = read_columns(path)
+    rows = read_manifest(path)['rows']
+    with open(csv_path, "w", newline="") as f:
+        f.write(",".join(_csv_header(name) for name in arrays) + "\n")
+        for start in range(0, rows, chunk_rows):
+            chunk = pd.DataFrame({name: array[start:start + chunk_rows] for name, array in arrays.items()})
+            chunk.to_csv(f, header=False, index=False)
+    # The store's own CSV now matches it again; without the new stamp every
+    # load_frame() would treat the store as stale and parse the CSV
+    if os.path.abspath(store_path(csv_path)) == os.path.abspath(path):
+        _stamp_csv(path, csv_path)
+
+
+def _csv_header(name):
+    return f'"{name}"' if any(ch in name for ch in ',"\n') else name
+
+
+def _fresh(path, csv_path):
+    """The store exists and the CSV beside it is the export it last wrote (or is gone)"""
+    if not os.path.exists(os.path.join(path, MANIFEST)):
+        return False
+    stamp = _csv_stamp(csv_path)
+    return stamp is None or read_manifest(path).get('csv') == stamp
+
+
+def save_frame(frame, csv_path, exact_columns=EXACT_COLUMNS, csv=True):
+    """Write the table to the store next to csv_path, plus the CSV export unless csv=False"""
+    path = store_path(csv_path)
+    write_table(frame, path, exact_columns)
+    if csv:
+        frame.to_csv(csv_path, index=False)
+        _stamp_csv(path, csv_path)
+    return path
+
+
+def convert_csv(csv_path, exact_columns=EXACT_COLUMNS):
+    """Build the store for an existing CSV, leaving the CSV itself untouched"""
+    import pandas as pd
+
+    path = store_path(csv_path)
+    write_table(pd.read_csv(csv_path), path, exact_columns)
+    _stamp_csv(path, csv_path)
+    return path
+
+
+def append_frame(frame, csv_path):
+    """Append rows to the store and, if present, to its CSV export.
+
+    A store that is already stale is left alone; readers use the CSV until
+    the store is rebuilt.
+    """
+    path = store_path(csv_path)
+    fresh = _fresh(path, csv_path)
+    if fresh:
+        append_rows(frame, path)
+    if os.path.exists(csv_path):
+        frame.to_csv(csv_path, mode="a", header=False, index=False)
+        if fresh:
+            _stamp_csv(path, csv_path)
+
+
+def _stamp_csv(path, csv_path):
+    manifest = read_manifest(path)
+    manifest['csv'] = _csv_stamp(csv_path)
+    _write_manifest(path, manifest)
+
+
+def load_frame(csv_path, columns=None):
+    """Read a feature table by its CSV name, from the store when it is up to date.
+
+    Falls back to parsing the CSV (projected with usecols) when there is no
+    store, or when the CSV was changed by something that bypassed the store.
+    """
+    path = store_path(csv_path)
+    if _fresh(path, csv_path):
+        return read_table(path, columns)
+    import pandas as pd
+
+    if os.path.exists(os.path.join(path, MANIFEST)):
+        print(f"⚠️ {csv_path} changed since {path} was written; reading the CSV.")
+    if columns is None:
+        return pd.read_csv(csv_path)
+    wanted = {str(c) for c in columns}
+    return pd.read_csv(csv_path, usecols=lambda column: column in wanted)[[str(c) for c in columns]]
+
+
+def frame_columns(csv_path):
+    """Column names of a feature table without reading its rows"""
+    path = store_path(csv_path)
+    if _fresh(path, csv_path):
+        return table_columns(path)
+    import pandas as pd
+
+    return list(pd.read_csv(csv_path, nrows=0).columns)
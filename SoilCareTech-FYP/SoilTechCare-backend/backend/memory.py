@@ -0,0 +1,59 @@
+import numpy as np
+
+# smaps_rollup field -> report key; PSS splits shared pages between the
+# processes mapping them, so summing PSS over workers gives the real total
+_SMAPS_FIELDS = {
+    'Rss': 'rss',
+    'Pss': 'pss',
+    'Shared_Clean': 'shared_clean',
+    'Shared_Dirty': 'shared_dirty',
+    'Private_Clean': 'private_clean',
+    'Private_Dirty': 'private_dirty',
+    'Anonymous': 'anonymous',
+    'Swap': 'swap',
+}
+
+
+def process_memory(pid="self"):
+    """Memory of one process in bytes, from /proc/<pid>/smaps_rollup (Linux >= 4.14).
+
+    Elsewhere only the peak RSS from getrusage() is available.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        if pid != "self":
+            raise
+        try:
+            import resource
+        except ImportError:  # Windows
+            return {'source': 'unavailable'}
+
+        # ru_maxrss is in KiB on Linux
+        return {'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, 'source': 'getrusage'}
+
+    report = {'source': 'smaps_rollup'}
+    for line in lines[1:]:
+        name, _, rest = line.partition(":")
+        key = _SMAPS_FIELDS.get(name)
+        if key is not None:
+            report[key] = int(rest.split()[0]) * 1024
+    report['shared'] = report.get('shared_clean', 0) + report.get('shared_dirty', 0)
+    report['private'] = report.get('private_clean', 0) + report.get('private_dirty', 0)
+    return report
+
+
+def array_report(**arrays):
+    """Size of each array and whether it is backed by a file mapping (shareable page cache)"""
+    report = {}
+    for name, array in arrays.items():
+        base = array
+        while getattr(base, "base", None) is not None and not isinstance(base, np.memmap):
+            base = base.base
+        report[name] = {
+            'bytes': int(array.nbytes),
+            'dtype': str(array.dtype),
+            'memory_mapped': isinstance(base, np.memmap) or type(base).__name__ == "mmap",
+        }
+    return report
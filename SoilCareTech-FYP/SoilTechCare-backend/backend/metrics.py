@@ -0,0 +1,294 @@
+import glob
+import json
+import os
+import threading
+import time
+
+# Seconds; fine at the low end because most stages are sub-millisecond
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, float("inf"))
+
+HELP = {
+    'soil_stage_seconds': ('histogram', 'Time spent in each stage of a prediction request'),
+    'soil_request_seconds': ('histogram', 'End-to-end request latency per endpoint'),
+    'soil_requests_total': ('counter', 'Requests served per endpoint and status'),
+    'soil_cache_hits_total': ('counter', 'Response cache hits (in-process or shared store)'),
+    'soil_cache_shared_hits_total': ('counter', 'Response cache hits served from the shared store'),
+    'soil_cache_misses_total': ('counter', 'Response cache misses'),
+    'soil_cache_evictions_total': ('counter', 'Response cache LRU evictions'),
+    'soil_cache_entries': ('gauge', 'Entries in the in-process response cache'),
+    'soil_batcher_queue_depth': ('gauge', 'Rows waiting for the micro-batcher'),
+    'soil_batcher_batches_total': ('counter', 'Model calls made by the micro-batcher'),
+    'soil_batcher_rows_total': ('counter', 'Rows scored by the micro-batcher'),
+    'soil_batcher_wait_seconds_total': ('counter', 'Queueing delay added by micro-batching'),
+    'soil_batcher_batches_by_size_total': ('counter', 'Micro-batches per batch size'),
+    'soil_model_info': ('gauge', 'Workers serving each model version'),
+    'soil_model_swaps_total': ('counter', 'Model versions hot-swapped in since startup'),
+    'soil_worker_memory_bytes': ('gauge', 'Worker memory from smaps_rollup (rss, pss, shared, private)'),
+}
+
+# A snapshot not rewritten for this many flush intervals belongs to a worker
+# that exited or hung, and is dropped from /metrics
+STALE_FLUSHES = 3
+
+_local = threading.local()
+
+
+def _label_key(labels):
+    return ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+
+
+class _NoopStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopStage()
+
+
+class _Stage:
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.registry.enabled:
+            self.registry.observe('soil_stage_seconds', elapsed, stage=self.name)
+        profile = getattr(_local, "profile", None)
+        if profile is not None:
+            profile.append((self.name, elapsed))
+        return False
+
+
+class MetricsRegistry:
+    """Process-local histograms and counters rendered as Prometheus text.
+
+    With `shared_dir` set, each worker periodically writes a JSON snapshot
+    there and /metrics merges every worker's file, so a scrape that lands on
+    any gunicorn worker sees the totals for the whole instance.
+    """
+
+    def __init__(self, enabled=True, shared_dir=None, flush_interval=5.0, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.shared_dir = shared_dir
+        self.flush_interval = flush_interval
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+        self._last_flush = time.time()
+        self._flusher_pid = None
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    def stage(self, name):
+        """Context manager timing one pipeline stage; a shared no-op when disabled"""
+        if not self.enabled and getattr(_local, "profile", None) is None:
+            return _NOOP
+        return _Stage(self, name)
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            family = self.histograms.setdefault(name, {})
+            hist = family.get(key)
+            if hist is None:
+                hist = family[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist['buckets'][i] += 1
+                    break
+            hist['sum'] += value
+            hist['count'] += 1
+
+    def inc(self, name, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            family = self.counters.setdefault(name, {})
+            family[key] = family.get(key, 0) + amount
+
+    def set_counter(self, name, value, **labels):
+        """For totals kept elsewhere (cache, batcher): overwrite with the current value"""
+        with self._lock:
+            self.counters.setdefault(name, {})[_label_key(labels)] = value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def add_collector(self, fn):
+        """fn(registry) is called before every render/flush to refresh gauges"""
+        self.collectors.append(fn)
+
+    # Per-request profiling (Server-Timing)
+
+    def start_profile(self):
+        _local.profile = []
+
+    def finish_profile(self):
+        profile, _local.profile = getattr(_local, "profile", None), None
+        return profile
+
+    # Snapshots and cross-worker aggregation
+
+    def snapshot(self):
+        for collect in self.collectors:
+            collect(self)
+        with self._lock:
+            return json.loads(json.dumps({
+                'histograms': self.histograms,
+                'counters': self.counters,
+                'gauges': self.gauges,
+            }))
+
+    def maybe_flush(self):
+        if not self.shared_dir or time.time() - self._last_flush < self.flush_interval:
+            return
+        self.flush()
+
+    def ensure_flushing(self):
+        """Flush every interval in the background too, so an idle worker's snapshot
+        doesn't age out; started lazily because threads don't survive fork"""
+        if not self.shared_dir or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid != os.getpid():
+                threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+                self._flusher_pid = os.getpid()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.time()
+        path = os.path.join(self.shared_dir, f"metrics-{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + ".tmp", path)
+
+    def merged_snapshot(self):
+        own = self.snapshot()
+        if not self.shared_dir:
+            return own
+        snapshots = [own]
+        own_file = f"metrics-{os.getpid()}.json"
+        cutoff = time.time() - STALE_FLUSHES * self.flush_interval
+        for path in glob.glob(os.path.join(self.shared_dir, "metrics-*.json")):
+            if os.path.basename(path) == own_file:
+                continue
+            if _stale_snapshot(path, cutoff):
+                # Its counts would otherwise be added to the live workers' forever
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return _merge(snapshots)
+
+    def render(self):
+        snap = self.merged_snapshot()
+        lines = []
+        for name, family in sorted(snap['histograms'].items()):
+            _header(lines, name, 'histogram')
+            for key, hist in sorted(family.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, hist['buckets']):
+                    cumulative += count
+                    le = 'le="%s"' % ("+Inf" if bound == float("inf") else repr(bound))
+                    lines.append(f"{name}_bucket{{{_join(key, le)}}} {cumulative}")
+                lines.append(f"{name}_sum{_braces(key)} {hist['sum']}")
+                lines.append(f"{name}_count{_braces(key)} {hist['count']}")
+        for kind, families in (('counter', snap['counters']), ('gauge', snap['gauges'])):
+            for name, family in sorted(families.items()):
+                _header(lines, name, kind)
+                for key, value in sorted(family.items()):
+                    lines.append(f"{name}{_braces(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def clear_snapshots(shared_dir):
+    """Delete every worker snapshot; run by the master before it forks workers"""
+    for path in glob.glob(os.path.join(shared_dir, "metrics-*.json*")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _stale_snapshot(path, cutoff):
+    """Not rewritten since `cutoff`, or written by a process that has exited"""
+    try:
+        if os.path.getmtime(path) < cutoff:
+            return True
+        pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+    except (OSError, ValueError):
+        return False
+    return not _pid_alive(pid)
+
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        # os.kill(pid, 0) would terminate the process on Windows; rely on the mtime
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _header(lines, name, kind):
+    kind, text = HELP.get(name, (kind, name.replace("_", " ")))
+    lines.append(f"# HELP {name} {text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _join(*parts):
+    return ",".join(p for p in parts if p)
+
+
+def _braces(key):
+    return f"{{{key}}}" if key else ""
+
+
+def _merge(snapshots):
+    merged = {'histograms': {}, 'counters': {}, 'gauges': {}}
+    for snap in snapshots:
+        for name, family in snap.get('histograms', {}).items():
+            target = merged['histograms'].setdefault(name, {})
+            for key, hist in family.items():
+                if key not in target:
+                    target[key] = {'buckets': list(hist['buckets']), 'sum': hist['sum'], 'count': hist['count']}
+                else:
+                    t = target[key]
+                    t['buckets'] = [a + b for a, b in zip(t['buckets'], hist['buckets'])]
+                    t['sum'] += hist['sum']
+                    t['count'] += hist['count']
+        # Counters and per-worker gauges (queue depth, cache entries) both add up across workers
+        for kind in ('counters', 'gauges'):
+            for name, family in snap.get(kind, {}).items():
+                target = merged[kind].setdefault(name, {})
+                for key, value in family.items():
+                    target[key] = target.get(key, 0) + value
+    return merged
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row predictions into one model call.
+
+    Requests are queued; a scheduler thread takes whatever arrives within
+    `window_ms` of the first queued row (or up to `max_batch` rows), runs
+    `predict_fn` once on the stacked matrix and resolves each request's
+    future with its own value. Waiting works from plain threads (threaded
+    gunicorn workers) and from coroutines via predict_async(); only
+    requests that are in flight together can share a batch.
+    """
+
+    def __init__(self, predict_fn, window_ms=2.0, max_batch=64):
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._closed = False
+        # Metrics
+        self.batches = 0
+        self.rows = 0
+        self.max_batch_seen = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.batch_sizes = {}
+
+    def _ensure_started(self):
+        # Threads don't survive fork, so start lazily in each gunicorn worker
+        if self._pid != os.getpid() and not self._closed:
+            with self._lock:
+                if self._pid != os.getpid() and not self._closed:
+                    self._queue = queue.Queue()
+                    threading.Thread(target=self._run, name="micro-batcher", daemon=True).start()
+                    self._pid = os.getpid()
+
+    def submit(self, row):
+        """Queue one feature row; returns a Future for its prediction"""
+        self._ensure_started()
+        future = Future()
+        with self._lock:
+            if not self._closed:
+                self._queue.put((np.asarray(row), time.perf_counter(), future))
+                return future
+        # Closed (e.g. its model was swapped out): score on the caller's thread
+        future.set_result(float(self.predict_fn(np.asarray(row).reshape(1, -1))[0]))
+        return future
+
+    def close(self):
+        """Flush queued rows and stop the scheduler thread"""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+
+    def predict(self, row, timeout=None):
+        return self.submit(row).result(timeout)
+
+    async def predict_async(self, row):
+        return await asyncio.wrap_future(self.submit(row))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = item[1] + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    # close() is always queued after every submitted row
+                    self._dispatch(batch)
+                    return
+                batch.append(item)
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        started = time.perf_counter()
+        try:
+            predictions = self.predict_fn(np.vstack([row for row, _, _ in batch]))
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+        else:
+            for (_, _, future), value in zip(batch, predictions):
+                future.set_result(float(value))
+
+        waits = [started - enqueued for _, enqueued, _ in batch]
+        with self._lock:
+            self.batches += 1
+            self.rows += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.wait_seconds += sum(waits)
+            self.max_wait_seconds = max(self.max_wait_seconds, max(waits))
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'window_ms': self.window * 1000,
+                'max_batch': self.max_batch,
+                'queue_depth': self._queue.qsize(),
+                'batches': self.batches,
+                'rows': self.rows,
+                'mean_batch_size': round(self.rows / self.batches, 3) if self.batches else 0.0,
+                'max_batch_size': self.max_batch_seen,
+                'batch_size_counts': dict(sorted(self.batch_sizes.items())),
+                'total_wait_seconds': self.wait_seconds,
+                'mean_wait_ms': round(self.wait_seconds / self.rows * 1000, 4) if self.rows else 0.0,
+                'max_wait_ms': round(self.max_wait_seconds * 1000, 4),
+            }
@@ -0,0 +1,86 @@
+import hashlib
+import os
+
+import numpy as np
+
+# Lives next to the artifacts it was built from: backend/models, or a registry
+# version directory, so publishing a version never leaves it pointing elsewhere
+TABLE_NAME = "prediction_table.npz"
+
+
+def table_path(model_dir):
+    return os.path.join(model_dir, TABLE_NAME)
+
+
+def artifact_hash(*paths):
+    """Content hash over the dataset and model artifacts a table was built from"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionTable:
+    """Per-sample degradation, erosion and classification, indexed by dataset row"""
+
+    def __init__(self, arrays):
+        self.latitude = arrays["latitude"]
+        self.longitude = arrays["longitude"]
+        self.degradation = arrays["degradation"]
+        self.erosion = arrays["erosion"]
+        self.level = arrays["level"]
+        self.erosion_labels = [str(label) for label in arrays["erosion_labels"]]
+        self.level_labels = [str(label) for label in arrays["level_labels"]]
+        self.model_hash = str(arrays["model_hash"])
+
+    def __len__(self):
+        return len(self.degradation)
+
+    def lookup(self, row):
+        """Returns (degradation, erosion label, classification) for a dataset row"""
+        value = float(self.degradation[row])
+        level = int(self.level[row])
+        classification = {'level': level, 'label': self.level_labels[level], 'value': round(value, 2)}
+        return value, self.erosion_labels[self.erosion[row]], classification
+
+
+def build_prediction_table(coords, degradation, erosion_fn, classify_fn, model_hash, path):
+    """Write the lookup artifact from every row's predicted degradation"""
+    degradation = np.asarray(degradation, dtype=np.float64)
+
+    erosion = [erosion_fn(value) for value in degradation]
+    classes = [classify_fn(value) for value in degradation]
+    erosion_labels = sorted(set(erosion))
+
+    # level -> label, with index == level so lookups need no search
+    level_labels = [""] * (max(c['level'] for c in classes) + 1)
+    for c in classes:
+        level_labels[c['level']] = c['label']
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(
+        path,
+        latitude=np.asarray(coords[:, 0], dtype=np.float64),
+        longitude=np.asarray(coords[:, 1], dtype=np.float64),
+        degradation=degradation,
+        erosion=np.array([erosion_labels.index(e) for e in erosion], dtype=np.uint8),
+        level=np.array([c['level'] for c in classes], dtype=np.uint8),
+        erosion_labels=np.array(erosion_labels),
+        level_labels=np.array(level_labels),
+        model_hash=np.array(model_hash),
+    )
+    return len(degradation)
+
+
+def load_prediction_table(path, model_hash):
+    """Returns the table, or None if it is missing or was built from other artifacts"""
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as arrays:
+        table = PredictionTable({key: arrays[key] for key in arrays.files})
+    if table.model_hash != model_hash:
+        print(f"Prediction table {path} is stale, falling back to live inference.")
+        return None
+    return table
@@ -0,0 +1,138 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+from backend.bundle import build_model_bundle
+
+REGISTRY_DIR = "backend/models/registry"
+CURRENT_FILE = "CURRENT"
+
+
+def version_dir(version, registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, version)
+
+
+def current_version(registry_dir=REGISTRY_DIR):
+    """The version CURRENT points at, or None for an empty registry"""
+    try:
+        with open(os.path.join(registry_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_current(version, registry_dir=REGISTRY_DIR):
+    """Atomically repoint CURRENT; running servers pick it up on their next poll"""
+    if not os.path.isdir(version_dir(version, registry_dir)):
+        raise ValueError(f"Unknown model version {version!r} in {registry_dir}")
+    path = os.path.join(registry_dir, CURRENT_FILE)
+    with open(path + ".tmp", "w") as f:
+        f.write(version + "\n")
+    os.replace(path + ".tmp", path)
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(registry_dir)
+        if os.path.exists(os.path.join(registry_dir, name, "version.json"))
+    )
+
+
+def publish_version(files, registry_dir=REGISTRY_DIR, metadata=None, activate=True, data_path=None):
+    """Copy one artifact set into a new immutable version directory.
+
+    `files` are copied under their base names. With `data_path`, the
+    version's serving bundle is built from that dataset into <version>/bundle,
+    so servers memory-map it instead of parsing the CSV; that reads and hashes
+    the whole dataset, so it costs O(rows) per publish. The directory only
+    appears once complete, so a server polling the registry never sees half a
+    version. Returns the new version name.
+    """
+    os.makedirs(registry_dir, exist_ok=True)
+    version = time.strftime("%Y%m%d-%H%M%S")
+    suffix = 1
+    while os.path.exists(version_dir(version, registry_dir)):
+        suffix += 1
+        version = f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+
+    tmp_dir = os.path.join(registry_dir, f".{version}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for path in files:
+        shutil.copyfile(path, os.path.join(tmp_dir, os.path.basename(path)))
+    with open(os.path.join(tmp_dir, "version.json"), "w") as f:
+        json.dump({
+            'version': version,
+            'created': time.time(),
+            'files': [os.path.basename(path) for path in files],
+            'metadata': metadata or {},
+        }, f, indent=2)
+    if data_path is not None:
+        build_model_bundle(tmp_dir, data_path)
+    os.rename(tmp_dir, version_dir(version, registry_dir))
+
+    if activate:
+        set_current(version, registry_dir)
+    return version
+
+
+class RegistryWatcher:
+    """Polls CURRENT and hands each new version to `activate_fn` in the background.
+
+    `activate_fn(version)` loads, validates and swaps in the version, raising
+    if it is unusable; requests keep being served by the old version
+    meanwhile. A version that failed is not retried until CURRENT changes.
+    """
+
+    def __init__(self, activate_fn, registry_dir=REGISTRY_DIR, poll_seconds=10.0, active_version=None):
+        self.activate_fn = activate_fn
+        self.registry_dir = registry_dir
+        self.poll_seconds = poll_seconds
+        self.active_version = active_version
+        self.failed_version = None
+        self.last_error = None
+        self.swaps = 0
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        # Threads don't survive fork, so start lazily in each gunicorn worker
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    threading.Thread(target=self._run, name="registry-watcher", daemon=True).start()
+                    self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            self.check()
+
+    def check(self):
+        """One poll; returns True if a new version was swapped in"""
+        version = current_version(self.registry_dir)
+        if version is None or version in (self.active_version, self.failed_version):
+            return False
+        try:
+            self.activate_fn(version)
+        except Exception as e:
+            self.failed_version, self.last_error = version, f"{version}: {e}"
+            print(f"⚠️ Model version {version} rejected, still serving {self.active_version}: {e}")
+            return False
+        self.active_version, self.failed_version, self.last_error = version, None, None
+        self.swaps += 1
+        return True
+
+    def status(self):
+        return {
+            'registry_dir': self.registry_dir,
+            'current': current_version(self.registry_dir),
+            'active': self.active_version,
+            'versions': list_versions(self.registry_dir),
+            'swaps': self.swaps,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """LRU + TTL cache of /predict responses keyed on the matched dataset row.
+
+    Every point whose nearest sample is the same row gets the same answer, so
+    a hit is exact; the nearest-sample query still runs per request, and a
+    hit skips scoring and building the response. Entries are tagged with the
+    artifact version, so a new model or dataset never serves old results.
+    With db_path set, a local SQLite file backs the in-process LRU and is
+    shared by every gunicorn worker on the host.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=3600, version="", db_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = version
+        self.db_path = db_path
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._puts = 0
+        if db_path:
+            self._db().execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT, version TEXT, created REAL, accessed REAL, value TEXT, "
+                "PRIMARY KEY (key, version))"
+            )
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _db(self):
+        # sqlite3 connections can't be shared across threads, nor carried
+        # over fork() when gunicorn preloads the app in its master
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, row, version=None):
+        """`version` is what the caller would compute with; a request still
+        holding the previous model after a swap always misses"""
+        if not self.enabled:
+            return None
+        key = str(int(row))
+        now = time.time()
+        with self._lock:
+            if version is not None and version != self.version:
+                self.misses += 1
+                return None
+            version = self.version
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.db_path:
+            stored = self._db().execute(
+                "SELECT created, value FROM responses WHERE key = ? AND version = ?",
+                (key, version),
+            ).fetchone()
+            if stored is not None and now - stored[0] <= self.ttl_seconds:
+                self._db().execute(
+                    "UPDATE responses SET accessed = ? WHERE key = ? AND version = ?",
+                    (now, key, version),
+                )
+                value = json.loads(stored[1])
+                with self._lock:
+                    if version == self.version:
+                        self._insert(key, stored[0], value)
+                    self.hits += 1
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, row, value, version=None):
+        """`version` is what `value` was computed with; stale results (e.g. from a
+        request that started before a model swap) are not cached"""
+        if not self.enabled:
+            return
+        key = str(int(row))
+        now = time.time()
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            version = self.version
+            self._insert(key, now, value)
+            self._puts += 1
+            trim = self._puts % 100 == 0
+
+        if self.db_path:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, version, now, now, json.dumps(value)),
+            )
+            if trim:
+                # Amortised: drop expired rows, then the least recently used
+                db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+                db.execute(
+                    "DELETE FROM responses WHERE rowid IN (SELECT rowid FROM responses "
+                    "ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def _insert(self, key, created, value):
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, version):
+        """Drop every entry; later entries are tagged with the new version"""
+        with self._lock:
+            old_version, self.version = self.version, version
+            self._entries.clear()
+        if self.db_path and old_version != version:
+            self._db().execute("DELETE FROM responses WHERE version = ?", (old_version,))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'version': self.version,
+                'shared_store': self.db_path,
+            }
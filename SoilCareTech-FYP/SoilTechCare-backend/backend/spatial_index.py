@@ -0,0 +1,134 @@
+import math
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class SpatialIndex:
+    """Read-only nearest-sample index over (latitude, longitude) pairs.
+
+    Built once at load time on a haversine BallTree, so lookups are
+    O(log n) and never write to shared state (safe for threaded workers).
+    """
+
+    def __init__(self, latitudes, longitudes, leaf_size=40, cell_degrees=0.01):
+        coords = np.column_stack([latitudes, longitudes]).astype(np.float64)
+        coords.setflags(write=False)
+        self.coords = coords
+        self._tree = BallTree(np.radians(coords), leaf_size=leaf_size, metric="haversine")
+
+        # Range queries: rows sorted by latitude cell, then longitude, so a
+        # viewport is one binary search per non-empty cell it overlaps. A
+        # position in this order doubles as the pagination cursor.
+        self.cell_degrees = cell_degrees
+        cells = np.floor((coords[:, 0] + 90.0) / cell_degrees).astype(np.int64)
+        self._order = np.lexsort((coords[:, 1], cells))
+        self._sorted_lat = coords[self._order, 0]
+        self._sorted_lng = coords[self._order, 1]
+        self._cells, self._cell_starts = np.unique(cells[self._order], return_index=True)
+        self._cell_stops = np.append(self._cell_starts[1:], len(coords))
+
+    def __len__(self):
+        return len(self.coords)
+
+    def nearest(self, latitude, longitude):
+        """Returns (row index, distance in km) of the closest sample"""
+        dist, idx = self._tree.query(np.radians([[latitude, longitude]]), k=1)
+        return int(idx[0, 0]), float(dist[0, 0]) * EARTH_RADIUS_KM
+
+    def nearest_many(self, latitudes, longitudes):
+        """Vectorized nearest(): returns (row indices, distances in km) arrays"""
+        query = np.radians(np.column_stack([latitudes, longitudes]).astype(np.float64))
+        dist, idx = self._tree.query(query, k=1)
+        return idx[:, 0], dist[:, 0] * EARTH_RADIUS_KM
+
+    def distance_km(self, latitude, longitude, row):
+        """Great-circle distance in km from a point to sample `row`"""
+        return float(_haversine_km(latitude, longitude, self.coords[row, 0], self.coords[row, 1]))
+
+    def within_bbox(self, lat_min, lat_max, lng_min, lng_max, after=-1, limit=None):
+        """Samples inside a lat/lng box, in index order.
+
+        lng_min > lng_max means the box crosses the antimeridian. Returns
+        (rows, positions); pass the last position as `after` to get the next page.
+        """
+        if lng_min <= lng_max:
+            lng_ranges = [(lng_min, lng_max)]
+        else:
+            lng_ranges = [(-180.0, lng_max), (lng_min, 180.0)]
+        positions = self._scan(lat_min, lat_max, lng_ranges, after, limit)
+        return self._order[positions], positions
+
+    def within_radius(self, latitude, longitude, radius_km, after=-1, limit=None):
+        """Samples within radius_km (great circle), in index order.
+
+        Returns (rows, positions, distances in km); paginate like within_bbox().
+        """
+        angle = radius_km / EARTH_RADIUS_KM
+        lat_min = latitude - math.degrees(angle)
+        lat_max = latitude + math.degrees(angle)
+        if lat_min <= -90.0 or lat_max >= 90.0 or angle >= math.pi / 2:
+            lng_ranges = [(-180.0, 180.0)]
+        else:
+            # Widest longitude offset of the circle, reached off its central latitude
+            ratio = math.sin(angle) / math.cos(math.radians(latitude))
+            spread = 180.0 if ratio >= 1 else math.degrees(math.asin(ratio))
+            lng_ranges = _wrap_lng_range(longitude - spread, longitude + spread)
+
+        def keep(lats, lngs):
+            return _haversine_km(latitude, longitude, lats, lngs) <= radius_km
+
+        positions = self._scan(max(lat_min, -90.0), min(lat_max, 90.0), lng_ranges, after, limit, keep)
+        distances = _haversine_km(latitude, longitude, self._sorted_lat[positions], self._sorted_lng[positions])
+        return self._order[positions], positions, distances
+
+    def _scan(self, lat_min, lat_max, lng_ranges, after, limit, keep=None):
+        """Sorted positions inside the box (and passing `keep`), stopping after `limit`"""
+        first = np.searchsorted(self._cells, math.floor((lat_min + 90.0) / self.cell_degrees), "left")
+        last = np.searchsorted(self._cells, math.floor((lat_max + 90.0) / self.cell_degrees), "right")
+        if after >= 0:
+            # Cells that end before the cursor have nothing left to return
+            first = max(first, np.searchsorted(self._cell_stops, after, "right"))
+
+        found, count = [], 0
+        for cell in range(first, last):
+            start, stop = self._cell_starts[cell], self._cell_stops[cell]
+            lngs = self._sorted_lng[start:stop]
+            for lng_lo, lng_hi in lng_ranges:
+                lo = max(start + np.searchsorted(lngs, lng_lo, "left"), after + 1)
+                hi = start + np.searchsorted(lngs, lng_hi, "right")
+                if lo >= hi:
+                    continue
+                lats = self._sorted_lat[lo:hi]
+                mask = (lats >= lat_min) & (lats <= lat_max)
+                if keep is not None:
+                    mask &= keep(lats, self._sorted_lng[lo:hi])
+                positions = np.flatnonzero(mask) + lo
+                found.append(positions)
+                count += len(positions)
+            if limit is not None and count >= limit:
+                break
+
+        positions = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+        return positions[:limit] if limit is not None else positions
+
+
+def _wrap_lng_range(lng_lo, lng_hi):
+    """Split a longitude interval that runs past +/-180 into in-range pieces"""
+    if lng_hi - lng_lo >= 360.0:
+        return [(-180.0, 180.0)]
+    if lng_lo < -180.0:
+        return [(-180.0, lng_hi), (lng_lo + 360.0, 180.0)]
+    if lng_hi > 180.0:
+        return [(-180.0, lng_hi - 360.0), (lng_lo, 180.0)]
+    return [(lng_lo, lng_hi)]
+
+
+def _haversine_km(latitude, longitude, lats, lngs):
+    lat1, lat2 = math.radians(latitude), np.radians(lats)
+    dlat = lat2 - lat1
+    dlng = np.radians(lngs) - math.radians(longitude)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
@@ -0,0 +1,280 @@
+import hashlib
+import io
+import json
+import math
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+TILE_DIR = "backend/models/tiles"
+TILE_SIZE = 256
+TILE_FORMAT_VERSION = 3
+KM_PER_DEGREE = 111.0  # slightly under the true value, so margins err on the large side
+
+# Pixel value -> RGBA; 0 is "no sample within range" and stays transparent.
+# Levels follow classify_degradation(): 1 Low, 2 Moderate, 3 High.
+PALETTE = [
+    (0, 0, 0, 0),
+    (46, 160, 67, 170),
+    (242, 169, 0, 170),
+    (214, 39, 40, 170),
+]
+
+
+def tile_for(latitude, longitude, zoom):
+    """Web Mercator (x, y) of the tile containing a point"""
+    n = 2 ** zoom
+    lat = math.radians(max(min(latitude, 85.0511), -85.0511))
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(zoom, x, y):
+    """(lat_min, lat_max, lng_min, lng_max) of a tile"""
+    n = 2 ** zoom
+    lng_min, lng_max = x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
+    lat_max = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    lat_min = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return lat_min, lat_max, lng_min, lng_max
+
+
+def pixel_centres(zoom, x, y, size=TILE_SIZE):
+    """Latitude and longitude of every pixel centre, row-major"""
+    world = size * 2 ** zoom
+    offsets = np.arange(size, dtype=np.float64) + 0.5
+    lngs = (x * size + offsets) / world * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y * size + offsets) / world))))
+    lat_grid, lng_grid = np.meshgrid(lats, lngs, indexing="ij")
+    return lat_grid.ravel(), lng_grid.ravel()
+
+
+def _margin_degrees(latitude, km):
+    lat_margin = km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(min(abs(latitude) + lat_margin, 89.0)))
+    return lat_margin, km / (KM_PER_DEGREE * cos_lat)
+
+
+def tiles_for(latitudes, longitudes, zoom):
+    """tile_for() over arrays"""
+    n = 2 ** zoom
+    lat = np.radians(np.clip(latitudes, -85.0511, 85.0511))
+    x = ((np.asarray(longitudes) + 180.0) / 360.0 * n).astype(np.int64)
+    y = ((1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * n).astype(np.int64)
+    return np.clip(x, 0, n - 1), np.clip(y, 0, n - 1)
+
+
+def tile_key(zoom, x, y):
+    """Row-major position of a tile in its zoom level; stored tiles are sorted by it"""
+    return y * 2 ** zoom + x
+
+
+def candidate_tiles(coords, zoom, max_distance_km):
+    """Sorted keys of the tiles within max_distance_km of at least one sample"""
+    lat_margin, lng_margin = _margin_degrees(float(np.abs(coords[:, 0]).max()), max_distance_km)
+    x0, y0 = tiles_for(coords[:, 0] + lat_margin, coords[:, 1] - lng_margin, zoom)
+    x1, y1 = tiles_for(coords[:, 0] - lat_margin, coords[:, 1] + lng_margin, zoom)
+    keys = []
+    # Every sample's padded box spans only a few tiles, so walk the offsets
+    for dy in range(int((y1 - y0).max()) + 1):
+        for dx in range(int((x1 - x0).max()) + 1):
+            inside = (y0 + dy <= y1) & (x0 + dx <= x1)
+            keys.append(tile_key(zoom, x0[inside] + dx, y0[inside] + dy))
+    return np.unique(np.concatenate(keys))
+
+
+def _tile_hash(coords, levels, rows, zoom, x, y, max_distance_km):
+    """Hash of everything a tile's pixels depend on: its position, nearby samples and their levels.
+
+    Doubles as the ETag and PNG cache key, so two tiles covering the same
+    samples at different zooms must not share it.
+    """
+    digest = hashlib.sha256(f"{TILE_FORMAT_VERSION}:{TILE_SIZE}:{max_distance_km!r}:{zoom}/{x}/{y}".encode())
+    rows = rows[np.lexsort((coords[rows, 1], coords[rows, 0]))]
+    digest.update(np.ascontiguousarray(coords[rows]).tobytes())
+    digest.update(np.ascontiguousarray(levels[rows], dtype=np.uint8).tobytes())
+    return digest.hexdigest()
+
+
+def _nearby_rows(index, bounds, max_distance_km):
+    """Samples that can be the nearest in-range sample for some pixel of the tile"""
+    lat_min, lat_max, lng_min, lng_max = bounds
+    lat_margin, lng_margin = _margin_degrees(max(abs(lat_min), abs(lat_max)), max_distance_km)
+    lng_min, lng_max = lng_min - lng_margin, lng_max + lng_margin
+    if lng_max - lng_min >= 360.0:
+        lng_min, lng_max = -180.0, 180.0
+    else:
+        # Past the antimeridian the box wraps; within_bbox takes lng_min > lng_max for that
+        lng_min = lng_min + 360.0 if lng_min < -180.0 else lng_min
+        lng_max = lng_max - 360.0 if lng_max > 180.0 else lng_max
+    rows, _ = index.within_bbox(lat_min - lat_margin, lat_max + lat_margin, lng_min, lng_max)
+    return np.sort(rows)
+
+
+def render_tile(index, levels, zoom, x, y, max_distance_km):
+    """Level of the nearest sample at every pixel, 0 where none is within range"""
+    lats, lngs = pixel_centres(zoom, x, y)
+    rows, distances = index.nearest_many(lats, lngs)
+    pixels = np.where(distances <= max_distance_km, levels[rows], 0).astype(np.uint8)
+    return pixels.reshape(TILE_SIZE, TILE_SIZE)
+
+
+def build_tiles(index, levels, zooms, model_hash, max_distance_km=5.0, out_dir=TILE_DIR):
+    """Write the tile pyramid, re-rendering only tiles whose inputs changed.
+
+    `levels` is the classify_degradation() level of every dataset row. Only
+    tiles with at least one coloured pixel are stored, sorted by tile_key(),
+    so size follows the sampled area rather than its bounding box. A tile
+    is reused from the previous pyramid when the samples that can reach it
+    (and their levels) hash the same, so retraining or adding samples only
+    re-renders the affected region. Returns (rendered, reused) counts.
+    """
+    coords = index.coords
+    levels = np.asarray(levels, dtype=np.uint8)
+    previous = TileStore.open(out_dir)
+    if previous is not None and previous.max_distance_km != max_distance_km:
+        previous = None
+
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    rendered = reused = 0
+    manifest = {
+        'format_version': TILE_FORMAT_VERSION,
+        'tile_size': TILE_SIZE,
+        'max_distance_km': max_distance_km,
+        'model_hash': model_hash,
+        'palette': PALETTE,
+        'zooms': {},
+    }
+    for zoom in zooms:
+        n = 2 ** zoom
+        candidates = candidate_tiles(coords, zoom, max_distance_km)
+        path = os.path.join(tmp_dir, f"z{zoom}.npy")
+        pixels = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8,
+                                           shape=(len(candidates), TILE_SIZE, TILE_SIZE))
+        keys = np.empty(len(candidates), dtype=np.int64)
+        hashes = np.empty(len(candidates), dtype="S64")
+        stored = 0
+        for key in candidates:
+            y, x = divmod(int(key), n)
+            rows = _nearby_rows(index, tile_bounds(zoom, x, y), max_distance_km)
+            if len(rows) == 0:
+                continue
+            digest = _tile_hash(coords, levels, rows, zoom, x, y, max_distance_km)
+            old = previous.tile(zoom, x, y) if previous is not None else None
+            if old is not None and old[1] == digest:
+                tile = old[0]
+                reused += 1
+            else:
+                tile = render_tile(index, levels, zoom, x, y, max_distance_km)
+                rendered += 1
+            # A corner can be in the padded box yet out of range everywhere
+            if not tile.any():
+                continue
+            pixels[stored], keys[stored], hashes[stored] = tile, key, digest
+            stored += 1
+        pixels.flush()
+        if stored < len(candidates):
+            # Keep only the non-empty tiles
+            compact = np.lib.format.open_memmap(path + ".compact", mode="w+", dtype=np.uint8,
+                                                shape=(stored, TILE_SIZE, TILE_SIZE))
+            compact[:] = pixels[:stored]
+            compact.flush()
+            del compact
+            del pixels
+            os.replace(path + ".compact", path)
+        else:
+            del pixels
+        np.save(os.path.join(tmp_dir, f"z{zoom}_keys.npy"), keys[:stored])
+        np.save(os.path.join(tmp_dir, f"z{zoom}_hashes.npy"), hashes[:stored])
+        manifest['zooms'][str(zoom)] = {'tiles': stored}
+
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    old_dir = out_dir + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return rendered, reused
+
+
+class TileStore:
+    """Memory-mapped sparse tile pyramid written by build_tiles()"""
+
+    def __init__(self, tile_dir, manifest, png_cache_size=1024):
+        self.tile_dir = tile_dir
+        self.manifest = manifest
+        self.max_distance_km = manifest['max_distance_km']
+        self.model_hash = manifest['model_hash']
+        self.zooms = {int(z): r for z, r in manifest['zooms'].items()}
+        self._pixels = {}
+        self._keys = {}
+        self._hashes = {}
+        for zoom in self.zooms:
+            self._pixels[zoom] = np.load(os.path.join(tile_dir, f"z{zoom}.npy"), mmap_mode="r")
+            self._keys[zoom] = np.load(os.path.join(tile_dir, f"z{zoom}_keys.npy"))
+            self._hashes[zoom] = np.load(os.path.join(tile_dir, f"z{zoom}_hashes.npy"))
+        self._palette = [channel for rgba in manifest['palette'] for channel in rgba[:3]]
+        self._alpha = bytes(rgba[3] for rgba in manifest['palette'])
+        self._png_cache = OrderedDict()
+        self._png_cache_size = png_cache_size
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, tile_dir=TILE_DIR):
+        """The store in tile_dir, or None if it is missing or in an older format"""
+        path = os.path.join(tile_dir, "manifest.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != TILE_FORMAT_VERSION or manifest.get('tile_size') != TILE_SIZE:
+            return None
+        return cls(tile_dir, manifest)
+
+    def tile(self, zoom, x, y):
+        """(pixels, content hash) of a stored tile, or None where there is no data"""
+        keys = self._keys.get(zoom)
+        if keys is None or not (0 <= x < 2 ** zoom and 0 <= y < 2 ** zoom):
+            return None
+        key = tile_key(zoom, x, y)
+        slot = int(np.searchsorted(keys, key))
+        if slot == len(keys) or keys[slot] != key:
+            return None
+        return self._pixels[zoom][slot], self._hashes[zoom][slot].decode()
+
+    def png(self, zoom, x, y):
+        """(PNG bytes, ETag) for a tile, or None where there is no data"""
+        found = self.tile(zoom, x, y)
+        if found is None:
+            return None
+
+        pixels, etag = found
+        with self._lock:
+            data = self._png_cache.get(etag)
+            if data is not None:
+                self._png_cache.move_to_end(etag)
+                return data, etag
+        data = self._encode(pixels)
+        with self._lock:
+            self._png_cache[etag] = data
+            if len(self._png_cache) > self._png_cache_size:
+                self._png_cache.popitem(last=False)
+        return data, etag
+
+    def _encode(self, pixels):
+        from PIL import Image
+
+        image = Image.frombuffer("P", (TILE_SIZE, TILE_SIZE), np.ascontiguousarray(pixels), "raw", "P", 0, 1)
+        image.putpalette(self._palette)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", transparency=self._alpha, optimize=False)
+        return buffer.getvalue()
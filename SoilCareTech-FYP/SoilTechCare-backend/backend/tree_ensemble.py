@@ -0,0 +1,317 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+# Rows walked per pass; bounds scratch memory at CHUNK_ROWS x n_trees per array
+CHUNK_ROWS = 4096
+# LightGBM's kZeroThreshold: |x| at or below this counts as zero
+ZERO_THRESHOLD = 1e-35
+
+
+class TreeEnsemble:
+    """Additive tree ensemble packed into flat NumPy node arrays.
+
+    All trees are walked level by level for up to CHUNK_ROWS rows at once.
+    Scratch buffers are kept per thread and sized for one chunk, so memory
+    stays bounded for any batch and steady-state calls with a
+    caller-provided `out` allocate nothing.
+
+    Leaves point at themselves, which lets every row take exactly
+    `max_depth` steps without branching on whether it already stopped.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, default_left, roots,
+                 base_score=0.0, n_features=0, strict=False, float32_inputs=False, source_hash="",
+                 zero_missing=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int64)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.int64)
+        self.right = np.ascontiguousarray(right, dtype=np.int64)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.default_left = np.ascontiguousarray(default_left, dtype=bool)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int64)
+        # LightGBM missing_type "Zero": zero (and NaN) at these nodes goes the default way
+        if zero_missing is None:
+            zero_missing = np.zeros(len(self.feature), dtype=bool)
+        self.zero_missing = np.ascontiguousarray(zero_missing, dtype=bool)
+        self.any_zero_missing = bool(self.zero_missing.any())
+        self.base_score = float(base_score)
+        self.n_features = int(n_features)
+        # XGBoost splits on x < t, LightGBM and sklearn on x <= t
+        self.strict = bool(strict)
+        # XGBoost and sklearn compare float32 inputs against their thresholds
+        self.float32_inputs = bool(float32_inputs)
+        self.source_hash = source_hash
+        self.max_depth = _max_depth(self.left, self.right, self.roots)
+        self._local = threading.local()
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def _workspace(self, n_rows):
+        ws = getattr(self._local, "ws", None)
+        if ws is None or ws["capacity"] < n_rows:
+            capacity, n_trees = n_rows, len(self.roots)
+            shape = (capacity, n_trees)
+            x_dtype = np.float32 if self.float32_inputs else np.float64
+            ws = {
+                "capacity": capacity,
+                "x": np.empty((capacity, self.n_features), dtype=x_dtype),
+                "row_base": np.repeat(np.arange(capacity, dtype=np.int64)[:, None] * self.n_features, n_trees, axis=1),
+                "node": np.empty(shape, dtype=np.int64),
+                "next": np.empty(shape, dtype=np.int64),
+                "flat": np.empty(shape, dtype=np.int64),
+                "xv": np.empty(shape, dtype=x_dtype),
+                "thr": np.empty(shape, dtype=np.float64),
+                "go_left": np.empty(shape, dtype=bool),
+                "missing": np.empty(shape, dtype=bool),
+                "dl": np.empty(shape, dtype=bool),
+                "zero": np.empty(shape, dtype=bool),
+                "zm": np.empty(shape, dtype=bool),
+                "leaf": np.empty(shape, dtype=np.float64),
+            }
+            self._local.ws = ws
+        return ws
+
+    def predict(self, X, out=None):
+        """Score a (n_rows, n_features) matrix; returns `out` (allocated if None)"""
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n = X.shape[0]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        if out is None:
+            out = np.empty(n, dtype=np.float64)
+        for start in range(0, n, CHUNK_ROWS):
+            stop = min(start + CHUNK_ROWS, n)
+            self._predict_chunk(X[start:stop], out[start:stop])
+        return out
+
+    def _predict_chunk(self, X, out):
+        n = X.shape[0]
+        ws = self._workspace(min(n, CHUNK_ROWS))
+        if X.dtype == ws["x"].dtype and X.flags.c_contiguous:
+            x_flat = X.reshape(-1)
+        else:
+            # Cast/compact into the scratch buffer rather than allocating a copy
+            np.copyto(ws["x"][:n], X, casting="unsafe")
+            x_flat = ws["x"].reshape(-1)
+        node, nxt, flat = ws["node"][:n], ws["next"][:n], ws["flat"][:n]
+        xv, thr, go_left = ws["xv"][:n], ws["thr"][:n], ws["go_left"][:n]
+        missing, dl, leaf = ws["missing"][:n], ws["dl"][:n], ws["leaf"][:n]
+        compare = np.less if self.strict else np.less_equal
+
+        node[...] = self.roots
+        for _ in range(self.max_depth):
+            np.take(self.feature, node, out=flat)
+            np.add(flat, ws["row_base"][:n], out=flat)
+            np.take(x_flat, flat, out=xv)
+            np.take(self.threshold, node, out=thr)
+            compare(xv, thr, out=go_left)
+            # NaN fails every comparison; send it the learned default way
+            np.isnan(xv, out=missing)
+            if self.any_zero_missing:
+                zero, zm = ws["zero"][:n], ws["zm"][:n]
+                np.less_equal(xv, ZERO_THRESHOLD, out=zero)
+                np.logical_and(zero, np.greater_equal(xv, -ZERO_THRESHOLD, out=zm), out=zero)
+                np.take(self.zero_missing, node, out=zm)
+                np.logical_and(zero, zm, out=zero)
+                np.logical_or(missing, zero, out=missing)
+            np.take(self.default_left, node, out=dl)
+            np.copyto(go_left, dl, where=missing)
+            np.take(self.left, node, out=nxt)
+            np.take(self.right, node, out=node)
+            np.copyto(node, nxt, where=go_left)
+
+        np.take(self.value, node, out=leaf)
+        np.sum(leaf, axis=1, out=out)
+        out += self.base_score
+
+    def save(self, path):
+        np.savez(
+            path,
+            feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            value=self.value, default_left=self.default_left, roots=self.roots,
+            zero_missing=self.zero_missing, meta=np.array(json.dumps({
+                "base_score": self.base_score,
+                "n_features": self.n_features,
+                "strict": self.strict,
+                "float32_inputs": self.float32_inputs,
+                "source_hash": self.source_hash,
+            })),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            meta = json.loads(str(arrays["meta"]))
+            return cls(
+                arrays["feature"], arrays["threshold"], arrays["left"], arrays["right"],
+                arrays["value"], arrays["default_left"], arrays["roots"],
+                zero_missing=arrays["zero_missing"] if "zero_missing" in arrays.files else None, **meta,
+            )
+
+
+def _max_depth(left, right, roots):
+    depth, frontier = 0, np.unique(roots)
+    while True:
+        children = np.concatenate([left[frontier], right[frontier]])
+        children = np.unique(children[~np.isin(children, frontier)])
+        if len(children) == 0:
+            return depth
+        frontier, depth = children, depth + 1
+
+
+class _Builder:
+    """Accumulates nodes of several trees into one flat node table"""
+
+    def __init__(self):
+        self.feature, self.threshold, self.left, self.right = [], [], [], []
+        self.value, self.default_left, self.roots = [], [], []
+        self.zero_missing = []
+
+    def add(self, feature=0, threshold=np.inf, value=0.0, default_left=True, zero_missing=False):
+        self.zero_missing.append(zero_missing)
+        self.feature.append(feature)
+        self.threshold.append(threshold)
+        self.value.append(value)
+        self.default_left.append(default_left)
+        node = len(self.left)
+        self.left.append(node)
+        self.right.append(node)
+        return node
+
+    def build(self, **kwargs):
+        return TreeEnsemble(
+            self.feature, self.threshold, self.left, self.right,
+            self.value, self.default_left, self.roots, zero_missing=self.zero_missing, **kwargs,
+        )
+
+
+def export_lightgbm(model, source_hash=""):
+    booster = getattr(model, "booster_", model)
+    dump = booster.dump_model()
+    builder = _Builder()
+
+    def walk(tree):
+        if "leaf_value" in tree:
+            return builder.add(value=tree["leaf_value"])
+        if tree.get("decision_type", "<=") != "<=":
+            raise ValueError("Categorical LightGBM splits are not supported")
+        default_left = tree.get("default_left", True)
+        missing_type = tree.get("missing_type")
+        if missing_type == "None":
+            # No missing values seen in training: LightGBM scores NaN as 0.0
+            default_left = 0.0 <= tree["threshold"]
+        elif missing_type not in ("NaN", "Zero", None):
+            raise ValueError(f"LightGBM missing_type {missing_type!r} is not supported")
+        node = builder.add(tree["split_feature"], tree["threshold"], 0.0, default_left,
+                           zero_missing=missing_type == "Zero")
+        builder.left[node] = walk(tree["left_child"])
+        builder.right[node] = walk(tree["right_child"])
+        return node
+
+    for tree in dump["tree_info"]:
+        builder.roots.append(walk(tree["tree_structure"]))
+    return builder.build(n_features=dump["max_feature_idx"] + 1, source_hash=source_hash)
+
+
+def export_xgboost(model, source_hash=""):
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+    base_score = learner["learner_model_param"]["base_score"]
+    # XGBoost >= 3 stores base_score as a vector literal, e.g. "[2E0]"
+    base_score = float(base_score.strip("[]").split(",")[0])
+    builder = _Builder()
+
+    for tree in learner["gradient_booster"]["model"]["trees"]:
+        offset = len(builder.left)
+        lefts, rights = tree["left_children"], tree["right_children"]
+        for i in range(len(lefts)):
+            if lefts[i] == -1:
+                # Leaf weights live in split_conditions
+                builder.add(value=tree["split_conditions"][i])
+            else:
+                node = builder.add(tree["split_indices"][i], np.float32(tree["split_conditions"][i]), 0.0,
+                                   bool(tree["default_left"][i]))
+                builder.left[node] = offset + lefts[i]
+                builder.right[node] = offset + rights[i]
+        builder.roots.append(offset)
+
+    n_features = int(learner["learner_model_param"]["num_feature"])
+    return builder.build(base_score=base_score, n_features=n_features, strict=True,
+                         float32_inputs=True, source_hash=source_hash)
+
+
+def export_random_forest(model, source_hash=""):
+    """sklearn forest regressors: the prediction is the mean over trees"""
+    builder = _Builder()
+    n_trees = len(model.estimators_)
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        # Only set by sklearn >= 1.3 when trained with NaNs; otherwise NaN goes right
+        missing_left = getattr(tree, "missing_go_to_left", None)
+        offset = len(builder.left)
+        for i in range(tree.node_count):
+            if tree.children_left[i] == -1:
+                builder.add(value=tree.value[i, 0, 0] / n_trees)
+            else:
+                default_left = bool(missing_left[i]) if missing_left is not None else False
+                node = builder.add(tree.feature[i], tree.threshold[i], 0.0, default_left)
+                builder.left[node] = offset + tree.children_left[i]
+                builder.right[node] = offset + tree.children_right[i]
+        builder.roots.append(offset)
+    return builder.build(n_features=model.n_features_in_, float32_inputs=True, source_hash=source_hash)
+
+
+def export_ensemble(model, source_hash=""):
+    """Dispatch on the model type used in training/train_models.py"""
+    name = type(model).__name__
+    if name.startswith("LGBM") or hasattr(model, "dump_model"):
+        return export_lightgbm(model, source_hash)
+    if name.startswith("XGB") or hasattr(model, "save_raw"):
+        return export_xgboost(model, source_hash)
+    if hasattr(model, "estimators_"):
+        return export_random_forest(model, source_hash)
+    raise TypeError(f"Don't know how to export {name}")
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def exported_path(model_path):
+    """LightGBM.pkl -> LightGBM_trees.npz"""
+    return os.path.splitext(model_path)[0] + "_trees.npz"
+
+
+def save_exported(model, model_path):
+    """Export next to a saved model; None (and no packed file) if it can't be packed"""
+    path = exported_path(model_path)
+    try:
+        ensemble = export_ensemble(model, source_hash=file_hash(model_path))
+    except ValueError as e:
+        print(f"⚠️ {e}; {model_path} will be served by the native model.")
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    ensemble.save(path)
+    return ensemble
+
+
+def load_exported(model_path):
+    """The packed evaluator for a pickled model, or None if missing or stale"""
+    path = exported_path(model_path)
+    if not os.path.exists(path):
+        return None
+    ensemble = TreeEnsemble.load(path)
+    if ensemble.source_hash != file_hash(model_path):
+        print(f"Packed trees {path} do not match {model_path}, using the native model.")
+        return None
+    return ensemble
@@ -0,0 +1,136 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import joblib
+import lightgbm as lgb
+import numpy as np
+import xgboost as xgb
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.embedding_projection import METHODS, EmbeddingProjection
+from backend.feature_store import load_frame
+
+MB = 1024 * 1024
+TARGET_COLUMN = "Degradation-Level"
+MODELS = {
+    "XGBoost": lambda: xgb.XGBRegressor(),
+    "RandomForest": lambda: RandomForestRegressor(n_estimators=100, random_state=42),
+    "LightGBM": lambda: lgb.LGBMRegressor(verbose=-1),
+}
+
+
+def split_columns(df):
+    """(other feature columns, embedding columns); the embeddings are the numeric names"""
+    features = [c for c in df.columns if c != TARGET_COLUMN]
+    embedding = [c for c in features if c.isdigit()]
+    return [c for c in features if not c.isdigit()], embedding
+
+
+def build_matrices(df, other, embedding, train_idx, test_idx, projection):
+    """Features as train_models.py would see them, with the projection fitted on train rows only"""
+    E = df[embedding].to_numpy(dtype=np.float32)
+    O = df[other].to_numpy(dtype=np.float32)
+    if projection is not None:
+        projection.fit(E[train_idx])
+        E = projection.transform(E)
+    X = np.hstack([O, E])
+    scaler = StandardScaler()
+    return scaler.fit_transform(X[train_idx]), scaler.transform(X[test_idx])
+
+
+def score_variant(name, X_train, X_test, y_train, y_test, predict_rows, repeats):
+    model = MODELS[name]()
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    train_seconds = time.perf_counter() - start
+    predictions = model.predict(X_test)
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+
+    batch = np.resize(X_test, (predict_rows, X_test.shape[1]))
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(batch)
+        timings.append(time.perf_counter() - start)
+    return {
+        'model': name,
+        'train_seconds': train_seconds,
+        'mae': float(mean_absolute_error(y_test, predictions)),
+        'r2': float(r2_score(y_test, predictions)),
+        'model_bytes': len(buffer.getvalue()),
+        'predict_ms': float(np.median(timings)) * 1000,
+    }
+
+
+def variants(methods, dims, input_dim):
+    yield None
+    for method in methods:
+        for dim in dims:
+            if dim < input_dim:
+                yield EmbeddingProjection(method, dim)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy, training time, model size and serving memory "
+                                                 "with the image embeddings projected")
+    parser.add_argument("--data", default="outputs/merged_features.csv")
+    parser.add_argument("--dims", default="256,64,16")
+    parser.add_argument("--methods", default=",".join(METHODS))
+    parser.add_argument("--models", default=",".join(MODELS))
+    parser.add_argument("--serving-rows", type=int, default=1000000,
+                        help="Rows the serving-memory column is projected to")
+    parser.add_argument("--predict-rows", type=int, default=1000, help="Batch size for the prediction timing")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    df = load_frame(args.data)
+    df = df.fillna(df.median())
+    other, embedding = split_columns(df)
+    y = df[TARGET_COLUMN].to_numpy()
+    train_idx, test_idx = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)
+    model_names = args.models.split(",")
+    print(f"✅ {len(df)} rows: {len(other)} soil/coordinate columns + {len(embedding)} embedding columns")
+
+    results = []
+    baseline = {}
+    header = f"{'variant':>22}{'model':>14}{'MAE':>8}{'ΔMAE':>8}{'R²':>8}{'train x':>9}{'size x':>8}{'predict x':>11}{'serve MB':>10}"
+    print(header)
+    for projection in variants(args.methods.split(","), [int(d) for d in args.dims.split(",")], len(embedding)):
+        label = "full" if projection is None else f"{projection.method}{projection.dim}"
+        start = time.perf_counter()
+        X_train, X_test = build_matrices(df, other, embedding, train_idx, test_idx, projection)
+        project_seconds = time.perf_counter() - start
+        # The serving bundle stores every feature as float32, so only the column
+        # count moves this
+        serving_mb = args.serving_rows * X_train.shape[1] * 4 / MB
+
+        for name in model_names:
+            row = score_variant(name, X_train, X_test, y[train_idx], y[test_idx], args.predict_rows, args.repeats)
+            row.update(variant=label, features=X_train.shape[1], project_seconds=project_seconds,
+                       serving_mb=serving_mb,
+                       explained_variance=None if projection is None else projection.explained_variance)
+            base = baseline.setdefault(name, row)
+            row['mae_delta'] = row['mae'] - base['mae']
+            row['train_speedup'] = base['train_seconds'] / row['train_seconds'] if row['train_seconds'] else 0.0
+            row['size_ratio'] = base['model_bytes'] / row['model_bytes']
+            row['predict_speedup'] = base['predict_ms'] / row['predict_ms'] if row['predict_ms'] else 0.0
+            results.append(row)
+            print(f"{label:>22}{name:>14}{row['mae']:>8.3f}{row['mae_delta']:>+8.3f}{row['r2']:>8.3f}"
+                  f"{row['train_speedup']:>9.1f}{row['size_ratio']:>8.1f}{row['predict_speedup']:>11.1f}"
+                  f"{serving_mb:>10.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
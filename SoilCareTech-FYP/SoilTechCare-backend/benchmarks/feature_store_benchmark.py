@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.feature_store import load_frame, read_columns, read_matrix, save_frame, store_path
+
+MB = 1024 * 1024
+PROJECTED = 108  # Columns the LightGBM serving model splits on
+READERS = ["csv", "csv_projected", "store", "store_projected", "store_matrix", "store_mmap"]
+
+
+def synthetic_table(rows, n_features, rng):
+    """Same layout as merged_features.csv: coordinates, soil columns, EfficientNet floats"""
+    frame = {
+        'Latitude': rng.uniform(31.0, 33.5, rows),
+        'Longitude': rng.uniform(73.5, 76.0, rows),
+        'Degradation-Level': rng.randint(0, 3, rows),
+    }
+    for i in range(n_features):
+        frame[str(i)] = rng.standard_normal(rows).astype(np.float32) * 0.5
+    return pd.DataFrame(frame)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(reader, csv_path, projected):
+    """Runs in a fresh interpreter so peak RSS belongs to this one read.
+
+    Linux carries ru_maxrss over exec, so the parent stays small: the tables
+    are generated in a child of their own too.
+    """
+    columns = list(pd.read_csv(csv_path, nrows=0).columns)[:projected]
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if reader == "csv":
+        result = pd.read_csv(csv_path)
+    elif reader == "csv_projected":
+        result = pd.read_csv(csv_path, usecols=columns)
+    elif reader == "store":
+        result = load_frame(csv_path)
+    elif reader == "store_projected":
+        result = load_frame(csv_path, columns=columns)
+    elif reader == "store_matrix":
+        result = read_matrix(store_path(csv_path), columns)
+    else:
+        # Open every column mapping and scan one: what a server touches at start-up
+        arrays = read_columns(store_path(csv_path))
+        result = float(arrays[columns[-1]].sum())
+    seconds = time.perf_counter() - start
+    print(json.dumps({'seconds': seconds, 'peak_rss_mb': peak_rss_mb() - baseline}))
+    return result
+
+
+def run_child(*child_args):
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *[str(a) for a in child_args]],
+        capture_output=True, text=True, check=True,
+    )
+    return out.stdout.strip().splitlines()[-1] if out.stdout.strip() else None
+
+
+def disk_mb(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path) / MB
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / MB
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load time and RSS of the feature CSVs vs the float32 feature store")
+    parser.add_argument("--sizes", default="100,100000,1000000")
+    parser.add_argument("--features", type=int, default=1285, help="Float columns per row, as in merged_features.csv")
+    parser.add_argument("--projected", type=int, default=PROJECTED, help="Columns read by the projected readers")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    parser.add_argument("--generate", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], int(args.child[2]))
+        sys.exit(0)
+    if args.generate:
+        rows, features, csv_path = args.generate
+        save_frame(synthetic_table(int(rows), int(features), np.random.RandomState(int(rows))), csv_path)
+        sys.exit(0)
+
+    results = []
+    print(f"{'rows':>9}{'reader':>17}{'seconds':>10}{'peak RSS MB':>13}{'disk MB':>10}")
+    for rows in (int(s) for s in args.sizes.split(",")):
+        work_dir = tempfile.mkdtemp(prefix="soil-fstore-")
+        try:
+            csv_path = os.path.join(work_dir, "merged_features.csv")
+            run_child("--generate", rows, args.features, csv_path)
+            for reader in READERS:
+                stats = json.loads(run_child("--child", reader, csv_path, args.projected))
+                size = disk_mb(csv_path if reader.startswith("csv") else store_path(csv_path))
+                results.append({'rows': rows, 'reader': reader, 'disk_mb': size, **stats})
+                print(f"{rows:>9}{reader:>17}{stats['seconds']:>10.3f}{stats['peak_rss_mb']:>13.1f}{size:>10.1f}")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,195 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_mix(text):
+    """'uniform=0.6,hotspot=0.3,outside=0.05,invalid=0.05' -> normalised weights"""
+    mix = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        if name not in ("uniform", "hotspot", "outside", "invalid"):
+            raise ValueError(f"Unknown coordinate kind {name!r}")
+        mix[name] = float(weight)
+    total = sum(mix.values())
+    return {name: weight / total for name, weight in mix.items()}
+
+
+def make_points(coords, mix, count, seed, hotspots=5, hotspot_sigma=0.005):
+    """Replayable coordinate stream over the dataset bounding box"""
+    rng = random.Random(seed)
+    lats = [c[0] for c in coords]
+    lngs = [c[1] for c in coords]
+    lat_min, lat_max, lng_min, lng_max = min(lats), max(lats), min(lngs), max(lngs)
+    centres = [coords[rng.randrange(len(coords))] for _ in range(hotspots)]
+    kinds, weights = zip(*mix.items())
+
+    points = []
+    for _ in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "uniform":
+            points.append((rng.uniform(lat_min, lat_max), rng.uniform(lng_min, lng_max)))
+        elif kind == "hotspot":
+            lat, lng = rng.choice(centres)
+            points.append((rng.gauss(lat, hotspot_sigma), rng.gauss(lng, hotspot_sigma)))
+        elif kind == "outside":
+            # Well outside the sampled region; still answered by the nearest sample
+            points.append((rng.uniform(-60, 60), rng.uniform(-180, 180)))
+        else:
+            # Not a coordinate at all; the server rejects these with a 400
+            if rng.random() < 0.5:
+                points.append((rng.choice((-1, 1)) * rng.uniform(90.5, 180), rng.uniform(-180, 180)))
+            else:
+                points.append((rng.uniform(-90, 90), rng.choice((-1, 1)) * rng.uniform(180.5, 360)))
+    return points
+
+
+def valid(lat, lng):
+    return -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+def start_local_server():
+    """Serve backend.app in-process on an ephemeral port (no network needed)"""
+    from werkzeug.serving import make_server
+
+    os.chdir(BACKEND_ROOT)
+    sys.path.insert(0, BACKEND_ROOT)
+    from backend.app import active, app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no per-request access log
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", [tuple(c) for c in active.index.coords], server
+
+
+def post(url, lat, lng):
+    """(latency, ok); ok means 200 for a valid point and 400 for an invalid one"""
+    body = json.dumps({'lat': lat, 'lng': lng}).encode()
+    req = urllib.request.Request(url + "/predict", data=body, headers={'Content-Type': 'application/json'})
+    expected = 200 if valid(lat, lng) else 400
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = None
+    return time.perf_counter() - start, status == expected
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def run_level(url, points, concurrency):
+    with ThreadPoolExecutor(concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda p: post(url, *p), points))
+        elapsed = time.perf_counter() - start
+    latencies = sorted(r[0] for r in results)
+    errors = sum(1 for r in results if not r[1])
+    return {
+        'concurrency': concurrency,
+        'requests': len(points),
+        'invalid': sum(1 for p in points if not valid(*p)),
+        'errors': errors,
+        'rps': len(points) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def compare(baseline, current, tolerance):
+    """Returns regressions: lower throughput or higher tail latency beyond tolerance"""
+    failures = []
+    base_levels = {level['concurrency']: level for level in baseline['levels']}
+    for level in current['levels']:
+        base = base_levels.get(level['concurrency'])
+        if base is None:
+            continue
+        c = level['concurrency']
+        if level['rps'] < base['rps'] * (1 - tolerance):
+            failures.append(f"c={c}: rps {level['rps']:.1f} < baseline {base['rps']:.1f}")
+        for key in ('p95_ms', 'p99_ms'):
+            if level[key] > base[key] * (1 + tolerance):
+                failures.append(f"c={c}: {key} {level[key]:.2f} > baseline {base[key]:.2f}")
+        if level['errors'] > base['errors']:
+            failures.append(f"c={c}: {level['errors']} errors (baseline {base['errors']})")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput / tail-latency benchmark for the soil /predict API")
+    parser.add_argument("--url", help="Benchmark a running server instead of starting one in-process")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--mix", default="uniform=0.6,hotspot=0.3,outside=0.05,invalid=0.05",
+                        help="Weights of the coordinate kinds; invalid points must be answered with a 400")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache", action="store_true", help="Leave the response cache on (off by default)")
+    parser.add_argument("--save", help="Write results as a JSON baseline")
+    parser.add_argument("--compare", help="Baseline JSON to compare against; exits 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    if not args.cache:
+        os.environ["SOIL_CACHE_SIZE"] = "0"
+    os.environ.setdefault("SOIL_METRICS", "0")
+
+    if args.url:
+        url = args.url.rstrip("/")
+        # Without the dataset at hand, sample around the checked-in coordinates file
+        with open(os.path.join(BACKEND_ROOT, "outputs", "coordinates.csv")) as f:
+            next(f)
+            coords = [tuple(float(v) for v in line.split(",")[:2]) for line in f if line.strip()]
+    else:
+        url, coords, _server = start_local_server()
+
+    mix = parse_mix(args.mix)
+    levels = [int(c) for c in args.concurrency.split(",")]
+    points = make_points(coords, mix, args.requests, args.seed)
+
+    # Warm-up so lazy loading and first-call costs stay out of the numbers
+    for lat, lng in points[:20]:
+        post(url, lat, lng)
+
+    # A remote server's cache setting is its own; only the in-process one is known
+    results = {'mix': mix, 'seed': args.seed, 'cache': None if args.url else args.cache, 'levels': []}
+    print(f"{'conc':>5}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for concurrency in levels:
+        level = run_level(url, points, concurrency)
+        results['levels'].append(level)
+        print(f"{concurrency:>5}{level['requests']:>10}{level['errors']:>8}{level['rps']:>10.1f}"
+              f"{level['p50_ms']:>9.2f}{level['p95_ms']:>9.2f}{level['p99_ms']:>9.2f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            failures = compare(json.load(f), results, args.tolerance)
+        if failures:
+            print("❌ Regression against baseline:")
+            for failure in failures:
+                print(f"   {failure}")
+            sys.exit(1)
+        print(f"✅ Within {args.tolerance:.0%} of baseline {args.compare}")
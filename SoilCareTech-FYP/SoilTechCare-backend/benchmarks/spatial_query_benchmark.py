@@ -0,0 +1,57 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.spatial_index import SpatialIndex
+
+# Roughly the sampled region (Sialkot / Narowal), grown to synthetic sizes
+REGION = (31.0, 33.5, 73.5, 76.0)
+
+
+def time_queries(fn, queries, repeats=3):
+    """Median per-query latency in microseconds over `repeats` passes"""
+    passes = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for q in queries:
+            fn(*q)
+        passes.append((time.perf_counter() - start) / len(queries) * 1e6)
+    return statistics.median(passes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of the /samples bbox and radius queries as the dataset grows")
+    parser.add_argument("--sizes", default="100,100000,1000000")
+    parser.add_argument("--viewport-deg", type=float, default=0.1, help="Viewport height/width (~zoom 12)")
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--limit", type=int, default=500, help="Page size, as in /samples")
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(42)
+    lat_min, lat_max, lng_min, lng_max = REGION
+    print(f"{'rows':>9}{'build s':>9}{'bbox us':>9}{'hits':>8}{'radius us':>11}{'hits':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        lats = rng.uniform(lat_min, lat_max, size)
+        lngs = rng.uniform(lng_min, lng_max, size)
+        start = time.perf_counter()
+        index = SpatialIndex(lats, lngs)
+        build = time.perf_counter() - start
+
+        centres = np.column_stack([rng.uniform(lat_min, lat_max, args.queries),
+                                   rng.uniform(lng_min, lng_max, args.queries)])
+        half = args.viewport_deg / 2
+        boxes = [(la - half, la + half, lo - half, lo + half, -1, args.limit + 1) for la, lo in centres]
+        circles = [(la, lo, args.radius_km, -1, args.limit + 1) for la, lo in centres]
+
+        bbox_us = time_queries(index.within_bbox, boxes)
+        radius_us = time_queries(index.within_radius, circles)
+        bbox_hits = np.mean([len(index.within_bbox(*b)[0]) for b in boxes[:50]])
+        radius_hits = np.mean([len(index.within_radius(*c)[0]) for c in circles[:50]])
+        print(f"{size:>9}{build:>9.2f}{bbox_us:>9.1f}{bbox_hits:>8.0f}{radius_us:>11.1f}{radius_hits:>8.0f}")
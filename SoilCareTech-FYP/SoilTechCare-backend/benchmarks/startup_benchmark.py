@@ -0,0 +1,57 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter so every measurement is a real cold start
+CHILD = r"""
+import json, time
+t0 = time.perf_counter()
+import flask, flask_cors, numpy, joblib, sklearn.neighbors
+t1 = time.perf_counter()
+import backend.app as serving
+t2 = time.perf_counter()
+client = serving.app.test_client()
+client.post('/predict', json={'lat': 32.2, 'lng': 74.85})
+t3 = time.perf_counter()
+client.post('/predict', json={'lat': 32.3, 'lng': 74.95})
+t4 = time.perf_counter()
+print(json.dumps({'import_s': t1 - t0, 'load_s': t2 - t1, 'first_request_s': t3 - t2, 'warm_request_s': t4 - t3}))
+"""
+
+
+def run_once(env):
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD],
+        cwd=BACKEND_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(label, env, repeats):
+    runs = [run_once(env) for _ in range(repeats)]
+    summary = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+    print(f"{label:>8}: " + "  ".join(f"{k}={v * 1000:8.1f} ms" for k, v in summary.items()))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start latency of backend.app: imports, artifact load, first request")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Optional JSON file for the medians")
+    args = parser.parse_args()
+
+    # Cache disabled so the first request measures the real pipeline
+    base_env = dict(os.environ, SOIL_CACHE_SIZE="0", SOIL_CACHE_DB="")
+    results = {
+        'csv': measure("csv", dict(base_env, SOIL_BUNDLE_DIR=os.devnull), args.repeats),
+        'bundle': measure("bundle", dict(base_env, SOIL_BUNDLE_LAZY="1"), args.repeats),
+        'bundle_eager': measure("eager", dict(base_env, SOIL_BUNDLE_LAZY="0"), args.repeats),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
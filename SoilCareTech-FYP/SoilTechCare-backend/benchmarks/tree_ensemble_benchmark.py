@@ -0,0 +1,55 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import joblib
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.bundle import ServingBundle
+from backend.tree_ensemble import export_ensemble
+
+DATA_PATH = "outputs/merged_features.csv"
+MODEL_DIR = "backend/models"
+BATCH_SIZES = (1, 32, 4096)
+
+
+def time_call(fn, repeats):
+    """Median wall time of fn() in seconds"""
+    fn()  # warm-up (and workspace allocation for the packed evaluator)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Native predict vs packed TreeEnsemble latency")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    bundle = ServingBundle.from_csv(
+        DATA_PATH, os.path.join(MODEL_DIR, "LightGBM.pkl"), os.path.join(MODEL_DIR, "scaler.pkl"),
+        os.path.join(MODEL_DIR, "feature_names.npy"), version="benchmark",
+    )
+    X_all = bundle.transform(bundle.features)
+    # Tile the dataset up to the largest batch size
+    X_all = np.tile(X_all, (max(BATCH_SIZES) // len(X_all) + 1, 1))
+
+    print(f"{'model':<13}{'batch':>7}{'native ms':>12}{'packed ms':>12}{'speedup':>9}{'max |diff|':>13}")
+    for name in ["LightGBM", "XGBoost", "RandomForest"]:
+        model = joblib.load(os.path.join(MODEL_DIR, f"{name}.pkl"))
+        ensemble = export_ensemble(model)
+        for batch in BATCH_SIZES:
+            X = np.ascontiguousarray(X_all[:batch])
+            out = np.empty(batch)
+            repeats = max(5, args.repeats // (1 + batch // 512))
+            native = time_call(lambda: model.predict(X), repeats)
+            packed = time_call(lambda: ensemble.predict(X, out=out), repeats)
+            diff = np.abs(model.predict(X) - ensemble.predict(X)).max()
+            print(f"{name:<13}{batch:>7}{native * 1000:>12.3f}{packed * 1000:>12.3f}{native / packed:>8.1f}x{diff:>13.2e}")
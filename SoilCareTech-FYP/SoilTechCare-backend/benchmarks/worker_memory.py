@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_ROOT)
+
+from backend.memory import process_memory
+
+MB = 1024 * 1024
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def worker_pids(master_pid):
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def wait_until_up(url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url + "/cache/stats", timeout=2).read()
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"gunicorn did not come up at {url}")
+
+
+def measure(label, workers, requests, preload):
+    """Start gunicorn with the repo config, warm every worker, read each one's memory"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, SOIL_PRELOAD="1" if preload else "0", SOIL_CACHE_SIZE="0", SOIL_METRICS="0")
+    master = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}",
+         "-w", str(workers), "backend.app:app"],
+        cwd=BACKEND_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(url)
+        # Spread requests over the workers so each has served the full path
+        body = json.dumps({'lat': 32.2, 'lng': 74.8}).encode()
+        for _ in range(requests):
+            req = urllib.request.Request(url + "/predict", data=body, headers={'Content-Type': 'application/json'})
+            urllib.request.urlopen(req, timeout=30).read()
+
+        rows = [("master", process_memory(master.pid))]
+        rows += [(f"worker {pid}", process_memory(pid)) for pid in worker_pids(master.pid)]
+    finally:
+        master.terminate()
+        master.wait(timeout=30)
+
+    print(f"\n{label} ({workers} workers)")
+    print(f"{'process':>14}{'RSS MB':>10}{'PSS MB':>10}{'shared MB':>11}{'private MB':>12}")
+    for name, mem in rows:
+        print(f"{name:>14}{mem['rss'] / MB:>10.1f}{mem['pss'] / MB:>10.1f}"
+              f"{mem['shared'] / MB:>11.1f}{mem['private'] / MB:>12.1f}")
+    total_pss = sum(mem['pss'] for _, mem in rows)
+    worker_private = [mem['private'] for name, mem in rows if name != "master"]
+    print(f"{'total PSS':>14}{total_pss / MB:>20.1f}")
+    return {
+        'workers': workers,
+        'total_pss_mb': total_pss / MB,
+        'mean_worker_private_mb': sum(worker_private) / len(worker_private) / MB,
+        'processes': {name: mem for name, mem in rows},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-worker memory of the gunicorn deployment, with and without preload")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="Warm-up requests spread over the workers")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = {
+        'preload': measure("preload_app + gc.freeze", args.workers, args.requests, preload=True),
+        'no_preload': measure("one load per worker", args.workers, args.requests, preload=False),
+    }
+    saved = results['no_preload']['total_pss_mb'] - results['preload']['total_pss_mb']
+    print(f"\n✅ Preloading saves {saved:.1f} MB PSS across {args.workers} workers "
+          f"({results['preload']['mean_worker_private_mb']:.1f} vs "
+          f"{results['no_preload']['mean_worker_private_mb']:.1f} MB private per worker)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
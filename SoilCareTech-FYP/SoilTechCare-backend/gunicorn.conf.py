@@ -0,0 +1,44 @@
+import gc
+import os
+
+# Import backend.app once in the master and fork the workers from it, so the
+# model, scaler, spatial index and prediction table are shared copy-on-write
+# instead of loaded once per worker. The feature matrix and coordinates are
+# memory-mapped from the serving bundle and shared through the page cache.
+# SOIL_PRELOAD=0 turns this off for comparison (benchmarks/worker_memory.py).
+preload_app = os.environ.get("SOIL_PRELOAD", "1") != "0"
+# One worker unless WEB_CONCURRENCY asks for more; size it from the per-worker
+# PSS that benchmarks/worker_memory.py reports for the instance
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+
+# Micro-batching coalesces requests in flight at the same time, which takes
+# several threads per worker; with one it only adds its window to every request
+if os.environ.get("SOIL_MICROBATCH") == "1" and threads <= 1:
+    print("⚠️ SOIL_MICROBATCH=1 needs GUNICORN_THREADS>1; micro-batching disabled.")
+    os.environ["SOIL_MICROBATCH"] = "0"
+
+# A lazily loaded model would be unpickled separately in every worker
+os.environ.setdefault("SOIL_BUNDLE_LAZY", "0")
+
+# Collections in a worker write to the GC header of every object they scan,
+# which copies the page it lives on. Keep the GC off while the master loads the
+# app, move everything it built into the permanent generation right before
+# each fork, and turn collection back on in the worker.
+gc.disable()
+
+
+def on_starting(server):
+    # Snapshots from the previous run's workers would otherwise be merged into /metrics
+    metrics_dir = os.environ.get("SOIL_METRICS_DIR")
+    if metrics_dir:
+        from backend.metrics import clear_snapshots
+        clear_snapshots(metrics_dir)
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
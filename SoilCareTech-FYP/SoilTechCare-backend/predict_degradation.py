@@ -1,11 +1,20 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 import joblib
-from sklearn.preprocessing import MinMaxScaler
+
+from backend.feature_store import load_frame
+from backend.spatial_index import SpatialIndex
+from backend.tree_ensemble import load_exported
 
 # Load the dataset
 DATA_PATH = "outputs/merged_features.csv"
-data = pd.read_csv(DATA_PATH)
+data = load_frame(DATA_PATH)
 
 # Load trained model & scaler
 MODEL_PATH = "backend/models/LightGBM.pkl"
@@ -16,6 +25,23 @@ model = joblib.load(MODEL_PATH)
 scaler = joblib.load(SCALER_PATH)
 feature_names = np.load(FEATURE_NAMES_PATH, allow_pickle=True)
 
+# Packed trees score one row without the sklearn-wrapper overhead; None if not exported
+trees = load_exported(MODEL_PATH)
+
+# Nearest-sample index (haversine, built once)
+index = SpatialIndex(data["Latitude"].values, data["Longitude"].values)
+
+# Column arrays for batch scoring, so chunks gather rows instead of using iloc
+feature_matrix = data[feature_names].to_numpy(dtype=np.float64)
+columns = {name: data[column].to_numpy(dtype=np.float64) for name, column in (
+    ("temperature", "Temperature (°C)"),
+    ("moisture", "Moisture (%)"),
+    ("ph", "pH"),
+    ("organic_matter", "Organic Matter (%)"),
+    ("compaction", "Compaction (g/cm³)"),
+    ("original_degradation", "Degradation-Level"),
+)}
+
 # Function to compute erosion (dummy implementation)
 def compute_erosion(pH, organic_matter, compaction, temperature):
     """
@@ -25,11 +51,23 @@ def compute_erosion(pH, organic_matter, compaction, temperature):
     erosion = (10 - pH) * 0.5 + (3 - organic_matter) * 0.3 + compaction * 0.2 + temperature * 0.01
     return np.clip(erosion, 0, 10)  # Keep between 0-10
 
+def locate(latitude, longitude, row=None, distance_km=None):
+    """(row, distance_km) of the sample for a point; fills in whichever the caller didn't pass"""
+    if row is None:
+        return index.nearest(latitude, longitude)
+    if distance_km is None:
+        distance_km = index.distance_km(latitude, longitude, row)
+    return row, distance_km
+
+def scale(features):
+    """Scale a feature matrix with the column names the scaler was fitted on"""
+    return scaler.transform(pd.DataFrame(features, columns=feature_names))
+
 # Function to get closest row and compute additional parameters
-def get_soil_data(latitude, longitude):
-    # Find closest location
-    data["Distance"] = np.sqrt((data["Latitude"] - latitude) ** 2 + (data["Longitude"] - longitude) ** 2)
-    closest_row = data.loc[data["Distance"].idxmin()]
+def get_soil_data(latitude, longitude, row=None, distance_km=None):
+    # Find closest location (callers that already have it pass `row`)
+    row, distance_km = locate(latitude, longitude, row, distance_km)
+    closest_row = data.iloc[row]
     
     # Get actual values from dataset
     temperature = closest_row["Temperature (°C)"]
@@ -52,7 +90,9 @@ def get_soil_data(latitude, longitude):
         "erosion": erosion,
         "degradation_raw": degradation,
         "degradation_level": int(round(degradation)),  # Rounded to nearest integer
-        "features": closest_row[feature_names].values.reshape(1, -1)
+        "features": closest_row[feature_names].values.reshape(1, -1),
+        "row": row,
+        "distance_km": distance_km
     }
 
 # Function to interpret degradation level
@@ -66,11 +106,19 @@ def interpret_degradation(level):
     else:
         return "Very High", 4
 
+DEGRADATION_LABELS = np.array(["Low", "Moderate", "High", "Very High"])
+
+def interpret_degradation_many(levels):
+    """Vectorized interpret_degradation: (labels, categories) arrays"""
+    levels = np.asarray(levels, dtype=np.float64)
+    categories = np.select([levels <= 1.5, levels <= 2.5, levels <= 3.5], [1, 2, 3], default=4)
+    return DEGRADATION_LABELS[categories - 1], categories
+
 # Main prediction function
-def predict_soil_health(latitude, longitude):
-    # Find closest location
-    data["Distance"] = np.sqrt((data["Latitude"] - latitude) ** 2 + (data["Longitude"] - longitude) ** 2)
-    closest_row = data.loc[data["Distance"].idxmin()].copy()
+def predict_soil_health(latitude, longitude, row=None, distance_km=None):
+    # Find closest location (callers that already have it pass `row`)
+    row, distance_km = locate(latitude, longitude, row, distance_km)
+    closest_row = data.iloc[row]
     
     # Store original values BEFORE scaling
     original_values = {
@@ -92,8 +140,8 @@ def predict_soil_health(latitude, longitude):
     
     # Scale features for prediction
     features = closest_row[feature_names].values.reshape(1, -1)
-    scaled_features = scaler.transform(features)
-    prediction = model.predict(scaled_features)[0]
+    scaled_features = scale(features)
+    prediction = (trees or model).predict(scaled_features)[0]
     
     # Interpret prediction
     degradation_label, degradation_category = interpret_degradation(prediction)
@@ -119,11 +167,138 @@ def predict_soil_health(latitude, longitude):
             "label": degradation_label,
             "original_value": round(float(original_values["degradation"]), 4)
         },
-        "distance": round(float(closest_row["Distance"]), 6)
+        "distance_km": round(distance_km, 6)
     }
 
+# Batch scoring: one nearest query and one model call per chunk of points
+def score_chunk(latitudes, longitudes):
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    rows, distances = index.nearest_many(latitudes, longitudes)
+
+    # Nearby points share samples; predict each distinct sample once
+    unique_rows, inverse = np.unique(rows, return_inverse=True)
+    predictions = (trees or model).predict(scale(feature_matrix[unique_rows]))[inverse]
+
+    erosion = compute_erosion(columns["ph"][rows], columns["organic_matter"][rows],
+                              columns["compaction"][rows], columns["temperature"][rows])
+    labels, categories = interpret_degradation_many(predictions)
+    return pd.DataFrame({
+        "latitude": latitudes,
+        "longitude": longitudes,
+        "nearest_latitude": index.coords[rows, 0],
+        "nearest_longitude": index.coords[rows, 1],
+        "distance_km": np.round(distances, 6),
+        "temperature": np.round(columns["temperature"][rows], 2),
+        "moisture": np.round(columns["moisture"][rows], 2),
+        "ph": np.round(columns["ph"][rows], 2),
+        "organic_matter": np.round(columns["organic_matter"][rows], 2),
+        "compaction": np.round(columns["compaction"][rows], 2),
+        "erosion": np.round(erosion, 2),
+        "degradation_raw": np.round(predictions, 4),
+        "degradation_category": categories,
+        "degradation_label": labels,
+        "original_degradation": np.round(columns["original_degradation"][rows], 4),
+    })
+
+def score_chunk_for_output(latitudes, longitudes, as_csv, header):
+    """(rows, chunk): the DataFrame, or CSV text formatted here in the worker"""
+    frame = score_chunk(latitudes, longitudes)
+    return len(frame), (frame.to_csv(header=header, index=False) if as_csv else frame)
+
+def read_chunks(path, lat_col, lng_col, chunk_size):
+    """Yield (latitudes, longitudes) arrays from a CSV or Parquet file, chunk by chunk"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=[lat_col, lng_col]):
+            yield (batch.column(lat_col).to_numpy(zero_copy_only=False),
+                   batch.column(lng_col).to_numpy(zero_copy_only=False))
+    else:
+        for chunk in pd.read_csv(path, usecols=[lat_col, lng_col], chunksize=chunk_size):
+            yield chunk[lat_col].to_numpy(), chunk[lng_col].to_numpy()
+
+class ChunkWriter:
+    """Appends scored chunks to CSV or Parquet as they complete"""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self.writer = None
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, chunk):
+        """`chunk` is a DataFrame for Parquet, CSV text otherwise"""
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        else:
+            if self.writer is None:
+                self.writer = open(self.path, "w", newline="")
+            self.writer.write(chunk)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def run_batch(input_path, output_path, lat_col, lng_col, chunk_size, workers):
+    """Score a coordinate file chunk by chunk; at most 2 chunks per worker are in flight"""
+    start = time.perf_counter()
+    writer = ChunkWriter(output_path)
+    points = chunks = 0
+
+    as_csv = not writer.parquet
+
+    def finish(result):
+        nonlocal points, chunks
+        rows, chunk = result
+        writer.write(chunk)
+        points += rows
+        chunks += 1
+
+    try:
+        if workers <= 1:
+            for i, (latitudes, longitudes) in enumerate(read_chunks(input_path, lat_col, lng_col, chunk_size)):
+                finish(score_chunk_for_output(latitudes, longitudes, as_csv, i == 0))
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                pending = deque()
+                for i, (latitudes, longitudes) in enumerate(read_chunks(input_path, lat_col, lng_col, chunk_size)):
+                    pending.append(pool.submit(score_chunk_for_output, latitudes, longitudes, as_csv, i == 0))
+                    # Written in input order; reading pauses while the pool is full
+                    while len(pending) >= 2 * workers:
+                        finish(pending.popleft().result())
+                while pending:
+                    finish(pending.popleft().result())
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Scored {points} points in {chunks} chunks with {workers} worker(s) in {elapsed:.2f}s "
+          f"({points / elapsed if elapsed else 0:,.0f} points/s) -> {output_path}")
+    return points
+
 # Example usage
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soil health for one coordinate, or a whole coordinate file")
+    parser.add_argument("--input", help="CSV or Parquet file of coordinates (batch mode)")
+    parser.add_argument("--output", default="outputs/predictions.csv", help="CSV or .parquet")
+    parser.add_argument("--lat-col", default="Latitude")
+    parser.add_argument("--lng-col", default="Longitude")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if args.input:
+        run_batch(args.input, args.output, args.lat_col, args.lng_col, args.chunk_size, args.workers)
+        raise SystemExit(0)
+
     # Get user input
     latitude = float(input("Enter Latitude: "))
     longitude = float(input("Enter Longitude: "))
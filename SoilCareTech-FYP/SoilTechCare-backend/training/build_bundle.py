@@ -0,0 +1,22 @@
+import argparse
+import os
+import sys
+
+# Allow running as `python training/build_bundle.py` from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.bundle import build_bundle, bundle_sources
+from backend.prediction_table import artifact_hash
+
+parser = argparse.ArgumentParser(description="Build the memory-mapped serving bundle")
+parser.add_argument("--model-dir", default="backend/models", help="e.g. backend/models/pruned")
+parser.add_argument("--out", help="Defaults to <model-dir>/bundle, where the server looks for it")
+args = parser.parse_args()
+
+DATA_PATH = "outputs/merged_features.csv"
+out_dir = args.out or os.path.join(args.model_dir, "bundle")
+paths = bundle_sources(args.model_dir, DATA_PATH)
+
+# Same content hash the CSV fallback computes, so prediction tables stay valid
+manifest = build_bundle(*paths, artifact_hash(*paths), out_dir)
+print(f"✅ Serving bundle ({manifest['rows']} rows x {manifest['n_features']} features) saved to {out_dir}")
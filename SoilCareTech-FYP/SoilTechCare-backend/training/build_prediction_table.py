@@ -0,0 +1,25 @@
+import os
+import sys
+
+# Allow running as `python training/build_prediction_table.py` from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import app as serving
+from backend.prediction_table import build_prediction_table, table_path
+
+# Score every sample with the serving model so /predict becomes a lookup. The
+# table goes next to the artifacts being served: the active registry version's
+# directory, or SOIL_MODEL_DIR
+state = serving.active
+bundle = state.bundle
+path = table_path(state.model_dir)
+degradation = bundle.predict(bundle.transform(bundle.features))
+rows = build_prediction_table(
+    bundle.coords,
+    degradation,
+    serving.calculate_erosion_level,
+    serving.classify_degradation,
+    state.artifact_version,
+    path,
+)
+print(f"✅ Prediction table with {rows} rows saved to {path}")
@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Allow running as `python training/build_tiles.py` from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import app as serving
+from backend.tiles import TILE_DIR, build_tiles
+
+parser = argparse.ArgumentParser(description="Pre-render degradation tiles for the map views")
+parser.add_argument("--zooms", default="8-13", help="Zoom levels, e.g. 8-13 or 10,12")
+parser.add_argument("--max-distance-km", type=float, default=5.0,
+                    help="Pixels farther than this from every sample are left transparent")
+parser.add_argument("--out", default=TILE_DIR)
+args = parser.parse_args()
+
+if "-" in args.zooms:
+    first, last = (int(z) for z in args.zooms.split("-"))
+    zooms = list(range(first, last + 1))
+else:
+    zooms = [int(z) for z in args.zooms.split(",")]
+
+# Same nearest sample -> scaled features -> model -> classify_degradation path as /predict,
+# evaluated once per sample; every pixel then takes its nearest sample's level
+state = serving.active
+bundle = state.bundle
+degradation = bundle.predict(bundle.transform(bundle.features))
+levels = np.array([serving.classify_degradation(float(d))['level'] for d in degradation], dtype=np.uint8)
+
+start = time.perf_counter()
+rendered, reused = build_tiles(state.index, levels, zooms, state.artifact_version,
+                               max_distance_km=args.max_distance_km, out_dir=args.out)
+print(f"✅ {rendered} tiles rendered, {reused} unchanged, zooms {zooms[0]}-{zooms[-1]} "
+      f"in {time.perf_counter() - start:.1f}s -> {args.out}")
@@ -0,0 +1,29 @@
+import argparse
+import os
+import sys
+import time
+
+# Allow running as `python training/convert_features.py` from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.feature_store import convert_csv, export_csv, read_manifest, store_path
+
+parser = argparse.ArgumentParser(description="Convert feature CSVs to the float32 feature store, or export one back")
+parser.add_argument("paths", nargs="*", default=["outputs/image_features.csv", "outputs/merged_features.csv"],
+                    help="CSV files (their .fstore sits next to them)")
+parser.add_argument("--to-csv", action="store_true", help="Export each store back to its CSV instead")
+args = parser.parse_args()
+
+for csv_path in args.paths:
+    start = time.perf_counter()
+    if args.to_csv:
+        export_csv(store_path(csv_path), csv_path)
+        print(f"✅ Exported {store_path(csv_path)} to {csv_path} in {time.perf_counter() - start:.1f}s")
+        continue
+    if not os.path.exists(csv_path):
+        print(f"⚠️ {csv_path} not found, skipping.")
+        continue
+    path = convert_csv(csv_path)
+    manifest = read_manifest(path)
+    print(f"✅ {csv_path} -> {path} ({manifest['rows']} rows x {len(manifest['columns'])} columns) "
+          f"in {time.perf_counter() - start:.1f}s")
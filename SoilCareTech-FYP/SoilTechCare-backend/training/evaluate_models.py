@@ -1,67 +1,128 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import joblib
 import numpy as np
-import os
-import matplotlib.pyplot as plt
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-
-# Define model directory
-model_dir = r'E:\projects\backup project\SoilTechCare-backend\backend\models'
-
-# Load dataset for evaluation
-df = pd.read_csv(r'outputs\merged_features.csv')
-
-# Load feature names
-feature_names_path = os.path.join(model_dir, "feature_names.npy")
-feature_columns = np.load(feature_names_path, allow_pickle=True)
-
-# Extract features & target
-X = df[list(feature_columns)]
-y = df["Degradation-Level"]
-
-# Load scaler and transform data
-scaler = joblib.load(os.path.join(model_dir, "scaler.pkl"))
-X_scaled = scaler.transform(X)
-
-# Load trained models
-models = {
-    "XGBoost": joblib.load(os.path.join(model_dir, "XGBoost.pkl")),
-    "RandomForest": joblib.load(os.path.join(model_dir, "RandomForest.pkl")),
-    "LightGBM": joblib.load(os.path.join(model_dir, "LightGBM.pkl"))
-}
-
-# Evaluate each model
-results = {}
-plt.figure(figsize=(15, 5))
-
-for idx, (name, model) in enumerate(models.items(), 1):
-    # Predictions
-    y_pred = model.predict(X_scaled)
-    
-    # Metrics
-    mae = mean_absolute_error(y, y_pred)
-    mse = mean_squared_error(y, y_pred)
-    r2 = r2_score(y, y_pred)
-    results[name] = {"MAE": mae, "MSE": mse, "R2 Score": r2}
-    
-    # Scatter Plot
-    plt.subplot(1, 3, idx)
-    plt.scatter(y, y_pred, alpha=0.5)
-    plt.plot([min(y), max(y)], [min(y), max(y)], color='red', linestyle='dashed')  # Ideal line
-    plt.xlabel("Actual Degradation Level")
-    plt.ylabel("Predicted Degradation Level")
-    plt.title(f"{name} Model")
-    
-# Save and show plot
-plot_path = os.path.join(model_dir, "model_evaluation.png")
-plt.tight_layout()
-plt.savefig(plot_path, dpi=300)
-plt.show()
-
-# Print results
-for model, metrics in results.items():
-    print(f"\n🔹 {model} Model Evaluation:")
-    for metric, value in metrics.items():
-        print(f"   {metric}: {value:.4f}")
-
-print(f"\n✅ Scatter plot saved at: {plot_path}")
+import matplotlib
+
+# Allow running as `python training/evaluate_models.py` from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.feature_store import load_frame
+from training.model_benchmark import BATCH_SIZES, evaluate_model, flatten
+from training.training_runner import cpu_budget
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the saved models")
+    parser.add_argument("--headless", action="store_true",
+                        help="No plot window; also benchmark inference cost and write JSON/CSV results")
+    parser.add_argument("--batch-sizes", default=",".join(str(b) for b in BATCH_SIZES))
+    parser.add_argument("--repeats", type=int, default=20, help="Timed calls per batch size (more for small batches)")
+    parser.add_argument("--workers", type=int, default=cpu_budget(), help="Models evaluated at once")
+    parser.add_argument("--output", help="Results prefix (default <model_dir>/evaluation -> .json and .csv)")
+    args = parser.parse_args()
+
+    if args.headless:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    # Define model directory
+    model_dir = r'E:\projects\backup project\SoilTechCare-backend\backend\models'
+
+    # Load dataset for evaluation
+    # Load feature names
+    feature_names_path = os.path.join(model_dir, "feature_names.npy")
+    feature_columns = np.load(feature_names_path, allow_pickle=True)
+
+    # Only the model's columns and the target are read
+    df = load_frame(r'outputs\merged_features.csv', columns=list(feature_columns) + ["Degradation-Level"])
+
+    # Extract features & target
+    X = df[list(feature_columns)]
+    y = df["Degradation-Level"]
+
+    # Load scaler and transform data once; every model reads the same scaled matrix
+    scaler = joblib.load(os.path.join(model_dir, "scaler.pkl"))
+    X_scaled = scaler.transform(X)
+    data_dir = tempfile.mkdtemp(prefix="soil-eval-")
+    np.save(os.path.join(data_dir, "X.npy"), np.ascontiguousarray(X_scaled))
+    np.save(os.path.join(data_dir, "y.npy"), y.to_numpy())
+
+    # Evaluate the trained models in parallel, each in a fresh process so its load
+    # time and memory are its own; no more at once than --workers (one core each)
+    model_names = ["XGBoost", "RandomForest", "LightGBM"]
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")] if args.headless else []
+    evaluations = {}
+    try:
+        workers = max(1, args.workers)
+        for start in range(0, len(model_names), workers):
+            wave = model_names[start:start + workers]
+            # Spawned, not forked, so a child's peak RSS excludes this script's data
+            with ProcessPoolExecutor(len(wave), mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = {
+                    name: pool.submit(evaluate_model, name, os.path.join(model_dir, f"{name}.pkl"),
+                                      data_dir, batch_sizes, args.repeats)
+                    for name in wave
+                }
+                for name, future in futures.items():
+                    evaluations[name] = future.result()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    # Evaluate each model
+    results = {}
+    plt.figure(figsize=(15, 5))
+
+    for idx, (name, evaluation) in enumerate(evaluations.items(), 1):
+        # Predictions
+        y_pred = evaluation.pop("predictions")
+
+        # Metrics
+        results[name] = evaluation["accuracy"]
+
+        # Scatter Plot
+        plt.subplot(1, 3, idx)
+        plt.scatter(y, y_pred, alpha=0.5)
+        plt.plot([min(y), max(y)], [min(y), max(y)], color='red', linestyle='dashed')  # Ideal line
+        plt.xlabel("Actual Degradation Level")
+        plt.ylabel("Predicted Degradation Level")
+        plt.title(f"{name} Model")
+
+    # Save and show plot
+    plot_path = os.path.join(model_dir, "model_evaluation.png")
+    plt.tight_layout()
+    plt.savefig(plot_path, dpi=300)
+    if not args.headless:
+        plt.show()
+
+    # Print results
+    for model, metrics in results.items():
+        print(f"\n🔹 {model} Model Evaluation:")
+        for metric, value in metrics.items():
+            print(f"   {metric}: {value:.4f}")
+
+    print(f"\n✅ Scatter plot saved at: {plot_path}")
+
+    # Inference cost per model and evaluator, to pick the serving model on cost too
+    if args.headless:
+        output = args.output or os.path.join(model_dir, "evaluation")
+        with open(output + ".json", "w") as f:
+            json.dump({'batch_sizes': batch_sizes, 'models': evaluations}, f, indent=2)
+        pd.DataFrame(flatten(evaluations)).to_csv(output + ".csv", index=False)
+
+        print(f"\n{'model':>14}{'evaluator':>10}{'load s':>9}{'disk MB':>9}{'RSS MB':>8}"
+              f"{'p50 ms @1':>11}{'p99 ms @1':>11}{'rows/s @max':>13}")
+        for name, evaluation in evaluations.items():
+            for evaluator, stats in evaluation['evaluators'].items():
+                single, largest = stats['latency'][0], stats['latency'][-1]
+                print(f"{name:>14}{evaluator:>10}{stats['load_seconds']:>9.3f}{stats['disk_mb']:>9.2f}"
+                      f"{stats['rss_mb']:>8.1f}{single['p50_ms']:>11.3f}{single['p99_ms']:>11.3f}"
+                      f"{largest['rows_per_second']:>13.0f}")
+        print(f"\n✅ Benchmark results saved at: {output}.json and {output}.csv")
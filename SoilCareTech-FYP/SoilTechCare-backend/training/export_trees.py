@@ -0,0 +1,18 @@
+import os
+import sys
+
+import joblib
+
+# Allow running as `python training/export_trees.py` from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.tree_ensemble import exported_path, save_exported
+
+# Export already-trained models without retraining them
+model_dir = "backend/models"
+for name in ["XGBoost", "RandomForest", "LightGBM"]:
+    model_path = os.path.join(model_dir, f"{name}.pkl")
+    ensemble = save_exported(joblib.load(model_path), model_path)
+    if ensemble is None:
+        continue
+    print(f"✅ {name}: {ensemble.n_trees} trees, depth {ensemble.max_depth} -> {exported_path(model_path)}")
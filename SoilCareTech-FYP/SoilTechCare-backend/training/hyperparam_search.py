@@ -0,0 +1,216 @@
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from training.training_runner import cpu_budget
+
+BEST_PARAMS_NAME = "best_params.json"
+EARLY_STOPPING_ROUNDS = 20
+
+
+# Parameter names valid both for the native train() APIs and the sklearn wrappers
+# train_models.py builds, so a winning config can be passed straight through.
+def _sample_lightgbm(rng):
+    subsample = rng.uniform(0.5, 1.0)
+    return {
+        'num_leaves': int(round(math.exp(rng.uniform(math.log(4), math.log(64))))),
+        'learning_rate': math.exp(rng.uniform(math.log(0.01), math.log(0.3))),
+        'min_child_samples': rng.randint(2, 30),
+        'colsample_bytree': rng.uniform(0.2, 1.0),
+        'subsample': subsample,
+        'subsample_freq': 1 if subsample < 1.0 else 0,
+        'reg_lambda': math.exp(rng.uniform(math.log(1e-3), math.log(10.0))),
+    }
+
+
+def _sample_xgboost(rng):
+    return {
+        'max_depth': rng.randint(2, 8),
+        'learning_rate': math.exp(rng.uniform(math.log(0.01), math.log(0.3))),
+        'min_child_weight': math.exp(rng.uniform(math.log(0.5), math.log(10.0))),
+        'subsample': rng.uniform(0.5, 1.0),
+        'colsample_bytree': rng.uniform(0.2, 1.0),
+        'reg_lambda': math.exp(rng.uniform(math.log(1e-3), math.log(10.0))),
+    }
+
+
+SAMPLERS = {"LightGBM": _sample_lightgbm, "XGBoost": _sample_xgboost}
+
+
+def build_dataset_cache(X_fit, y_fit, X_valid, y_valid, cache_root):
+    """Native binary datasets, built once per distinct training split and reused"""
+    digest = hashlib.sha256()
+    for array in (X_fit, y_fit, X_valid, y_valid):
+        digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    cache_dir = os.path.join(cache_root, digest.hexdigest()[:16])
+    if os.path.exists(os.path.join(cache_dir, "ready")):
+        print(f"♻️ Reusing cached training datasets in {cache_dir}")
+        return cache_dir
+
+    import lightgbm as lgb
+    import xgboost as xgb
+
+    os.makedirs(cache_dir, exist_ok=True)
+    train = lgb.Dataset(X_fit, y_fit, params={'verbose': -1}, free_raw_data=False)
+    train.save_binary(os.path.join(cache_dir, "lgb_train.bin"))
+    lgb.Dataset(X_valid, y_valid, reference=train).save_binary(os.path.join(cache_dir, "lgb_valid.bin"))
+    xgb.DMatrix(X_fit, label=y_fit).save_binary(os.path.join(cache_dir, "xgb_train.buffer"))
+    xgb.DMatrix(X_valid, label=y_valid).save_binary(os.path.join(cache_dir, "xgb_valid.buffer"))
+    open(os.path.join(cache_dir, "ready"), "w").close()
+    print(f"✅ Cached LightGBM/XGBoost training datasets in {cache_dir}")
+    return cache_dir
+
+
+def _run_trial(name, params, rounds, cache_dir, seed):
+    """Train one config for up to `rounds` with early stopping on the validation split"""
+    start = time.perf_counter()
+    if name == "LightGBM":
+        import lightgbm as lgb
+
+        booster = lgb.train(
+            dict(params, objective='regression', metric='l1', verbose=-1, num_threads=1, seed=seed),
+            lgb.Dataset(os.path.join(cache_dir, "lgb_train.bin")),
+            num_boost_round=rounds,
+            valid_sets=[lgb.Dataset(os.path.join(cache_dir, "lgb_valid.bin"))],
+            callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)],
+        )
+        trained = booster.current_iteration()
+        best_iteration = booster.best_iteration or trained
+        valid_mae = booster.best_score['valid_0']['l1']
+    else:
+        import xgboost as xgb
+
+        history = {}
+        booster = xgb.train(
+            dict(params, objective='reg:squarederror', eval_metric='mae', nthread=1, seed=seed),
+            xgb.DMatrix(os.path.join(cache_dir, "xgb_train.buffer")),
+            num_boost_round=rounds,
+            evals=[(xgb.DMatrix(os.path.join(cache_dir, "xgb_valid.buffer")), 'valid')],
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+            evals_result=history,
+            verbose_eval=False,
+        )
+        trained = len(history['valid']['mae'])
+        best_iteration = booster.best_iteration + 1
+        valid_mae = booster.best_score
+    return {
+        'valid_mae': float(valid_mae),
+        'best_iteration': int(best_iteration),
+        'rounds_trained': int(trained),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def successive_halving(pool, name, cache_dir, n_configs=27, min_rounds=50, max_rounds=1350, eta=3, seed=42):
+    """Successive halving over random configs; the budget per config is boosting rounds.
+
+    Every rung trains the survivors with eta times more rounds and keeps the
+    best 1/eta. A config that early-stopped below its budget has converged,
+    so its result is carried up instead of being retrained.
+    """
+    rng = random.Random(seed)
+    configs = [SAMPLERS[name](rng) for _ in range(n_configs)]
+    results = {}
+    alive = list(range(n_configs))
+    rounds = min_rounds
+    runs = rounds_trained = rounds_stopped_early = 0
+    rung = 0
+
+    while True:
+        to_train = [i for i in alive if not results.get(i, {}).get('converged')]
+        futures = {i: pool.submit(_run_trial, name, configs[i], rounds, cache_dir, seed) for i in to_train}
+        for i, future in futures.items():
+            result = future.result()
+            result['converged'] = result['rounds_trained'] < rounds
+            result['rung'] = rung
+            results[i] = result
+            runs += 1
+            rounds_trained += result['rounds_trained']
+            rounds_stopped_early += rounds - result['rounds_trained']
+
+        best = min(results[i]['valid_mae'] for i in alive)
+        print(f"   {name} rung {rung}: {len(alive)} configs x {rounds} rounds "
+              f"({len(to_train)} trained), best valid MAE {best:.4f}")
+        if rounds >= max_rounds or len(alive) <= 1:
+            break
+        alive = sorted(alive, key=lambda i: results[i]['valid_mae'])[:max(1, len(alive) // eta)]
+        rounds = min(rounds * eta, max_rounds)
+        rung += 1
+
+    winner = min(alive, key=lambda i: results[i]['valid_mae'])
+    # What training every config to max_rounds without stopping would have cost
+    exhaustive_rounds = n_configs * max_rounds
+    return {
+        'params': configs[winner],
+        'n_estimators': results[winner]['best_iteration'],
+        'valid_mae': results[winner]['valid_mae'],
+        'stats': {
+            'configs': n_configs,
+            'trial_runs': runs,
+            'rungs': rung + 1,
+            'rounds_trained': rounds_trained,
+            'rounds_saved_by_early_stopping': rounds_stopped_early,
+            'exhaustive_rounds': exhaustive_rounds,
+            'compute_saved': round(1 - rounds_trained / exhaustive_rounds, 4),
+        },
+    }
+
+
+def run_search(X_train, y_train, model_dir, names=("LightGBM", "XGBoost"), n_configs=27,
+               min_rounds=50, max_rounds=1350, eta=3, budget=None, seed=42):
+    """Tune each model on a validation split of X_train and write best_params.json.
+
+    Starts its own process pool, so call it from under the script's
+    `if __name__ == "__main__":` guard; spawned workers re-import the script.
+    """
+    if multiprocessing.parent_process() is not None:
+        raise RuntimeError("run_search() called from a worker process; call it under the script's __main__ guard")
+    X_fit, X_valid, y_fit, y_valid = train_test_split(X_train, y_train, test_size=0.2, random_state=seed)
+    cache_dir = build_dataset_cache(X_fit, y_fit, X_valid, y_valid, os.path.join(model_dir, "search_cache"))
+    budget = budget or cpu_budget()
+
+    best = {}
+    start = time.perf_counter()
+    # Many small single-threaded trials at once use the cores better than few wide ones
+    with ProcessPoolExecutor(budget) as pool:
+        for name in names:
+            model_start = time.perf_counter()
+            best[name] = successive_halving(pool, name, cache_dir, n_configs, min_rounds, max_rounds, eta, seed)
+            stats = best[name]['stats']
+            hours = (time.perf_counter() - model_start) / 3600
+            stats['seconds'] = round(hours * 3600, 3)
+            stats['trials_per_hour'] = round(stats['trial_runs'] / hours, 1) if hours else 0.0
+            print(f"🔎 {name}: valid MAE {best[name]['valid_mae']:.4f} with {best[name]['n_estimators']} rounds; "
+                  f"{stats['trials_per_hour']:.0f} trials/hour, {stats['compute_saved']:.0%} of the "
+                  f"exhaustive boosting rounds saved")
+
+    report = {
+        'cpu_budget': budget,
+        'seconds': round(time.perf_counter() - start, 3),
+        'validation_rows': int(len(y_valid)),
+        'early_stopping_rounds': EARLY_STOPPING_ROUNDS,
+        'models': best,
+    }
+    path = os.path.join(model_dir, BEST_PARAMS_NAME)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Best configurations saved to {path}")
+    return report
+
+
+def load_best_params(model_dir):
+    """{model name: sklearn constructor kwargs} from a previous search, {} if none"""
+    path = os.path.join(model_dir, BEST_PARAMS_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        models = json.load(f)['models']
+    return {name: dict(best['params'], n_estimators=best['n_estimators']) for name, best in models.items()}
@@ -0,0 +1,328 @@
+import argparse
+import copy
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import train_test_split
+
+# Allow running as `python training/incremental_update.py` from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.feature_store import append_frame, frame_columns, load_frame
+from backend.registry import publish_version
+from backend.tree_ensemble import exported_path, save_exported
+
+TARGET = "Degradation-Level"
+MODEL_NAMES = ["XGBoost", "RandomForest", "LightGBM"]
+SERVING_MODEL = "LightGBM"
+RUNNING_SCALER = "scaler_running.pkl"
+HOLDOUT = "update_holdout.npz"
+HOLDOUT_MAX_ROWS = 5000
+REPORT_NAME = "update_report.json"
+TRAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "train_models.py")
+
+
+def read_new_rows(path, columns):
+    """New samples in the stored column order; features they lack are an error"""
+    new = pd.read_csv(path)
+    new.columns = new.columns.str.strip()
+    missing = [col for col in columns if col not in new.columns]
+    if missing:
+        raise ValueError(f"❌ {path} is missing {len(missing)} columns, e.g. {missing[:5]}")
+    return new[columns]
+
+
+def batch_id(frame):
+    """Content hash of a batch, so re-running the same file is recognised"""
+    return hashlib.sha256(frame.to_csv(index=False).encode()).hexdigest()
+
+
+def ledger_path(data_path):
+    return os.path.splitext(data_path)[0] + "_batches.json"
+
+
+def read_ledger(data_path):
+    """{batch id: "appended" | "applied"} for batches folded into data_path"""
+    path = ledger_path(data_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def mark_batch(data_path, batch, state):
+    ledger = read_ledger(data_path)
+    ledger[batch] = state
+    tmp_path = ledger_path(data_path) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(ledger, f, indent=2)
+    os.replace(tmp_path, ledger_path(data_path))
+
+
+def append_once(new, data_path, batch):
+    """Append the batch unless an earlier, interrupted run already did"""
+    if read_ledger(data_path).get(batch) is None:
+        append_frame(new, data_path)
+        mark_batch(data_path, batch, "appended")
+
+
+def load_holdout(model_dir, data_path, feature_columns):
+    """Validation rows for the gate: the train_models.py test split, then a reservoir of new rows.
+
+    Built from the full table once; every later update only adds to it.
+    """
+    path = os.path.join(model_dir, HOLDOUT)
+    if os.path.exists(path):
+        with np.load(path) as f:
+            return f["X"], f["y"], int(f["seen"])
+    df = load_frame(data_path)
+    df.fillna(df.median(), inplace=True)
+    _, X_test, _, y_test = train_test_split(df[feature_columns], df[TARGET], test_size=0.2, random_state=42)
+    X = X_test.to_numpy(np.float32)[:HOLDOUT_MAX_ROWS]
+    return X, y_test.to_numpy(np.float32)[:HOLDOUT_MAX_ROWS], len(X_test)
+
+
+def add_to_holdout(X, y, seen, X_new, y_new, rng):
+    """Reservoir sampling, so the holdout stays a uniform sample of size <= HOLDOUT_MAX_ROWS"""
+    X, y = list(X), list(y)
+    for row, target in zip(X_new.astype(np.float32), y_new.astype(np.float32)):
+        seen += 1
+        if len(X) < HOLDOUT_MAX_ROWS:
+            X.append(row)
+            y.append(target)
+        else:
+            slot = rng.randint(seen)
+            if slot < HOLDOUT_MAX_ROWS:
+                X[slot], y[slot] = row, target
+    return np.array(X, dtype=np.float32), np.array(y, dtype=np.float32), seen
+
+
+def mean_shift(X, scaler):
+    """Mean absolute shift of X's column means from the scaler's, in scaler std units"""
+    scale = np.sqrt(scaler.var_)
+    varying = scale > 0
+    shift = np.abs(X.mean(axis=0) - scaler.mean_)[varying] / scale[varying]
+    return float(shift.mean()) if shift.size else 0.0
+
+
+def n_trees(name, model):
+    if name == "XGBoost":
+        return model.get_booster().num_boosted_rounds()
+    if name == "LightGBM":
+        return model.booster_.current_iteration()
+    return len(model.estimators_)
+
+
+def continue_training(name, model, X, y, extra):
+    """Add `extra` trees fitted on the new rows only, keeping every existing tree"""
+    if name == "XGBoost":
+        total = n_trees(name, model) + extra
+        model.set_params(n_estimators=extra)
+        model.fit(X, y, xgb_model=model.get_booster())
+        model.set_params(n_estimators=total)
+    elif name == "LightGBM":
+        total = n_trees(name, model) + extra
+        model.set_params(n_estimators=extra)
+        model.fit(X, y, init_model=model.booster_)
+        model.set_params(n_estimators=total)
+    else:
+        # warm_start grows the forest: the old trees are kept, only the new ones see X
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + extra)
+        model.fit(X, y)
+        model.set_params(warm_start=False)
+    return model
+
+
+def full_retrain(reason, data_path, model_dir):
+    """Drift: retrain everything with train_models.py and reset the incremental state"""
+    print(f"⚠️ {reason}; falling back to a full retrain.")
+    subprocess.run([sys.executable, TRAIN_SCRIPT, "--data", data_path, "--model-dir", model_dir], check=True)
+    for name in (RUNNING_SCALER, HOLDOUT):
+        if os.path.exists(os.path.join(model_dir, name)):
+            os.remove(os.path.join(model_dir, name))
+
+
+def update(new_path, data_path, model_dir, batch_drift=1.0, total_drift=0.25, concept_factor=2.0,
+           max_mae_increase=0.05):
+    """Fold the rows of new_path into the stored data, scaler statistics and models.
+
+    Training cost scales with the new rows (plus the bounded holdout), not
+    the stored data. Publishing does not: the version's serving bundle is
+    rebuilt from, and the CSV re-hashed over, every stored row, so that step
+    stays O(total rows) per update. The models keep scoring in the space of
+    the serving scaler: their split thresholds are in those units, so the
+    serving scaler only moves to the running statistics at a full retrain,
+    which happens once the running means drift more than `total_drift` std
+    from it.
+
+    The rows are appended only once the models are saved (or just before a
+    full retrain, which trains on them), and each batch is recorded by
+    content hash: an applied batch is skipped, and one whose run was
+    interrupted after the append goes straight to a full retrain.
+    """
+    start = time.perf_counter()
+    timings = {}
+    columns = frame_columns(data_path)
+    feature_columns = [col for col in columns if col != TARGET]
+    new = read_new_rows(new_path, columns)
+    batch = batch_id(new)
+    state = read_ledger(data_path).get(batch)
+    if state == "applied":
+        print(f"ℹ️ {new_path} was already applied to {data_path}; nothing to do.")
+        return {'new_rows': len(new), 'decision': 'skipped', 'batch': batch}
+
+    scaler = joblib.load(os.path.join(model_dir, "scaler.pkl"))
+    running_path = os.path.join(model_dir, RUNNING_SCALER)
+    running = joblib.load(running_path) if os.path.exists(running_path) else copy.deepcopy(scaler)
+    models = {name: joblib.load(os.path.join(model_dir, f"{name}.pkl")) for name in MODEL_NAMES}
+    X_hold, y_hold, hold_seen = load_holdout(model_dir, data_path, feature_columns)
+    timings['load'] = time.perf_counter() - start
+
+    # Same fill as training, with the running means standing in for the medians
+    fill = pd.Series(running.mean_, index=feature_columns)
+    X_new = new[feature_columns].fillna(fill).to_numpy(np.float64)
+    y_new = new[TARGET].to_numpy(np.float64)
+
+    report = {
+        'new_rows': len(new),
+        'batch': batch,
+        'batch_shift': mean_shift(X_new, running),
+        'holdout_rows': len(y_hold),
+    }
+
+    # Gate 1: covariate drift of the batch, and the serving model's error on it
+    serving = models[SERVING_MODEL]
+    report['serving_mae_holdout'] = float(mean_absolute_error(y_hold, serving.predict(scaler.transform(X_hold))))
+    report['serving_mae_new'] = float(mean_absolute_error(y_new, serving.predict(scaler.transform(X_new))))
+    reason = None
+    if state == "appended":
+        reason = "An earlier run appended this batch but didn't finish"
+    elif report['batch_shift'] > batch_drift:
+        reason = f"New rows are {report['batch_shift']:.2f} std from the running means (limit {batch_drift})"
+    elif report['serving_mae_new'] > concept_factor * report['serving_mae_holdout']:
+        reason = (f"{SERVING_MODEL} MAE on the new rows is {report['serving_mae_new']:.3f} vs "
+                  f"{report['serving_mae_holdout']:.3f} on the holdout")
+
+    if reason is None:
+        step = time.perf_counter()
+        running.partial_fit(X_new)
+        report['total_shift'] = mean_shift(running.mean_[None, :], scaler)
+        if report['total_shift'] > total_drift:
+            reason = (f"Running means drifted {report['total_shift']:.2f} std from the serving scaler "
+                      f"(limit {total_drift})")
+        timings['scaler'] = time.perf_counter() - step
+
+    if reason is None:
+        # Hold back a fifth of the batch for the gate, as train_models.py does
+        if len(new) >= 5:
+            X_fit, X_val, y_fit, y_val = train_test_split(X_new, y_new, test_size=0.2, random_state=42)
+        else:
+            X_fit, y_fit, X_val, y_val = X_new, y_new, X_new[:0], y_new[:0]
+        X_fit_scaled = scaler.transform(X_fit)
+        X_gate = scaler.transform(np.vstack([X_hold, X_val]))
+        y_gate = np.concatenate([y_hold, y_val])
+        rows_seen = int(np.max(running.n_samples_seen_))
+
+        report['models'] = {}
+        for name, model in models.items():
+            step = time.perf_counter()
+            before = float(mean_absolute_error(y_gate, model.predict(X_gate)))
+            trees = n_trees(name, model)
+            # New trees in proportion to the new rows' share of everything seen
+            extra = max(1, int(round(trees * len(y_fit) / rows_seen)))
+            continue_training(name, model, X_fit_scaled, y_fit, extra)
+            after = float(mean_absolute_error(y_gate, model.predict(X_gate)))
+            report['models'][name] = {
+                'trees_before': trees, 'trees_added': extra,
+                'mae_before': before, 'mae_after': after,
+                'seconds': round(time.perf_counter() - step, 3),
+            }
+            print(f"✅ {name}: +{extra} trees on {len(y_fit)} rows, gate MAE {before:.4f} -> {after:.4f}")
+            if after > before * (1 + max_mae_increase) + 1e-12 and reason is None:
+                reason = f"{name} gate MAE rose from {before:.4f} to {after:.4f}"
+
+    if reason is not None:
+        report['decision'] = 'full_retrain'
+        report['reason'] = reason
+        # Keep every sample regardless of what happens to the models
+        append_once(new, data_path, batch)
+        full_retrain(reason, data_path, model_dir)
+    else:
+        step = time.perf_counter()
+        for name, model in models.items():
+            model_path = os.path.join(model_dir, f"{name}.pkl")
+            joblib.dump(model, model_path)
+            save_exported(model, model_path)
+        joblib.dump(running, running_path)
+        X_hold, y_hold, hold_seen = add_to_holdout(X_hold, y_hold, hold_seen, X_val, y_val,
+                                                   np.random.RandomState(hold_seen))
+        np.savez(os.path.join(model_dir, HOLDOUT), X=X_hold, y=y_hold, seen=hold_seen)
+        timings['save'] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        append_once(new, data_path, batch)
+        timings['append'] = time.perf_counter() - step
+
+        report['decision'] = 'incremental'
+        serving_files = [
+            os.path.join(model_dir, f"{SERVING_MODEL}.pkl"),
+            os.path.join(model_dir, "scaler.pkl"),
+            os.path.join(model_dir, "feature_names.npy"),
+        ]
+        trees_path = exported_path(os.path.join(model_dir, f"{SERVING_MODEL}.pkl"))
+        if os.path.exists(trees_path):
+            serving_files.append(trees_path)
+        report['version'] = publish_version(
+            serving_files,
+            os.path.join(model_dir, "registry"),
+            metadata={'model': SERVING_MODEL, 'rows': rows_seen, 'features': len(feature_columns),
+                      'incremental': report['models'][SERVING_MODEL]},
+            data_path=data_path,
+        )
+        print(f"✅ Published model version {report['version']} to the registry")
+    mark_batch(data_path, batch, "applied")
+
+    report['seconds'] = {name: round(value, 3) for name, value in timings.items()}
+    report['seconds']['total'] = round(time.perf_counter() - start, 3)
+    with open(os.path.join(model_dir, REPORT_NAME), "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"⏱️ {report['decision']} update of {len(new)} rows took {report['seconds']['total']:.1f}s")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold new soil samples into the stored data and models")
+    parser.add_argument("--new", required=True, help="CSV of new rows with the merged_features.csv columns")
+    parser.add_argument("--data", default="outputs/merged_features.csv")
+    parser.add_argument("--model-dir", default="backend/models")
+    parser.add_argument("--batch-drift", type=float, default=1.0,
+                        help="Retrain fully when the batch means are this many std off")
+    parser.add_argument("--total-drift", type=float, default=0.25,
+                        help="Retrain fully when the running means move this many std from the serving scaler")
+    parser.add_argument("--max-mae-increase", type=float, default=0.05,
+                        help="Retrain fully when an updated model's gate MAE rises by more than this")
+    parser.add_argument("--full", action="store_true", help="Skip the incremental path and retrain everything")
+    args = parser.parse_args()
+
+    if args.full:
+        new = read_new_rows(args.new, frame_columns(args.data))
+        batch = batch_id(new)
+        if read_ledger(args.data).get(batch) == "applied":
+            print(f"ℹ️ {args.new} was already applied to {args.data}; nothing to do.")
+            raise SystemExit(0)
+        append_once(new, args.data, batch)
+        full_retrain("--full given", args.data, args.model_dir)
+        mark_batch(args.data, batch, "applied")
+    elif update(args.new, args.data, args.model_dir, args.batch_drift, args.total_drift,
+                max_mae_increase=args.max_mae_increase)['decision'] == 'skipped':
+        raise SystemExit(0)
+    print("ℹ️ The published version carries its own serving bundle; without the registry, "
+          "rebuild backend/models/bundle (training/build_bundle.py) to serve the new samples.")
@@ -0,0 +1,114 @@
+import os
+import time
+
+import joblib
+import numpy as np
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from backend.memory import process_memory
+from backend.tree_ensemble import exported_path, load_exported
+from training.training_runner import _peak_rss_mb
+
+MB = 1024 * 1024
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+
+
+def _rss_mb():
+    return process_memory().get('rss', 0) / MB
+
+
+def latency_profile(predict, X, batch_sizes, repeats):
+    """Per-call latency percentiles and throughput of `predict` at each batch size.
+
+    Batches cycle through the rows of X, so sizes above len(X) still work.
+    Small batches get more calls so their tail percentiles mean something.
+    """
+    profile = []
+    for batch_size in batch_sizes:
+        batch = np.ascontiguousarray(X[np.arange(batch_size) % len(X)])
+        predict(batch)  # warm-up: lazy allocations, thread pools
+        calls = max(repeats, 1000 // batch_size)
+        latencies = np.empty(calls)
+        for i in range(calls):
+            start = time.perf_counter()
+            predict(batch)
+            latencies[i] = time.perf_counter() - start
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        profile.append({
+            'batch_size': batch_size,
+            'calls': calls,
+            'p50_ms': round(float(p50), 4),
+            'p95_ms': round(float(p95), 4),
+            'p99_ms': round(float(p99), 4),
+            'mean_ms': round(float(latencies.mean() * 1000), 4),
+            'rows_per_second': round(batch_size / float(latencies.mean()), 1),
+        })
+    return profile
+
+
+def _load(loader, path):
+    rss = _rss_mb()
+    start = time.perf_counter()
+    model = loader(path)
+    return model, {
+        'load_seconds': round(time.perf_counter() - start, 4),
+        'disk_mb': round(os.path.getsize(path) / MB, 3),
+        'rss_mb': round(_rss_mb() - rss, 2),
+    }
+
+
+def evaluate_model(name, model_path, data_dir, batch_sizes=(), repeats=20):
+    """Runs in its own process: accuracy and, with batch_sizes, serving cost of one model.
+
+    Both evaluators are measured: the pickled model and the packed trees
+    that the server uses when they are up to date.
+    """
+    X = np.load(os.path.join(data_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(data_dir, "y.npy"))
+
+    model, native = _load(joblib.load, model_path)
+    if 'n_jobs' in model.get_params():
+        # One core per model, so models benchmarked side by side don't contend
+        model.set_params(n_jobs=1)
+    y_pred = model.predict(X)
+    result = {
+        'model': name,
+        'accuracy': {
+            'MAE': float(mean_absolute_error(y, y_pred)),
+            'MSE': float(mean_squared_error(y, y_pred)),
+            'R2 Score': float(r2_score(y, y_pred)),
+        },
+        'predictions': y_pred.tolist(),
+        'evaluators': {},
+    }
+    if not batch_sizes:
+        return result
+
+    native['latency'] = latency_profile(model.predict, X, batch_sizes, repeats)
+    result['evaluators']['native'] = native
+
+    trees, packed = _load(load_exported, model_path)
+    if trees is not None:
+        packed['disk_mb'] = round(os.path.getsize(exported_path(model_path)) / MB, 3)
+        packed['latency'] = latency_profile(trees.predict, X, batch_sizes, repeats)
+        result['evaluators']['packed'] = packed
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def flatten(results):
+    """One CSV row per model, evaluator and batch size"""
+    rows = []
+    for result in results.values():
+        for evaluator, stats in result['evaluators'].items():
+            for point in stats['latency']:
+                rows.append({
+                    'model': result['model'],
+                    'evaluator': evaluator,
+                    **result['accuracy'],
+                    'load_seconds': stats['load_seconds'],
+                    'disk_mb': stats['disk_mb'],
+                    'rss_mb': stats['rss_mb'],
+                    **point,
+                })
+    return rows
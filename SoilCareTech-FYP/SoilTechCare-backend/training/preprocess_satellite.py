@@ -1,61 +1,152 @@
+import argparse
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import rasterio
 import numpy as np
 from PIL import Image
-from skimage import exposure
 
-# Function to read a specific band of a Sentinel-2 image
-def read_band(image_path, band_number):
-    with rasterio.open(image_path) as src:
-        band = src.read(band_number)  # Reading the specific band (1-indexed)
-        return band
+MB = 1024 * 1024
 
-# Function to preprocess the image
-def preprocess_image(image_path, output_path, resize_dim=(256, 256)):
-    print(f"Processing {image_path}...")
+# Sentinel-2 B2, B3, B4 are bands 1-3 of the exports; written out as R, G, B
+BANDS = [1, 2, 3]
+RGB_CHANNEL = {1: 2, 2: 1, 3: 0}  # B2 -> blue, B3 -> green, B4 -> red
+
+
+def equalize_hist(band, nbins=256):
+    """skimage.exposure.equalize_hist for a float32 band, without float64 copies.
+
+    Same mapping: a 256-bin histogram over the band's range, and each pixel
+    interpolated on the CDF between bin centres.
+    """
+    low, high = float(band.min()), float(band.max())
+    if low == high:
+        # np.histogram's convention for a constant band
+        low, high = low - 0.5, high + 0.5
+    # Position of each pixel in bins; bin i spans [i, i + 1)
+    position = band - np.float32(low)
+    position *= np.float32(nbins / (high - low))
+    bins = np.minimum(position.astype(np.int32), nbins - 1)
+    cdf = np.bincount(bins.ravel(), minlength=nbins).cumsum().astype(np.float32)
+    cdf /= cdf[-1]
+
+    # Linear interpolation between the CDF values at neighbouring bin centres
+    position -= np.float32(0.5)
+    left = np.clip(position.astype(np.int32), 0, nbins - 2)  # truncates toward 0, so -0.5 -> 0
+    position -= left
+    np.clip(position, 0, 1, out=position)
+    return cdf[left] + position * (cdf[left + 1] - cdf[left])
 
-    # Read the individual bands (B2, B3, B4)
-    b2 = read_band(image_path, 1)  # Blue band (B2)
-    b3 = read_band(image_path, 2)  # Green band (B3)
-    b4 = read_band(image_path, 3)  # Red band (B4)
+
+def preprocess_image(image_path, output_path, resize_dim=(256, 256)):
+    """Equalized RGB PNG from one GeoTIFF; returns per-file stats"""
+    start = time.perf_counter()
+    # One open and one read for all three bands, straight into float32
+    with rasterio.open(image_path) as src:
+        bands = src.read(BANDS, out_dtype="float32")
 
     # Handle NaN values by replacing them with 0
-    b2 = np.nan_to_num(b2, nan=0)
-    b3 = np.nan_to_num(b3, nan=0)
-    b4 = np.nan_to_num(b4, nan=0)
+    np.nan_to_num(bands, copy=False, nan=0)
+
+    rgb_image = np.empty(bands.shape[1:] + (3,), dtype=np.uint8)
+    for band_number, band in zip(BANDS, bands):
+        # Scale to 0-255; the assignment truncates to uint8 like astype did
+        rgb_image[..., RGB_CHANNEL[band_number]] = equalize_hist(band) * 255
+
+    # Resize to the model input size and write atomically, so an interrupted run
+    # never leaves a truncated PNG that looks up to date
+    resized_image = Image.fromarray(rgb_image).resize(resize_dim, Image.Resampling.LANCZOS)
+    tmp_path = output_path + ".tmp"
+    resized_image.save(tmp_path, format='PNG')
+    os.replace(tmp_path, output_path)
+    return {
+        'file': os.path.basename(image_path),
+        'pixels': int(bands.shape[1] * bands.shape[2]),
+        'bytes': os.path.getsize(image_path),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def output_path_for(filename, output_folder):
+    return os.path.join(output_folder, f"processed_{filename.split('.')[0]}.png")
 
-    # Apply histogram equalization
-    b2 = exposure.equalize_hist(b2) * 255  # Scale to 0-255
-    b3 = exposure.equalize_hist(b3) * 255  # Scale to 0-255
-    b4 = exposure.equalize_hist(b4) * 255  # Scale to 0-255
 
-    # Stack bands into an RGB image
-    rgb_image = np.stack([b4, b3, b2], axis=-1)  # Red, Green, Blue
+def up_to_date(input_path, output_path):
+    return os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path)
 
-    # Convert the numpy array to a PIL image
-    rgb_image_pil = Image.fromarray(rgb_image.astype(np.uint8))
 
-    # Resize the image to the specified dimensions
-    resized_image = rgb_image_pil.resize(resize_dim, Image.Resampling.LANCZOS)
+def process_all_images(input_folder, output_folder, resize_dim=(256, 256), workers=None, force=False):
+    """Preprocess every .tif in input_folder across a process pool.
 
-    # Save the resized image (PNG format)
-    resized_image.save(output_path, format='PNG')
+    Files whose PNG is newer than the .tif are skipped unless force=True.
+    Returns aggregate throughput stats.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    jobs, skipped = [], 0
+    for filename in sorted(os.listdir(input_folder)):
+        if not filename.endswith('.tif'):  # Only process .tif files
+            continue
+        input_image_path = os.path.join(input_folder, filename)
+        output_image_path = output_path_for(filename, output_folder)
+        if not force and up_to_date(input_image_path, output_image_path):
+            skipped += 1
+            continue
+        jobs.append((input_image_path, output_image_path))
+    print(f"ℹ️ {len(jobs)} to process, {skipped} up to date")
 
-# Function to process all images in a folder
-def process_all_images(input_folder, output_folder, resize_dim=(256, 256)):
-    for filename in os.listdir(input_folder):
-        if filename.endswith('.tif'):  # Only process .tif files
-            input_image_path = os.path.join(input_folder, filename)
-            output_image_path = os.path.join(output_folder, f"processed_{filename.split('.')[0]}.png")
+    start = time.perf_counter()
+    results, failed = [], 0
+    if jobs:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+        with ProcessPoolExecutor(workers) as pool:
+            futures = {pool.submit(preprocess_image, src, dst, resize_dim): src for src, dst in jobs}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ {futures[future]}: {e}")
+                    continue
+                results.append(result)
+                print(f"✅ [{len(results) + failed}/{len(jobs)}] {result['file']}: {result['pixels'] / 1e6:.2f} Mpx "
+                      f"in {result['seconds']:.2f}s ({result['pixels'] / 1e6 / result['seconds']:.2f} Mpx/s)")
 
-            preprocess_image(input_image_path, output_image_path, resize_dim=resize_dim)
+    seconds = time.perf_counter() - start
+    pixels = sum(r['pixels'] for r in results)
+    size = sum(r['bytes'] for r in results)
+    return {
+        'processed': len(results),
+        'skipped': skipped,
+        'failed': failed,
+        'workers': workers if jobs else 0,
+        'seconds': seconds,
+        'files_per_second': len(results) / seconds if seconds else 0.0,
+        'mpx_per_second': pixels / 1e6 / seconds if seconds else 0.0,
+        'mb_per_second': size / MB / seconds if seconds else 0.0,
+        # Sum of per-file times over wall time: how many workers were kept busy
+        'parallelism': sum(r['seconds'] for r in results) / seconds if seconds else 0.0,
+    }
 
-# Specify your input and output folders
-input_folder = r'D:\projects\SoilTechCare-backend\dataset\images\raw_images'
-output_folder = r'D:\projects\SoilTechCare-backend\dataset\images\pre_processed_images'
 
-# Define the desired image size (e.g., 224x224 for deep learning models)
-resize_dim = (224, 224)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Equalize and resize the Sentinel-2 GeoTIFFs into RGB PNG tiles")
+    parser.add_argument("--input", default="dataset/images/raw_images")
+    parser.add_argument("--output", default="dataset/images/preprocessed_images")
+    # The desired image size (e.g., 224x224 for deep learning models)
+    parser.add_argument("--size", type=int, default=224, help="Output width and height")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Files processed at once")
+    parser.add_argument("--force", action="store_true", help="Reprocess files whose PNG is already up to date")
+    args = parser.parse_args()
 
-# Process all images in the folder
-process_all_images(input_folder, output_folder, resize_dim=resize_dim)
+    stats = process_all_images(args.input, args.output, resize_dim=(args.size, args.size),
+                               workers=args.workers, force=args.force)
+    if not stats['processed'] and not stats['failed']:
+        print(f"✅ Nothing to do, all {stats['skipped']} tiles are up to date")
+        raise SystemExit(0)
+    print(f"⏱️ {stats['processed']} files in {stats['seconds']:.1f}s with {stats['workers']} workers: "
+          f"{stats['files_per_second']:.1f} files/s, {stats['mpx_per_second']:.1f} Mpx/s, "
+          f"{stats['mb_per_second']:.1f} MB/s read, {stats['parallelism']:.1f} workers busy on average "
+          f"({stats['skipped']} skipped, {stats['failed']} failed)")
+    if stats['failed']:
+        raise SystemExit(1)
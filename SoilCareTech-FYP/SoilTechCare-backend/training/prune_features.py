@@ -0,0 +1,72 @@
+import json
+import os
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.preprocessing import StandardScaler
+
+from backend.tree_ensemble import save_exported
+
+
+def select_features(model, feature_columns, top_k=None):
+    """Features the trained model splits on, or its top_k by importance"""
+    importances = np.asarray(model.feature_importances_, dtype=np.float64)
+    if top_k:
+        order = np.argsort(-importances, kind="stable")[:top_k]
+        keep = order[importances[order] > 0]
+    else:
+        keep = np.flatnonzero(importances > 0)
+    return [feature_columns[i] for i in sorted(keep)]
+
+
+def build_pruned_variant(name, model, full_scaler, X_train, X_test, y_train, y_test, out_dir,
+                         top_k=None, max_mae_increase=0.02):
+    """Refit `model` on its used features only and save it if accuracy holds.
+
+    Trees never look at unused columns, so the pruned model should score the
+    same as the full one; the check guards against top_k cutting real splits.
+    The scaler is refit on the kept columns, which gives the same per-column
+    statistics as slicing the full scaler.
+    """
+    feature_columns = list(X_train.columns)
+    kept = select_features(model, feature_columns, top_k)
+
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train[kept])
+    X_test_scaled = scaler.transform(X_test[kept])
+    pruned = clone(model).fit(X_train_scaled, y_train)
+
+    full_pred = model.predict(full_scaler.transform(X_test))
+    pruned_pred = pruned.predict(X_test_scaled)
+    report = {
+        'model': name,
+        'top_k': top_k,
+        'features_full': len(feature_columns),
+        'features_kept': len(kept),
+        'mae_full': float(mean_absolute_error(y_test, full_pred)),
+        'mae_pruned': float(mean_absolute_error(y_test, pruned_pred)),
+        'r2_full': float(r2_score(y_test, full_pred)),
+        'r2_pruned': float(r2_score(y_test, pruned_pred)),
+        'max_abs_prediction_diff': float(np.abs(full_pred - pruned_pred).max()),
+    }
+    allowed = report['mae_full'] * (1 + max_mae_increase)
+    report['accepted'] = report['mae_pruned'] <= allowed + 1e-12
+
+    print(f"✂️ {name}: {len(kept)}/{len(feature_columns)} features, "
+          f"MAE {report['mae_full']:.4f} -> {report['mae_pruned']:.4f}")
+    if not report['accepted']:
+        print(f"⚠️ Pruned {name} loses more than {max_mae_increase:.0%} MAE, not saved.")
+        return report
+
+    os.makedirs(out_dir, exist_ok=True)
+    model_path = os.path.join(out_dir, f"{name}.pkl")
+    joblib.dump(pruned, model_path)
+    joblib.dump(scaler, os.path.join(out_dir, "scaler.pkl"))
+    np.save(os.path.join(out_dir, "feature_names.npy"), np.array(kept))
+    save_exported(pruned, model_path)
+    with open(os.path.join(out_dir, "prune_report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Pruned {name} serving variant saved to {out_dir}")
+    return report
@@ -1,4 +1,3 @@
-import pandas as pd
 import joblib
 import xgboost as xgb
 import lightgbm as lgb
@@ -6,61 +5,140 @@ import numpy as np
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
+import argparse
 import os
+import sys
 
-# Create directory if not exists
-model_dir = r'E:\projects\backup project\SoilTechCare-backend\backend\models'
-os.makedirs(model_dir, exist_ok=True)
+# Allow running as `python training/train_models.py` from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Load updated dataset
-df = pd.read_csv(r'outputs\merged_features.csv')
+from backend.bundle import build_model_bundle
+from backend.feature_store import load_frame
+from backend.embedding_projection import PROJECTION_NAME, EmbeddingProjection
+from backend.registry import publish_version
+from backend.tree_ensemble import exported_path
+from training.hyperparam_search import load_best_params, run_search
+from training.prune_features import build_pruned_variant
+from training.training_runner import fit_models
 
-# Automatically detect feature columns (excluding target)
-target_column = "Degradation-Level"
-if target_column not in df.columns:
-    raise ValueError("❌ 'Degradation-Level' column is missing from dataset!")
 
-feature_columns = [col for col in df.columns if col != target_column]
+def main():
+    """Train, prune and publish the soil degradation models"""
+    parser = argparse.ArgumentParser(description="Train the soil degradation models")
+    parser.add_argument("--search", action="store_true",
+                        help="Tune LightGBM/XGBoost with successive halving first and train with the winners")
+    parser.add_argument("--data", default=os.path.join("outputs", "merged_features.csv"))
+    parser.add_argument("--model-dir", default=os.path.join("backend", "models"))
+    parser.add_argument("--prune-top-k", type=int, default=None,
+                        help="Keep the top-k features by importance in the pruned variant "
+                             "(default: every feature the serving model splits on)")
+    args = parser.parse_args()
 
-# Log dataset structure
-print(f"✅ Loaded dataset with {df.shape[0]} rows & {df.shape[1]} columns.")
-print(f"✅ Features used for training: {feature_columns}")
+    # Create directory if not exists
+    model_dir = args.model_dir
+    os.makedirs(model_dir, exist_ok=True)
 
-# Handle missing values
-df.fillna(df.median(), inplace=True)
+    # Load updated dataset
+    data_path = args.data
+    df = load_frame(data_path)
 
-# Split features & target
-X = df[feature_columns]
-y = df[target_column]
+    # Automatically detect feature columns (excluding target)
+    target_column = "Degradation-Level"
+    if target_column not in df.columns:
+        raise ValueError("❌ 'Degradation-Level' column is missing from dataset!")
 
-# Save feature names (for prediction consistency)
-feature_names_path = os.path.join(model_dir, "feature_names.npy")
-np.save(feature_names_path, np.array(feature_columns))
+    feature_columns = [col for col in df.columns if col != target_column]
 
-# Train-Test Split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Log dataset structure
+    print(f"✅ Loaded dataset with {df.shape[0]} rows & {df.shape[1]} columns.")
+    print(f"✅ Features used for training: {feature_columns}")
 
-# Feature Scaling (only for numerical features)
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
+    # Handle missing values
+    df.fillna(df.median(), inplace=True)
 
-# Save the scaler
-scaler_path = os.path.join(model_dir, "scaler.pkl")
-joblib.dump(scaler, scaler_path)
+    # Split features & target
+    X = df[feature_columns]
+    y = df[target_column]
 
-# Initialize models
-models = {
-    "XGBoost": xgb.XGBRegressor(),
-    "RandomForest": RandomForestRegressor(n_estimators=100, random_state=42),
-    "LightGBM": lgb.LGBMRegressor()
-}
+    # Save feature names (for prediction consistency)
+    feature_names_path = os.path.join(model_dir, "feature_names.npy")
+    np.save(feature_names_path, np.array(feature_columns))
 
-# Train and save models
-for name, model in models.items():
-    model.fit(X_train_scaled, y_train)
-    model_path = os.path.join(model_dir, f"{name}.pkl")
-    joblib.dump(model, model_path)
-    print(f"✅ {name} model trained & saved at {model_path}")
+    # Train-Test Split
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-print("\n✅ All models, scaler, & feature names saved successfully!")
+    # Feature Scaling (only for numerical features)
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+
+    # Save the scaler
+    scaler_path = os.path.join(model_dir, "scaler.pkl")
+    joblib.dump(scaler, scaler_path)
+
+    # Tuned configurations (best_params.json) replace the library defaults when present
+    if args.search:
+        run_search(X_train_scaled, y_train.to_numpy(), model_dir)
+    best_params = load_best_params(model_dir)
+
+    # Initialize models
+    models = {
+        "XGBoost": xgb.XGBRegressor(**best_params.get("XGBoost", {})),
+        "RandomForest": RandomForestRegressor(n_estimators=100, random_state=42),
+        "LightGBM": lgb.LGBMRegressor(**best_params.get("LightGBM", {}))
+    }
+
+    # Train and save models concurrently, splitting the cores between them
+    # (SOIL_TRAIN_CPUS caps the budget; SOIL_TRAIN_SEQUENTIAL=1 fits one at a time).
+    # Wall/CPU time and peak memory per model go to training_report.json.
+    models, training_report = fit_models(
+        models, X_train_scaled, y_train, model_dir,
+        parallel=os.environ.get('SOIL_TRAIN_SEQUENTIAL', '0') != '1',
+    )
+
+    print("\n✅ All models, scaler, & feature names saved successfully!")
+
+    # Pruned serving variant: only the columns the serving model splits on
+    # (--prune-top-k keeps the top-k by importance instead)
+    SERVING_MODEL = "LightGBM"
+    pruned_dir = os.path.join(model_dir, "pruned")
+    pruned_report = build_pruned_variant(
+        SERVING_MODEL, models[SERVING_MODEL], scaler, X_train, X_test, y_train, y_test,
+        pruned_dir, top_k=args.prune_top_k,
+    )
+    if pruned_report['accepted']:
+        # Served with SOIL_MODEL_DIR pointing at it, so it gets its own bundle
+        build_model_bundle(pruned_dir, data_path)
+
+    # Publish the serving artifacts as a new registry version; running servers
+    # validate it and swap it in without a restart
+    serving_files = [
+        os.path.join(model_dir, f"{SERVING_MODEL}.pkl"),
+        scaler_path,
+        feature_names_path,
+    ]
+    # Absent when the model couldn't be packed; the server then uses the native model
+    trees_path = exported_path(os.path.join(model_dir, f"{SERVING_MODEL}.pkl"))
+    if os.path.exists(trees_path):
+        serving_files.append(trees_path)
+    metadata = {
+        'model': SERVING_MODEL, 'rows': int(df.shape[0]), 'features': len(feature_columns),
+        'training': training_report['models'][SERVING_MODEL],
+    }
+    # Features built from compressed embeddings ship with their projection, so
+    # images embedded later are projected the same way
+    projection_path = os.path.join(model_dir, PROJECTION_NAME)
+    if os.path.exists(projection_path):
+        projection = EmbeddingProjection.load(projection_path)
+        if projection.dim == sum(col.isdigit() for col in feature_columns):
+            serving_files.append(projection_path)
+            metadata['embedding_projection'] = projection.describe()
+    version = publish_version(serving_files, os.path.join(model_dir, "registry"), metadata=metadata,
+                              data_path=data_path)
+    print(f"✅ Published model version {version} to the registry")
+
+
+# Spawned pool workers (Windows, macOS) re-import this module, so training
+# only runs when executed directly
+if __name__ == "__main__":
+    main()
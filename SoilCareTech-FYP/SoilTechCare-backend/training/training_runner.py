@@ -0,0 +1,158 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+
+from backend.tree_ensemble import save_exported
+
+REPORT_NAME = "training_report.json"
+
+
+def cpu_budget():
+    """Cores this process may use (SOIL_TRAIN_CPUS overrides)"""
+    if os.environ.get("SOIL_TRAIN_CPUS"):
+        return int(os.environ["SOIL_TRAIN_CPUS"])
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def split_threads(budget, weights):
+    """Share `budget` threads between models in proportion to `weights`, at least 1 each.
+
+    The total never exceeds the budget unless there are more models than threads.
+    """
+    names = list(weights)
+    total = sum(weights.values()) or len(names)
+    shares = {name: max(1, int(budget * weights[name] / total)) for name in names}
+    # Rounding small shares up to 1 can overshoot; take it back from the largest
+    while sum(shares.values()) > budget and max(shares.values()) > 1:
+        shares[max(names, key=lambda n: shares[n])] -= 1
+    # Hand out what rounding left over, heaviest models first
+    spare = budget - sum(shares.values())
+    for name in sorted(names, key=lambda n: -weights[n]):
+        if spare <= 0:
+            break
+        shares[name] += 1
+        spare -= 1
+    return shares
+
+
+def previous_weights(report_path, names):
+    """Last run's CPU seconds per model, so slower models get more threads"""
+    try:
+        with open(report_path) as f:
+            models = json.load(f)["models"]
+        return {name: max(models[name]["cpu_seconds"], 1e-3) for name in names}
+    except (OSError, ValueError, KeyError):
+        return {name: 1.0 for name in names}
+
+
+def _peak_rss_mb():
+    """Peak RSS of this process. Only meaningful in a spawned child: a forked
+    one starts with the parent's pages and ru_maxrss counts them too."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _fit_one(name, model, n_jobs, data_dir, model_dir):
+    """Runs in its own process, so CPU time and peak RSS belong to this model alone"""
+    X = np.load(os.path.join(data_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(data_dir, "y.npy"), mmap_mode="r")
+    model.set_params(n_jobs=n_jobs)
+
+    baseline_rss = _peak_rss_mb()
+    wall, cpu = time.perf_counter(), time.process_time()
+    model.fit(X, y)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    model_path = os.path.join(model_dir, f"{name}.pkl")
+    joblib.dump(model, model_path)
+    # Packed node arrays for the allocation-free evaluator used in serving
+    save_exported(model, model_path)
+    peak_rss = _peak_rss_mb()
+    return {
+        'n_jobs': n_jobs,
+        'wall_seconds': round(wall, 3),
+        'cpu_seconds': round(cpu, 3),
+        # Cores kept busy on average; close to n_jobs means the share was used
+        'cpu_utilisation': round(cpu / wall, 2) if wall else 0.0,
+        'peak_rss_mb': peak_rss,
+        # What the fit itself added on top of the interpreter and libraries
+        'fit_rss_mb': round(peak_rss - baseline_rss, 2) if peak_rss is not None else None,
+        'model_path': model_path,
+    }
+
+
+def fit_models(models, X, y, model_dir, budget=None, parallel=True):
+    """Fit every model in its own process under one CPU budget.
+
+    With parallel=True the models train concurrently, no more at once than
+    cores in the budget, and the budget is split between their n_jobs (by
+    last run's CPU time when a report exists); otherwise they run one after
+    another with the whole budget each. Writes training_report.json and
+    returns (fitted models, report).
+    """
+    budget = budget or cpu_budget()
+    report_path = os.path.join(model_dir, REPORT_NAME)
+    weights = previous_weights(report_path, models)
+    names = list(models)
+    concurrent = min(len(names), budget) if parallel else 1
+
+    # Children memory-map the training matrix instead of unpickling a copy each
+    data_dir = tempfile.mkdtemp(prefix="soil-train-")
+    np.save(os.path.join(data_dir, "X.npy"), np.ascontiguousarray(X))
+    np.save(os.path.join(data_dir, "y.npy"), np.asarray(y))
+
+    start = time.perf_counter()
+    results = {}
+    try:
+        for first in range(0, len(names), concurrent):
+            wave = names[first:first + concurrent]
+            threads = split_threads(budget, {name: weights[name] for name in wave})
+            # A single-use spawned pool per model: pool workers are reused, and a
+            # reused (or forked) process would carry CPU time and memory it
+            # didn't use into this model's figures
+            pools = {name: ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"))
+                     for name in wave}
+            try:
+                futures = {
+                    name: pools[name].submit(_fit_one, name, models[name], threads[name], data_dir, model_dir)
+                    for name in wave
+                }
+                for name, future in futures.items():
+                    results[name] = future.result()
+                    r = results[name]
+                    print(f"✅ {name} trained on {r['n_jobs']} thread(s) in {r['wall_seconds']:.1f}s "
+                          f"({r['cpu_seconds']:.1f}s CPU) & saved at {r['model_path']}")
+            finally:
+                for pool in pools.values():
+                    pool.shutdown()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        'cpu_budget': budget,
+        'mode': 'parallel' if parallel else 'sequential',
+        'rows': int(X.shape[0]),
+        'features': int(X.shape[1]),
+        'wall_seconds': round(time.perf_counter() - start, 3),
+        'cpu_seconds': round(sum(r['cpu_seconds'] for r in results.values()), 3),
+        'models': results,
+    }
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"⏱️ Training took {report['wall_seconds']:.1f}s wall on {budget} core(s); report at {report_path}")
+
+    fitted = {name: joblib.load(results[name]['model_path']) for name in models}
+    return fitted, report
@@ -1,15 +1,23 @@
+import os
+import sys
+
 import pandas as pd
 
-# Load feature dataset (without coordinates)
-df_features = pd.read_csv("outputs\merged_features.csv")
+# Allow running as `python utils/combine_coordinates.py` from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.feature_store import load_frame, save_frame
+
+# Load feature dataset (without coordinates, from combine_features.py)
+df_features = load_frame("outputs/combined_features.csv")
 
 # Load coordinates dataset (must contain 'Latitude' & 'Longitude')
-df_coords = pd.read_csv("outputs\coordinates.csv")
+df_coords = pd.read_csv("outputs/coordinates.csv")
 
 # Ensure both datasets have the same row count
 if len(df_features) == len(df_coords):
     df_merged = pd.concat([df_coords, df_features], axis=1)  # Merge side by side
-    df_merged.to_csv("outputs\merged_features.csv", index=False)
+    save_frame(df_merged, "outputs/merged_features.csv")
     print("✅ Coordinates added successfully!")
 else:
     print("⚠️ Error: Mismatch in row counts between features & coordinates.")
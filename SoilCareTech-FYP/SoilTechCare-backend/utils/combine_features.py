@@ -1,13 +1,28 @@
+import argparse
+import os
+import sys
+
 import pandas as pd
 
+# Allow running as `python utils/combine_features.py` from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.feature_store import load_frame, save_frame
+
+parser = argparse.ArgumentParser(description="Join the text and image features on ID")
+parser.add_argument("--image-features", default="outputs/image_features.csv",
+                    help="Raw embeddings, or the reduced ones from compress_embeddings.py")
+args = parser.parse_args()
+
 # File paths
-text_features_path = "outputs\scaled_text_features.csv"
-image_features_path = "outputs\image_features.csv"
-merged_features_path = "outputs/merged_features.csv"
+text_features_path = "outputs/scaled_text_features.csv"
+image_features_path = args.image_features
+# Coordinates are added by combine_coordinates.py, which writes merged_features.csv
+merged_features_path = "outputs/combined_features.csv"
 
-# Load text and image features
-text_features = pd.read_csv(text_features_path)
-image_features = pd.read_csv(image_features_path)
+# Load text and image features (from the typed feature stores when present)
+text_features = load_frame(text_features_path)
+image_features = load_frame(image_features_path)
 
 # Ensure column names have no spaces
 text_features.columns = text_features.columns.str.strip()
@@ -24,6 +39,9 @@ image_features["ID"] = image_features["ID"].astype(int)
 # Merge on 'ID'
 merged_features = pd.merge(text_features, image_features, on="ID", how="inner")
 
-# Save merged features
-merged_features.to_csv(merged_features_path, index=False)
+# ID is only the join key, not a feature for training
+merged_features = merged_features.drop(columns=["ID"])
+
+# Save merged features (float32 feature store plus the CSV export)
+save_frame(merged_features, merged_features_path)
 print(f"✅ Merged features saved to {merged_features_path}")
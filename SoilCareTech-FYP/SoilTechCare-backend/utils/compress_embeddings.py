@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Allow running as `python utils/compress_embeddings.py` from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.embedding_projection import METHODS, PROJECTION_NAME, EmbeddingProjection
+from backend.feature_store import load_frame, save_frame
+
+
+def load_or_fit(embeddings, path, method, dim, refit=False):
+    """Reuse the saved projection when it matches the settings, so new images land
+    in the same space the models were trained on; fit and save one otherwise"""
+    if not refit and os.path.exists(path):
+        projection = EmbeddingProjection.load(path)
+        wanted = (method, dim, embeddings.shape[1])
+        if (projection.method, projection.dim, projection.components.shape[1]) == wanted:
+            print(f"♻️ Reusing the projection in {path}")
+            return projection
+        print(f"ℹ️ {path} was fitted with other settings; refitting.")
+    projection = EmbeddingProjection(method, dim).fit(embeddings)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    projection.save(path)
+    print(f"✅ Projection saved to {path}")
+    return projection
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Project the EfficientNet embeddings to fewer columns")
+    parser.add_argument("--input", default="outputs/image_features.csv")
+    parser.add_argument("--output", default="outputs/image_features_reduced.csv")
+    parser.add_argument("--projection", default=os.path.join("backend/models", PROJECTION_NAME),
+                        help="Fitted projection; reused on later runs with the same settings")
+    parser.add_argument("--method", choices=METHODS, default="pca")
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--refit", action="store_true", help="Fit a new projection even if a matching one exists")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    image_features = load_frame(args.input)
+    embedding_columns = [c for c in image_features.columns if c != "ID"]
+    embeddings = image_features[embedding_columns].to_numpy(dtype=np.float32)
+
+    projection = load_or_fit(embeddings, args.projection, args.method, args.dim, args.refit)
+    reduced = pd.DataFrame(projection.transform(embeddings), columns=[str(i) for i in range(projection.dim)])
+    reduced.insert(0, "ID", image_features["ID"].astype(int).to_numpy())
+    save_frame(reduced, args.output)
+
+    kept = f", {projection.explained_variance:.1%} of the variance kept" if projection.explained_variance is not None else ""
+    print(f"✅ {len(embedding_columns)} -> {projection.dim} columns ({args.method}{kept}) "
+          f"for {len(reduced)} images in {time.perf_counter() - start:.1f}s")
+    print(f"✅ Reduced image features saved to {args.output}")
@@ -1,5 +1,12 @@
+import argparse
 import os
+import queue
 import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import pandas as pd
 from tensorflow.keras.applications import EfficientNetB0
@@ -7,45 +14,206 @@ from tensorflow.keras.applications.efficientnet import preprocess_input
 from tensorflow.keras.preprocessing import image
 from tensorflow.keras.models import Model
 
-# Load pre-trained EfficientNetB0 model (without classification layer)
-base_model = EfficientNetB0(weights="imagenet", include_top=False, pooling="avg")
-model = Model(inputs=base_model.input, outputs=base_model.output)
-
-# Image dataset paths
-image_folder = "dataset\images\preprocessed_images"
-image_features_path = "outputs/image_features.csv"
-
-# Extract features for each image
-features_list = []
-image_ids = []
-
-for img_name in os.listdir(image_folder):
-    if img_name.endswith(".png"):  # Ensure only images are processed
-        img_path = os.path.join(image_folder, img_name)
-        
-        # Load & preprocess image
-        img = image.load_img(img_path, target_size=(224, 224))
-        img_array = image.img_to_array(img)
-        img_array = np.expand_dims(img_array, axis=0)
-        img_array = preprocess_input(img_array)
-
-        # Extract features
-        features = model.predict(img_array).flatten()
-        
-        features_list.append(features)
-        
-        # Extract numeric ID using regex
-        match = re.search(r'\d+', img_name)  # Extracts the first number found in filename
-        if match:
-            image_ids.append(int(match.group()))
-        else:
+# Allow running as `python utils/image_feature_extraction.py` from the backend root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.embedding_cache import EmbeddingCache, content_hash
+from backend.feature_store import append_frame, save_frame
+
+TARGET_SIZE = (224, 224)
+MB = 1024 * 1024
+
+# Cached embeddings are keyed on this as well as the image bytes; change it
+# whenever the model, its weights or the preprocessing change
+EMBEDDING_VERSION = f"EfficientNetB0-imagenet-avg/{TARGET_SIZE[0]}x{TARGET_SIZE[1]}-nearest/efficientnet-preprocess/v1"
+
+
+def image_id(img_name):
+    """Sample ID from a tile name: the last number, so processed_Sentinel2_Image_12.png -> 12"""
+    match = re.search(r'(\d+)\D*$', img_name)
+    return int(match.group(1)) if match else None
+
+
+def list_images(image_folder):
+    """(ID, path) for every PNG with a usable ID, in ID order"""
+    images = []
+    for img_name in os.listdir(image_folder):
+        if not img_name.endswith(".png"):  # Ensure only images are processed
+            continue
+        img_id = image_id(img_name)
+        if img_id is None:
+            # Skipped before anything is extracted, so IDs and features stay aligned
             print(f"⚠ Warning: Could not extract numeric ID from {img_name}, skipping.")
             continue
+        images.append((img_id, os.path.join(image_folder, img_name)))
+    return sorted(images)
+
+
+def load_image(img_path):
+    """Decode & resize one image (PIL releases the GIL, so threads overlap)"""
+    img = image.load_img(img_path, target_size=TARGET_SIZE)
+    return image.img_to_array(img)
+
+
+def prefetch_batches(images, batch_size, decode_pool, depth):
+    """Yield (ids, batch array) while the next `depth` batches decode in the background"""
+    batches = queue.Queue(maxsize=depth)
+    done = object()
+
+    def produce():
+        try:
+            for start in range(0, len(images), batch_size):
+                chunk = images[start:start + batch_size]
+                arrays = list(decode_pool.map(load_image, [path for _, path in chunk]))
+                batches.put(([img_id for img_id, _ in chunk], preprocess_input(np.stack(arrays))))
+        except Exception as e:  # surface decode errors in the consumer
+            batches.put(e)
+        batches.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = batches.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+class FeatureWriter:
+    """Streams rows to the feature store and CSV, holding at most `flush_rows` in memory"""
+
+    def __init__(self, path, flush_rows=1024):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.pending = []
+        self.rows = 0
+
+    def add(self, ids, features):
+        frame = pd.DataFrame(features)
+        frame.insert(0, "ID", ids)  # Add image IDs as integers
+        self.pending.append(frame)
+        if sum(len(f) for f in self.pending) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        frame = pd.concat(self.pending, ignore_index=True)
+        if self.rows == 0:
+            save_frame(frame, self.path)
+        else:
+            append_frame(frame, self.path)
+        self.rows += len(frame)
+        self.pending = []
+
+
+class CacheWriter:
+    """extract_features sink that stores each new embedding in the cache.
+
+    The cost recorded per image is its share of the pipeline's wall time,
+    decode included, which is what a later cache hit saves.
+    """
+
+    def __init__(self, cache, key_by_id):
+        self.cache = cache
+        self.key_by_id = key_by_id
+        self.last = time.perf_counter()
+
+    def add(self, ids, features):
+        now = time.perf_counter()
+        self.cache.put_many([self.key_by_id[img_id] for img_id in ids], features, (now - self.last) / len(ids))
+        self.last = now
+
+    def flush(self):
+        pass
+
+
+def rebuild_from_cache(cache, images, key_by_id, writer):
+    """Write the whole table in ID order from cached vectors, flush_rows at a time"""
+    for start in range(0, len(images), writer.flush_rows):
+        ids = [img_id for img_id, _ in images[start:start + writer.flush_rows]]
+        keys = [key_by_id[img_id] for img_id in ids]
+        vectors = cache.get_many(keys)
+        writer.add(ids, np.stack([vectors[key] for key in keys]))
+    writer.flush()
+
+
+def load_model():
+    # Load pre-trained EfficientNetB0 model (without classification layer)
+    base_model = EfficientNetB0(weights="imagenet", include_top=False, pooling="avg")
+    return Model(inputs=base_model.input, outputs=base_model.output)
+
+
+def extract_features(model, images, writer, batch_size=32, workers=None, prefetch=2, report_every=50):
+    """Batched inference with decode running ahead of it; returns throughput stats"""
+    start = time.perf_counter()
+    infer_seconds = 0.0
+    done = 0
+    with ThreadPoolExecutor(workers or os.cpu_count() or 1) as decode_pool:
+        for n_batch, (ids, batch) in enumerate(prefetch_batches(images, batch_size, decode_pool, prefetch), 1):
+            step = time.perf_counter()
+            features = model.predict_on_batch(batch)
+            infer_seconds += time.perf_counter() - step
+            writer.add(ids, np.asarray(features).reshape(len(ids), -1))
+            done += len(ids)
+            if n_batch % report_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"   {done}/{len(images)} images, {done / elapsed:.1f} images/sec")
+    writer.flush()
+    seconds = time.perf_counter() - start
+    return {
+        'images': done,
+        'seconds': seconds,
+        'images_per_second': done / seconds if seconds else 0.0,
+        # Share of the run the model was busy; the rest is decode it could not hide
+        'inference_share': infer_seconds / seconds if seconds else 0.0,
+    }
+
+
+parser = argparse.ArgumentParser(description="Extract EfficientNetB0 features for the preprocessed tiles")
+parser.add_argument("--input", default="dataset/images/preprocessed_images")
+parser.add_argument("--output", default="outputs/image_features.csv")
+parser.add_argument("--batch-size", type=int, default=32)
+parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Decode/resize threads")
+parser.add_argument("--prefetch", type=int, default=2, help="Batches decoded ahead of inference")
+parser.add_argument("--flush-rows", type=int, default=1024, help="Rows held before they are written")
+parser.add_argument("--cache", default="outputs/embedding_cache.sqlite", help="Embedding cache database")
+parser.add_argument("--cache-max-mb", type=float, default=2048, help="Evict least recently used embeddings above this")
+parser.add_argument("--no-cache", action="store_true", help="Embed every image and leave the cache alone")
+args = parser.parse_args()
+
+images = list_images(args.input)
+if not images:
+    raise SystemExit(f"❌ No PNG tiles with numeric IDs in {args.input}")
+
+
+def report(stats):
+    print(f"⏱️ {stats['images']} images in {stats['seconds']:.1f}s ({stats['images_per_second']:.1f} images/sec, "
+          f"model busy {stats['inference_share']:.0%} of the time)")
+
 
-# Convert to DataFrame & save
-features_df = pd.DataFrame(features_list)
-features_df.insert(0, "ID", image_ids)  # Add image IDs as integers
+if args.no_cache:
+    report(extract_features(load_model(), images, FeatureWriter(args.output, args.flush_rows),
+                            args.batch_size, args.workers, args.prefetch))
+else:
+    cache = EmbeddingCache(args.cache, EMBEDDING_VERSION, max_bytes=int(args.cache_max_mb * MB))
+    with ThreadPoolExecutor(args.workers) as pool:
+        keys = list(pool.map(content_hash, [path for _, path in images]))
+    key_by_id = {img_id: key for (img_id, _), key in zip(images, keys)}
+    cached = cache.lookup(keys)
+    misses = [(img_id, path) for img_id, path in images if key_by_id[img_id] not in cached]
+    print(f"🗃️ {len(images) - len(misses)} images cached, {len(misses)} to embed")
 
-# Save CSV
-features_df.to_csv(image_features_path, index=False)
-print(f"✅ Image features saved to {image_features_path}")
+    # The model is only loaded when something actually needs embedding
+    if misses:
+        report(extract_features(load_model(), misses, CacheWriter(cache, key_by_id),
+                                args.batch_size, args.workers, args.prefetch))
+    rebuild_from_cache(cache, images, key_by_id, FeatureWriter(args.output, args.flush_rows))
+    cache.evict()
+    stats = cache.stats()
+    print(f"🗃️ Cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%}), "
+          f"~{stats['seconds_saved']:.1f}s of extraction saved, {stats['evictions']} evicted, "
+          f"{stats['entries']} entries / {stats['bytes'] / MB:.1f} MB")
+    cache.close()
+print(f"✅ Image features saved to {args.output}")
@@ -0,0 +1,232 @@
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Run from the backend root, like the stage scripts themselves
+STATE_PATH = "outputs/.pipeline_state.json"
+
+# The feature build as a DAG: a stage depends on whichever stages produce its
+# inputs. Directories (images, .fstore feature stores) are fingerprinted file by file.
+STAGES = {
+    "preprocess_text": {
+        'script': "training/preprocess_text_data.py",
+        'inputs': ["dataset/soil_data.csv"],
+        'outputs': ["dataset/processed_soil_data.csv"],
+    },
+    "text_features": {
+        'script': "utils/text_feature_extraction.py",
+        'inputs': ["dataset/processed_soil_data.csv"],
+        'outputs': ["outputs/scaled_text_features.csv"],
+    },
+    "image_features": {
+        'script': "utils/image_feature_extraction.py",
+        'inputs': ["dataset/images/preprocessed_images"],
+        'outputs': ["outputs/image_features.csv", "outputs/image_features.fstore"],
+    },
+    "combine_features": {
+        'script': "utils/combine_features.py",
+        'inputs': ["outputs/scaled_text_features.csv", "outputs/image_features.csv"],
+        'outputs': ["outputs/combined_features.csv", "outputs/combined_features.fstore"],
+    },
+    "combine_coordinates": {
+        'script': "utils/combine_coordinates.py",
+        'inputs': ["outputs/combined_features.csv", "outputs/coordinates.csv"],
+        'outputs': ["outputs/merged_features.csv", "outputs/merged_features.fstore"],
+    },
+}
+
+# Optional stage (--compress): PCA/random projection of the embeddings, which
+# combine_features then joins instead of the raw 1,280 columns
+COMPRESS_STAGE = {
+    'script': "utils/compress_embeddings.py",
+    'inputs': ["outputs/image_features.csv"],
+    'outputs': ["outputs/image_features_reduced.csv", "outputs/image_features_reduced.fstore"],
+}
+
+
+def with_compression(stages, compress_args=()):
+    """STAGES with compress_embeddings between image extraction and combine_features"""
+    stages = {name: dict(stage) for name, stage in stages.items()}
+    compressed = dict(COMPRESS_STAGE, args=list(compress_args))
+    combined = stages.pop("combine_features")
+    combined['inputs'] = ["outputs/scaled_text_features.csv", "outputs/image_features_reduced.csv"]
+    combined['args'] = ["--image-features", "outputs/image_features_reduced.csv"]
+    ordered = {}
+    for name, stage in stages.items():
+        if name == "combine_coordinates":
+            ordered["compress_embeddings"] = compressed
+            ordered["combine_features"] = combined
+        ordered[name] = stage
+    return ordered
+
+
+class Hasher:
+    """sha256 of files, reusing earlier digests while size and mtime are unchanged"""
+
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+
+    def file(self, path):
+        stat = os.stat(path)
+        key = [stat.st_size, stat.st_mtime_ns]
+        cached = self.known.get(path)
+        if cached and cached[:2] == key:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.known[path] = key + [digest.hexdigest()]
+        return digest.hexdigest()
+
+    def path(self, path):
+        """Digest of a file, or of every file under a directory; None if missing"""
+        if os.path.isfile(path):
+            return self.file(path)
+        if not os.path.isdir(path):
+            return None
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                digest.update(os.path.relpath(full, path).encode() + b"\0" + self.file(full).encode())
+        return digest.hexdigest()
+
+
+def dependencies(stages):
+    """stage -> the stages that produce its inputs"""
+    producer = {out: name for name, stage in stages.items() for out in stage['outputs']}
+    return {
+        name: {producer[path] for path in stage['inputs'] if path in producer}
+        for name, stage in stages.items()
+    }
+
+
+def fingerprint(stage, hasher):
+    """Script, arguments and inputs; a stage is up to date while this matches its last run"""
+    inputs = {path: hasher.path(path) for path in [stage['script']] + stage['inputs']}
+    if stage.get('args'):
+        inputs['args'] = " ".join(stage['args'])
+    return inputs
+
+
+def run_stage(name, stage):
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, stage['script']] + stage.get('args', []), capture_output=True, text=True)
+    return proc, time.perf_counter() - start
+
+
+def run(stages, state, jobs=2, force=(), dry_run=False):
+    """Run the stages that are out of date, independent ones concurrently.
+
+    A stage is skipped when its script and inputs hash to what they were on
+    its last successful run and its outputs are still the files it wrote.
+    Returns {stage: status}, where status is ran / skipped / failed / blocked.
+    """
+    deps = dependencies(stages)
+    produced = {path for stage in stages.values() for path in stage['outputs']}
+    hasher = Hasher(state.get('hashes'))
+    records = state.setdefault('stages', {})
+    status, timings = {}, {}
+    pending = set(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max(1, jobs)) as pool:
+        while pending or running:
+            # Start everything whose upstream stages are all settled
+            for name in sorted(pending):
+                if any(dep not in status for dep in deps[name]):
+                    continue
+                pending.discard(name)
+                if any(status[dep] in ("failed", "blocked") for dep in deps[name]):
+                    status[name] = "blocked"
+                    continue
+                stage = stages[name]
+                inputs = fingerprint(stage, hasher)
+                # In a dry run, inputs an upstream stage would have produced are not missing
+                missing = [path for path, digest in inputs.items()
+                           if digest is None and not (dry_run and path in produced)]
+                record = records.get(name, {})
+                outputs_intact = all(
+                    hasher.path(path) is not None and hasher.path(path) == record.get('outputs', {}).get(path)
+                    for path in stage['outputs']
+                )
+                if name not in force and record.get('inputs') == inputs and outputs_intact:
+                    status[name] = "skipped"
+                    print(f"⏭️ {name}: up to date")
+                elif missing:
+                    status[name] = "failed"
+                    print(f"❌ {name}: missing {', '.join(missing)}")
+                elif dry_run:
+                    status[name] = "ran"
+                    print(f"▶️ {name}: would run")
+                else:
+                    print(f"▶️ {name}: running {stage['script']}")
+                    running[pool.submit(run_stage, name, stage)] = (name, inputs)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, inputs = running.pop(future)
+                proc, seconds = future.result()
+                timings[name] = round(seconds, 3)
+                outputs = {path: hasher.path(path) for path in stages[name]['outputs']}
+                if proc.returncode != 0 or None in outputs.values():
+                    status[name] = "failed"
+                    print(f"❌ {name} failed after {seconds:.1f}s")
+                    print((proc.stderr or proc.stdout).strip()[-2000:])
+                    continue
+                status[name] = "ran"
+                records[name] = {'inputs': inputs, 'outputs': outputs, 'seconds': timings[name],
+                                 'finished': time.time()}
+                print(f"✅ {name} done in {seconds:.1f}s")
+
+    state['hashes'] = hasher.known
+    state['last_run'] = {'finished': time.time(), 'status': status, 'seconds': timings}
+    return status, timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the feature CSVs, rerunning only out-of-date stages")
+    parser.add_argument("--jobs", type=int, default=2, help="Stages run at once (text and image extraction are independent)")
+    parser.add_argument("--force", nargs="*", default=[], metavar="STAGE",
+                        help="Rerun these stages (all if given without names)")
+    parser.add_argument("--dry-run", action="store_true", help="Only show what would run")
+    parser.add_argument("--state", default=STATE_PATH)
+    parser.add_argument("--compress", nargs="?", const="", metavar="OPTIONS",
+                        help='Add the compress_embeddings stage, with its options (e.g. --compress="--dim 32 --method random")')
+    args = parser.parse_args()
+
+    stages = STAGES if args.compress is None else with_compression(STAGES, shlex.split(args.compress))
+    unknown = set(args.force) - set(stages)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    force = set(stages) if "--force" in sys.argv and not args.force else set(args.force)
+
+    state = {}
+    if os.path.exists(args.state):
+        with open(args.state) as f:
+            state = json.load(f)
+
+    start = time.perf_counter()
+    status, timings = run(stages, state, args.jobs, force, args.dry_run)
+    if not args.dry_run:
+        os.makedirs(os.path.dirname(args.state), exist_ok=True)
+        with open(args.state, "w") as f:
+            json.dump(state, f, indent=2)
+
+    print(f"\n{'stage':>20}{'status':>10}{'seconds':>10}")
+    for name in stages:
+        seconds = f"{timings[name]:.1f}" if name in timings else "-"
+        print(f"{name:>20}{status.get(name, '-'):>10}{seconds:>10}")
+    print(f"⏱️ Pipeline took {time.perf_counter() - start:.1f}s")
+    if any(value in ("failed", "blocked") for value in status.values()):
+        sys.exit(1)
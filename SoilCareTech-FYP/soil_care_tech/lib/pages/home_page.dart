@@ -405,6 +405,12 @@ class _MyHomePageState extends State<MyHomePage> {
                           'https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png',
                       subdomains: const ['a', 'b', 'c'],
                     ),
+                    // Pre-rendered degradation heatmap from the backend
+                    TileLayer(
+                      urlTemplate: SoilApi.tileUrlTemplate,
+                      minZoom: 8,
+                      maxNativeZoom: 13,
+                    ),
                     PolygonLayer(
                       polygons: [
                         Polygon(
@@ -6,6 +6,9 @@ import 'package:latlong2/latlong.dart';
 class SoilApi {
   static const String baseUrl = 'http://localhost:5000'; // For web
 
+  // Degradation overlay built by training/build_tiles.py
+  static const String tileUrlTemplate = '$baseUrl/tiles/{z}/{x}/{y}';
+
   static Future<SoilData> analyzeSoil(LatLng coords) async {
     try {
       final response = await http
@@ -26,5 +29,77 @@ class SoilApi {
     }
   }
 
+  // One request for many pins; results come back in the same order as coords
+  static Future<List<SoilData>> analyzeSoilBatch(List<LatLng> coords) async {
+    try {
+      final response = await http
+          .post(
+            Uri.parse('$baseUrl/predict/batch'),
+            headers: {'Content-Type': 'application/json'},
+            body: jsonEncode({
+              'points': coords
+                  .map((c) => {'lat': c.latitude, 'lng': c.longitude})
+                  .toList(),
+            }),
+          )
+          .timeout(const Duration(seconds: 30));
+
+      if (response.statusCode != 200) {
+        throw Exception('Server error: ${response.statusCode}');
+      }
+      // Large batches are streamed back as NDJSON
+      if (response.headers['content-type']?.contains('ndjson') ?? false) {
+        return const LineSplitter()
+            .convert(response.body)
+            .where((line) => line.isNotEmpty)
+            .map((line) => SoilData.fromJson(jsonDecode(line)))
+            .toList();
+      }
+      final List<dynamic> results = jsonDecode(response.body)['results'];
+      return results.map((r) => SoilData.fromJson(r)).toList();
+    } catch (e) {
+      throw Exception('Batch analysis failed: $e');
+    }
+  }
+
+  // Sampled sites in a viewport (south, west, north, east), following pages
+  static Future<List<Map<String, dynamic>>> getSamplesInBounds(
+      double south, double west, double north, double east) {
+    return _getSamples({'bbox': '$south,$west,$north,$east'});
+  }
+
+  // Sampled sites within radiusKm of center; each has a 'distance_km'
+  static Future<List<Map<String, dynamic>>> getSamplesNear(
+      LatLng center, double radiusKm) {
+    return _getSamples({
+      'lat': '${center.latitude}',
+      'lng': '${center.longitude}',
+      'radius_km': '$radiusKm',
+    });
+  }
+
+  static Future<List<Map<String, dynamic>>> _getSamples(
+      Map<String, String> query) async {
+    final samples = <Map<String, dynamic>>[];
+    String? cursor;
+    try {
+      do {
+        final params = {...query, if (cursor != null) 'cursor': cursor};
+        final response = await http
+            .get(Uri.parse('$baseUrl/samples').replace(queryParameters: params))
+            .timeout(const Duration(seconds: 10));
+        if (response.statusCode != 200) {
+          throw Exception('Server error: ${response.statusCode}');
+        }
+        final body = jsonDecode(response.body);
+        samples.addAll(List<Map<String, dynamic>>.from(body['samples']));
+        cursor = body['next_cursor'];
+      } while (cursor != null);
+      return samples;
+    } catch (e) {
+      throw Exception('Sample query failed: $e');
+    }
+  }
+
   static getSoilHistory() {}
 }